@@ -0,0 +1,180 @@
+"""Analyze many source files across worker processes, one JSON line per file.
+
+Usage: python batch.py [-j WORKERS] [--chunk-size N] [--engine ENGINE] [--include GLOB] [--stats | --validate] PATH...
+
+Each PATH is a file, a directory (searched recursively for files matching
+--include) or a glob pattern. Every line written to stdout describes one file:
+its path, first error (null without errors), token count and the time spent
+lexing, parsing and looking for the first error, in milliseconds. A file that
+could not be read or analyzed gets an "exception" instead. Lines come out in
+the order the files were found, as soon as each one is done.
+
+With --stats, each line also carries the file's stats.Stats counters, and the
+totals over all files go to stderr as one JSON object at the end, along with
+the files that took longest to parse per token.
+
+With --validate, files are checked with recognizer.Recognizer, which finds the
+same first error without building a parse tree; its time is the parse time.
+"""
+import argparse
+import fnmatch
+import glob
+import heapq
+import json
+import os
+import sys
+import time
+from itertools import repeat
+
+from lexical_analyzer import ENGINES, Lexer
+from parser import Parser
+from recognizer import Recognizer
+from stats import Stats
+
+DEFAULT_INCLUDE = "*.txt"
+SLOWEST_FILES = 10
+
+
+def expand_paths(paths, include=DEFAULT_INCLUDE):
+    """Files named by paths, with directories and glob patterns expanded, each file once."""
+    seen = set()
+    for path in paths:
+        matches = sorted(glob.glob(path, recursive=True)) if glob.has_magic(path) else [path]
+        for match in matches:
+            if os.path.isdir(match):
+                for directory, subdirectories, files in os.walk(match):
+                    subdirectories.sort()
+                    for name in sorted(fnmatch.filter(files, include)):
+                        file = os.path.join(directory, name)
+                        if file not in seen:
+                            seen.add(file)
+                            yield file
+            elif match not in seen:
+                seen.add(match)
+                yield match
+
+
+def analyze_path(path, engine="regex", stats=False, validate=False):
+    """JSON-ready result for the file at path, with the file's Stats as a dict
+    under "stats" when stats is true. With validate, no parse tree is built."""
+    result = {"path": path}
+    counted = Stats() if stats else None
+    try:
+        start = time.perf_counter()
+        with open(path, "r") as fp:
+            text = fp.read()
+        if counted is not None:
+            analysis = counted.analyze(text, engine)
+            tokens, first_error = analysis.tokens, analysis.first_error
+            lexed = start + counted.seconds["lex"]
+            parsed = lexed + counted.seconds["parse"]
+            done = parsed + counted.seconds["first_error"]
+        elif validate:
+            tokens = Lexer(engine).tokenize_buffer(text)
+            lexed = time.perf_counter()
+            first_error = Recognizer.from_buffer(tokens).recognize()
+            parsed = done = time.perf_counter()
+        else:
+            tokens = Lexer(engine).tokenize_buffer(text)
+            lexed = time.perf_counter()
+            parser = Parser.from_buffer(tokens)
+            parser.parse()
+            parsed = time.perf_counter()
+            first_error = parser.parse_tree.find_first_error()
+            done = time.perf_counter()
+    except Exception as error:
+        result["exception"] = f"{type(error).__name__}: {error}"
+        return result
+    result["first_error"] = None if first_error is None else str(first_error)
+    result["tokens"] = len(tokens)
+    result["lex_ms"] = round((lexed - start) * 1000, 3)
+    result["parse_ms"] = round((parsed - lexed) * 1000, 3)
+    result["first_error_ms"] = round((done - parsed) * 1000, 3)
+    if counted is not None:
+        result["stats"] = counted.to_dict()
+    return result
+
+
+def _analyze_chunk(paths, engine, stats, validate):
+    return [analyze_path(path, engine, stats, validate) for path in paths]
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def analyze_paths(files, workers=None, chunk_size=None, engine="regex", stats=False, validate=False):
+    """Yield the result of every file, in order, analyzing chunk_size files
+    per task on workers processes (in this process when workers is 1)."""
+    files = list(files)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(files) <= 1:
+        for path in files:
+            yield analyze_path(path, engine, stats, validate)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    if not chunk_size:
+        # A few tasks per worker keeps them all busy to the end without a round trip per file
+        chunk_size = max(1, min(256, len(files) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for results in pool.map(_analyze_chunk, _chunks(files, chunk_size), repeat(engine), repeat(stats),
+                                repeat(validate)):
+            yield from results
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description="Analyze source files and print one JSON line per file.")
+    arguments.add_argument("paths", nargs="+", metavar="PATH", help="file, directory or glob pattern")
+    arguments.add_argument("-j", "--workers", type=int, default=None,
+                           help="worker processes (default: number of CPUs, 1 runs in this process)")
+    arguments.add_argument("--chunk-size", type=int, default=None,
+                           help="files handed to a worker at a time (default: chosen from the file count)")
+    arguments.add_argument("--engine", choices=ENGINES, default="regex", help="lexer engine (default: regex)")
+    arguments.add_argument("--include", default=DEFAULT_INCLUDE,
+                           help=f"file name pattern searched for in directories (default: {DEFAULT_INCLUDE})")
+    checks = arguments.add_mutually_exclusive_group()
+    checks.add_argument("--stats", action="store_true",
+                        help="count each file's hot paths into its line and print the totals to stderr")
+    checks.add_argument("--validate", action="store_true",
+                        help="only find the first error, without building parse trees")
+    options = arguments.parse_args(argv)
+    if options.workers is not None and options.workers < 1:
+        arguments.error("--workers must be at least 1")
+    if options.chunk_size is not None and options.chunk_size < 1:
+        arguments.error("--chunk-size must be at least 1")
+
+    files = expand_paths(options.paths, options.include)
+    failed = False
+    total = Stats()
+    slowest = []  # (parse seconds per token, path) of the files that parsed slowest
+    results = analyze_paths(files, options.workers, options.chunk_size, options.engine, options.stats,
+                            options.validate)
+    try:
+        for result in results:
+            failed = failed or "exception" in result
+            if "stats" in result:
+                counted = Stats.from_dict(result["stats"])
+                total.merge(counted)
+                if counted.tokens:
+                    heapq.heappush(slowest, (counted.seconds["parse"] / counted.tokens, result["path"]))
+                    if len(slowest) > SLOWEST_FILES:
+                        heapq.heappop(slowest)
+            sys.stdout.write(json.dumps(result) + "\n")
+            sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader stopped reading, as head does: stop quietly, as line oriented tools do
+        results.close()
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())  # Flushing stdout on exit would raise again
+        return 1
+    if options.stats:
+        summary = total.to_dict()
+        summary["slowest_parse_per_token"] = [{"path": path, "us_per_token": round(seconds * 1e6, 3)}
+                                              for seconds, path in sorted(slowest, reverse=True)]
+        sys.stderr.write(json.dumps(summary) + "\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
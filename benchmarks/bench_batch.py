@@ -0,0 +1,52 @@
+"""Files/sec of batch.analyze_paths over a generated tree of files, for growing worker counts.
+
+Usage: python benchmarks/bench_batch.py [files] [max_workers]
+"""
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import batch
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    sources = [open(path).read() for path in sorted(glob.glob(os.path.join(ROOT, "Assignment2_TestCases", "input*.txt")))]
+
+    directory = tempfile.mkdtemp(prefix="bench_batch-")
+    try:
+        for i in range(count):
+            subdirectory = os.path.join(directory, str(i // 1000))
+            if i % 1000 == 0:
+                os.makedirs(subdirectory)
+            with open(os.path.join(subdirectory, f"{i}.txt"), "w") as fp:
+                fp.write(sources[i % len(sources)])
+        files = list(batch.expand_paths([directory]))
+        assert len(files) == count
+
+        expected = None
+        baseline = None
+        workers = 1
+        while workers <= max_workers:
+            start = time.perf_counter()
+            results = [(result["path"], result.get("first_error"), result.get("exception"))
+                       for result in batch.analyze_paths(files, workers)]
+            elapsed = time.perf_counter() - start
+            expected = expected or results
+            assert results == expected, "results depend on the worker count"
+            baseline = baseline or elapsed
+            print(f"{workers:3} workers: {count / elapsed:9,.0f} files/sec, {baseline / elapsed:5.2f}x")
+            workers *= 2
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Analysis time with a cold and a warm ResultCache, and eviction under a small size limit.
+
+Usage: python benchmarks/bench_cache.py [copies] [processes]
+
+The last run stands in for processes processes (4 by default) sharing one
+cache directory, one ResultCache each, and checks that the directory stays
+within the limit and the slack of 1 / RESCAN_PARTS of it per process, and that
+the temporary file of a killed writer is removed.
+"""
+import glob
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from result_cache import RESCAN_PARTS, STALE_TEMP_SECONDS, TEMP_PREFIX, ResultCache, analyze_text
+
+
+def run(cache, sources):
+    start = time.perf_counter()
+    results = [cache.analyze(source) for source in sources]
+    return results, time.perf_counter() - start
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    # Distinct sources, the test cases repeated a different number of times
+    samples = [open(path, "rb").read() for path in sorted(glob.glob(os.path.join(ROOT, "Assignment2_TestCases", "input*.txt")))]
+    sources = [sample * (copy + 1) for copy in range(copies) for sample in samples]
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ResultCache(directory)
+        cold, cold_time = run(cache, sources)
+        warm, warm_time = run(cache, sources)
+        for source, result in zip(sources, warm):
+            assert result.first_error == analyze_text(source.decode()).first_error
+        print(f"{len(sources)} sources, {sum(map(len, sources)) / 2**20:.1f} MB")
+        print(f"cold: {cold_time:.2f}s, warm: {warm_time:.2f}s ({cold_time / warm_time:.1f}x faster), {cache.stats()}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ResultCache(directory, max_bytes=cache.size // 4)
+        run(cache, sources)
+        run(cache, sources[-len(sources) // 8:])  # Recently used, so still cached
+        print(f"limit {cache.max_bytes / 2**20:.1f} MB: {cache.stats()}, {cache.scan()[0] / 2**20:.1f} MB kept")
+
+    with tempfile.TemporaryDirectory() as directory:
+        max_bytes = cache.max_bytes
+        caches = [ResultCache(directory, max_bytes=max_bytes) for _ in range(processes)]
+        killed_write = os.path.join(directory, TEMP_PREFIX + "killed")
+        open(killed_write, "wb").close()
+        os.utime(killed_write, (time.time() - 2 * STALE_TEMP_SECONDS,) * 2)
+        largest = peak = 0
+        for number, source in enumerate(sources):
+            result = caches[number % processes].analyze(source)
+            largest = max(largest, len(result.to_bytes()))
+            peak = max(peak, caches[0].scan()[0])
+        assert peak <= max_bytes + processes * (max_bytes // RESCAN_PARTS + largest), (peak, max_bytes)
+        assert not os.path.exists(killed_write)
+        print(f"{processes} caches sharing the directory: peak {peak / 2**20:.1f} MB, "
+              f"{sum(cache.evictions for cache in caches)} evictions")
+
+
+if __name__ == "__main__":
+    main()
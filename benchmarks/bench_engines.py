@@ -0,0 +1,41 @@
+"""Tokens/sec of the classic, regex and vector lexer engines.
+
+Usage: python benchmarks/bench_engines.py [size_in_mb]
+"""
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import lexical_analyzer as la
+import vector_lexer
+
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    text = open(os.path.join(ROOT, "Assignment2_TestCases", "input.txt")).read() + "\n"
+    text = text * max(1, int(size_mb * 1024 * 1024) // len(text))
+
+    for path in sorted(glob.glob(os.path.join(ROOT, "Assignment2_TestCases", "input*.txt"))):
+        source = open(path).read()
+        for engine in la.ENGINES:
+            assert la.tokenize(source, "classic") == la.tokenize(source, engine), (path, engine)
+
+    if not vector_lexer.available():
+        print("NumPy is not installed, the vector engine runs the regex engine")
+    results = {}
+    for engine in la.ENGINES:
+        start = time.perf_counter()
+        results[engine] = la.tokenize(text, engine)
+        elapsed = time.perf_counter() - start
+        count = len(results[engine][0])
+        print(f"{engine:8} {count} tokens in {elapsed:.3f}s = {count / elapsed:,.0f} tokens/sec")
+    for engine in la.ENGINES:
+        assert results[engine] == results["classic"], engine + " disagrees with classic"
+
+
+if __name__ == "__main__":
+    main()
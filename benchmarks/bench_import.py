@@ -0,0 +1,57 @@
+"""Startup cost of importing the library modules, from python -X importtime.
+
+Usage: python benchmarks/bench_import.py [runs] [budget_ms]
+
+Each module is imported in a fresh interpreter, once to write its bytecode and
+then runs times, and the median cumulative import time is reported along with
+the slowest modules it pulls in. Importing must print nothing. With budget_ms,
+the exit status is 1 when any module takes longer than that to import.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+MODULES = ("lexical_analyzer", "parser", "result_cache", "incremental", "stats", "batch", "recovery", "recognizer")
+
+
+def import_times(module, pycache):
+    """Output of one import and {module: (self_us, cumulative_us)} for everything it imported."""
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    run = subprocess.run([sys.executable, "-X", "importtime", "-X", "pycache_prefix=" + pycache, "-c", "import " + module],
+                         cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    times = {}
+    for line in run.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return run.stdout, times
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    budget_ms = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    over_budget = False
+    with tempfile.TemporaryDirectory(prefix="bench_import-") as pycache:
+        for module in MODULES:
+            import_times(module, pycache)  # Write the bytecode, so compiling is not measured
+            samples = []
+            for _ in range(runs):
+                output, times = import_times(module, pycache)
+                assert output == "", f"importing {module} printed {output!r}"
+                samples.append(times)
+            total_ms = statistics.median(times[module][1] for times in samples) / 1000
+            slowest = sorted(samples[-1].items(), key=lambda item: -item[1][0])[:3]
+            print(f"{module:17} {total_ms:6.1f} ms   slowest: "
+                  + ", ".join(f"{name} {self_us / 1000:.1f}" for name, (self_us, _) in slowest))
+            over_budget = over_budget or (budget_ms is not None and total_ms > budget_ms)
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""Time single line edits in a large file with Document.edit() against analyzing
+the edited text from scratch.
+
+Usage: python benchmarks/bench_incremental.py [lines]
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from incremental import Document
+
+UNIT = "x = a + 1;\nif (x < 10) {\n    y = x * 2;\n}\n"
+
+
+def same(document):
+    """Whether document matches a Document built from its text."""
+    fresh = Document(document.text)
+    return (document.buffer.tokens == fresh.buffer.tokens and document.buffer.lines == fresh.buffer.lines
+            and document.buffer.starts == fresh.buffer.starts
+            and document.tree.print_tree(0) == fresh.tree.print_tree(0)
+            and document.first_error() == fresh.first_error())
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    text = UNIT * (lines // UNIT.count("\n"))
+    middle = text.index("y = x", len(text) // 2)
+
+    start = time.perf_counter()
+    document = Document(text)
+    full = time.perf_counter() - start
+    print(f"{text.count(chr(10))} lines, {len(document.buffer)} tokens: full analysis {full * 1000:.0f} ms")
+
+    # Each edit is followed by the one that undoes it
+    local = [
+        ("rename a variable", (middle, 1, "z")),
+        ("rename it back", (middle, 1, "y")),
+        ("insert a character", (middle + 4, 0, "b")),
+        ("delete it", (middle + 4, 1, "")),
+        ("insert a line", (middle, 0, "w = 3;\n    ")),
+        ("delete the line", (middle, 11, "")),
+        ("comment out a line", (middle, 0, "// ")),
+        ("uncomment it", (middle, 3, "")),
+        ("break an expression", (middle + 6, 0, "* ")),
+        ("fix it", (middle + 6, 2, "")),
+    ]
+    # These change how everything after them lexes or parses: a missing
+    # semicolon makes the parser skip the line with the closing brace, so the
+    # statements after it end up inside the block, an unclosed comment runs
+    # to the end of the file, and a stray brace ends program
+    cascading = [
+        ("delete a semicolon", (middle + 9, 1, "")),
+        ("put it back", (middle + 9, 0, ";")),
+        ("open a block comment", (middle, 0, "/*")),
+        ("close it", (middle + 12, 0, "*/")),
+        ("remove the /*", (middle, 2, "")),
+        ("remove the */", (middle + 10, 2, "")),
+        ("add a stray brace", (middle, 0, "{")),
+        ("remove it", (middle, 1, "")),
+    ]
+    for title, edits in (("local edits", local), ("edits that change the rest of the file", cascading)):
+        print(title + ":")
+        for name, edit in edits:
+            start = time.perf_counter()
+            document.edit(*edit)
+            elapsed = time.perf_counter() - start
+            print(f"  {name:22s} {elapsed * 1000:8.2f} ms ({full / elapsed:6.0f}x faster), first error: {document.first_error()}")
+    assert document.text == text
+    assert same(document), "incremental result differs from a full analysis"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Time and peak memory of lexing a file from its text against lexing it
+through a memory map, and of the whole analysis each way, on generated
+programs from 10K tokens up to max_tokens, ten times more each step.
+
+Usage: python benchmarks/bench_mapped.py [max_tokens]
+
+The programs are written to a temporary file first. Pages of the memory map
+are not Python allocations and do not count towards the peak, which is the
+point: the mapped side only holds token offsets, while the other side holds
+the text of the file and a str per token. Every run checks that both give
+the same tokens and first error.
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from lexical_analyzer import Lexer, analyze_file
+from program_generator import generate
+
+
+def measure(function, *args):
+    """Seconds and peak bytes of function(*args), from separate runs, and its result."""
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def lex_text(path):
+    with open(path, "r") as fp:
+        return Lexer("regex").tokenize_buffer(fp.read())
+
+
+def lex_mapped(path):
+    return Lexer("regex").tokenize_mapped(path)
+
+
+def analyze_mapped(path):
+    return analyze_file(path, mapped=True)
+
+
+def main():
+    max_tokens = int(float(sys.argv[1])) if len(sys.argv) > 1 else 1_000_000
+
+    print(f"{'tokens':>10} {'MB':>6}  {'lex ms':>8} {'peak MB':>8}  {'mapped ms':>9} {'peak MB':>8}  "
+          f"{'analyze ms':>10} {'peak MB':>8}  {'mapped ms':>9} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "program.txt")
+        size = 10_000
+        while size <= max_tokens:
+            with open(path, "w", newline="") as fp:
+                fp.write(generate(size, seed=size))
+            lex_time, lex_peak, tokens = measure(lex_text, path)
+            mapped_time, mapped_peak, mapped = measure(lex_mapped, path)
+            assert list(mapped) == list(tokens)
+            analyze_time, analyze_peak, analysis = measure(analyze_file, path)
+            analyze_mapped_time, analyze_mapped_peak, mapped_analysis = measure(analyze_mapped, path)
+            assert mapped_analysis.first_error == analysis.first_error
+            print(f"{len(tokens):10} {os.path.getsize(path) / 2**20:6.1f}  "
+                  f"{lex_time * 1000:8.1f} {lex_peak / 2**20:8.1f}  {mapped_time * 1000:9.1f} {mapped_peak / 2**20:8.1f}  "
+                  f"{analyze_time * 1000:10.1f} {analyze_peak / 2**20:8.1f}  "
+                  f"{analyze_mapped_time * 1000:9.1f} {analyze_mapped_peak / 2**20:8.1f}", flush=True)
+            size *= 10
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Speedup of lexing one large source string on a process pool with
+parallel_lexer against lexing it in one process, by number of workers.
+
+Usage: python benchmarks/bench_parallel_lex.py [tokens] [max_workers] [engine]
+
+The program has tokens tokens (2M by default) and the workers go 1, 2, 4, ...
+up to max_workers (the number of CPUs by default). Pools are started and
+warmed up before timing, so the numbers are of the lexing, the copies of the
+chunks to the workers and the merge of their buffers. Every run checks that
+the tokens, lines and error are the ones of lexing in one process.
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from concurrent.futures import ProcessPoolExecutor
+
+from lexical_analyzer import Lexer
+from program_generator import generate
+
+
+def best_of(runs, function, *args):
+    """Fastest seconds of runs calls of function(*args), and its result."""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    tokens = int(float(sys.argv[1])) if len(sys.argv) > 1 else 2_000_000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    engine = sys.argv[3] if len(sys.argv) > 3 else "regex"
+    text = generate(tokens, seed=tokens)
+
+    lexer = Lexer(engine)
+    sequential_time, expected = best_of(3, lexer.tokenize_buffer, text)
+    expected_error = lexer.error
+    print(f"{len(expected)} tokens, {len(text) / 2**20:.1f} MB, {os.cpu_count()} CPUs, engine {engine}")
+    print(f"{'workers':>7}  {'ms':>9}  {'speedup':>7}")
+    print(f"{'-':>7}  {sequential_time * 1000:9.1f}  {1:6.2f}x")
+    workers = 1
+    while workers <= max_workers:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(abs, range(workers)))  # Start every worker before timing
+            # Chunks of at least 64K characters, so small programs still split
+            parallel_time, buffer = best_of(3, lexer.tokenize_parallel, text, workers, pool, 1 << 16)
+        assert list(buffer) == list(expected) and lexer.error == expected_error
+        assert buffer.lines == expected.lines and buffer.line_starts == expected.line_starts
+        print(f"{workers:7}  {parallel_time * 1000:9.1f}  {sequential_time / parallel_time:6.2f}x", flush=True)
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
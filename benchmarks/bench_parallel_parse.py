@@ -0,0 +1,57 @@
+"""Speedup of parsing one large program with ParallelParser against
+Parser.parse() in one process, by number of workers.
+
+Usage: python benchmarks/bench_parallel_parse.py [tokens] [max_workers] [error_kind]
+
+The program has tokens tokens (1M by default), thousands of top level
+statements, and the workers go 2, 4, ... up to max_workers (the number of
+CPUs by default, at least 2). Each parallel time includes starting the
+worker processes, which copy the tokens and index them, and copying the
+statements they parsed into one tree. With error_kind, the program has an
+error of that kind halfway in. Every run checks that the tree and the first
+error are the ones of parsing in one process.
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from lexical_analyzer import Lexer
+from parallel_parser import ParallelParser
+from parser import Parser
+from program_generator import generate
+
+
+def parse(parser):
+    """Seconds parser.parse() takes, the parse tree and its first error."""
+    start = time.perf_counter()
+    parser.parse()
+    elapsed = time.perf_counter() - start
+    first_error = parser.parse_tree.find_first_error()
+    return elapsed, parser.parse_tree, None if first_error is None else str(first_error)
+
+
+def main():
+    tokens = int(float(sys.argv[1])) if len(sys.argv) > 1 else 1_000_000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else max(os.cpu_count() or 1, 2)
+    error_kind = sys.argv[3] if len(sys.argv) > 3 else None
+    options = {"error_at": 0.5, "error_kind": error_kind} if error_kind else {}
+    buffer = Lexer("regex").tokenize_buffer(generate(tokens, seed=tokens, **options))
+
+    sequential_time, tree, first_error = parse(Parser.from_buffer(buffer))
+    print(f"{len(buffer)} tokens, {os.cpu_count()} CPUs, first error {first_error}")
+    print(f"{'workers':>7}  {'ms':>9}  {'speedup':>7}")
+    print(f"{'-':>7}  {sequential_time * 1000:9.1f}  {1:6.2f}x")
+    expected = tree.print_tree()
+    workers = 2
+    while workers <= max_workers:
+        parallel_time, parallel_tree, parallel_error = parse(ParallelParser.from_buffer(buffer, workers))
+        assert parallel_error == first_error and parallel_tree.print_tree() == expected
+        print(f"{workers:7}  {parallel_time * 1000:9.1f}  {sequential_time / parallel_time:6.2f}x", flush=True)
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
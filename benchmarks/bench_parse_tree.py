@@ -0,0 +1,53 @@
+"""Memory held by the parse tree and memory blocks allocated while parsing.
+
+Usage: python benchmarks/bench_parse_tree.py [copies]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from lexical_analyzer import Lexer
+from parser import Parser
+
+
+def count_nodes(node):
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if hasattr(node, "children"):
+            stack.extend(node.children)
+    return count
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    text = "".join(open(os.path.join(ROOT, "Assignment2_TestCases", "input17.txt")).read() + "\n"
+                   for _ in range(copies))
+    buffer = Lexer("regex").tokenize_buffer(text)
+    parser = Parser.from_buffer(buffer)
+
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    start = time.perf_counter()
+    parser.parse()
+    elapsed = time.perf_counter() - start
+    parser.index = None
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sys.getallocatedblocks() - blocks
+
+    nodes = count_nodes(parser.parse_tree)
+    print(f"{len(text)} source characters, {len(buffer)} tokens, {nodes} tree nodes")
+    print(f"tree holds {held / 2**20:6.1f} MB ({held / nodes:5.1f} bytes/node, {held / len(text):4.2f} bytes/source char),"
+          f" peak {peak / 2**20:6.1f} MB")
+    print(f"{blocks} memory blocks still allocated after parsing ({blocks / nodes:4.2f} per node), {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
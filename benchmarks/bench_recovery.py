@@ -0,0 +1,99 @@
+"""Cost of find_all_errors() on generated programs with one error every 1K
+tokens, from 10K tokens up to max_tokens, ten times more each step.
+
+Usage: python benchmarks/bench_recovery.py [max_tokens] [max_errors]
+
+Each program is a run of 1K token generated programs, each broken by one error
+of the next kind of program_generator.ERROR_KINDS, and every one of those
+errors must be reported. The slope column is how the time grows against the
+token count since the previous size: about 1 for linear work. The last column
+is the time the same errors would take found one at a time, as one
+analyze_source() of the whole input per error. A last run puts the errors on
+back to back lines, one broken statement per line, where skipping the rest
+of a line after one error would hide the next.
+"""
+import math
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from lexical_analyzer import analyze_source
+from program_generator import ERROR_KINDS, ProgramGenerator
+from recovery import find_all_errors
+
+PART_TOKENS = 1000
+ADJACENT_LINES = 1000
+ADJACENT_KINDS = ("semicolon", "operand", "string")  # Errors that stay on their line
+
+
+def broken_program(tokens):
+    """Source text with an error in every PART_TOKENS tokens, and the messages of those errors."""
+    parts = []
+    expected = []
+    lines = 0
+    for part in range(tokens // PART_TOKENS):
+        text = ProgramGenerator(PART_TOKENS, error_at=0.5, error_kind=ERROR_KINDS[part % len(ERROR_KINDS)],
+                                seed=part).generate()
+        message, line = analyze_source(text).first_error.rsplit(" at line ", 1)
+        expected.append(f"{message} at line {int(line) + lines}")
+        lines += text.count("\n")
+        parts.append(text)
+    return "".join(parts), expected
+
+
+def back_to_back_program(lines):
+    """Source text with an error on each of its first lines lines, and the messages of those errors."""
+    parts = []
+    expected = []
+    generator = ProgramGenerator(seed=lines)
+    for line in range(lines):
+        generator.error_kind = ADJACENT_KINDS[line % len(ADJACENT_KINDS)]
+        text = generator.broken_statement()[0] + "\n"
+        message, at = analyze_source(text + "end = 1;\n").first_error.rsplit(" at line ", 1)
+        expected.append(f"{message} at line {int(at) + line}")
+        parts.append(text)
+    return "".join(parts) + "end = 1;\n", expected
+
+
+def main():
+    max_tokens = int(float(sys.argv[1])) if len(sys.argv) > 1 else 1_000_000
+    max_errors = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    print(f"{'tokens':>10} {'errors':>7} {'reported':>8} {'tokens/sec':>12} {'slope':>5} {'one at a time':>14}")
+    previous = None
+    size = 10 * PART_TOKENS
+    while size <= max_tokens:
+        text, expected = broken_program(size)
+        limit = len(expected) * 10 if max_errors is None else max_errors
+        start = time.perf_counter()
+        reported = [str(error) for error in find_all_errors(text, limit)]
+        elapsed = time.perf_counter() - start
+        if max_errors is None:
+            missed = [message for message in expected if message not in reported]
+            assert not missed, missed[:5]
+        else:
+            assert len(reported) <= max_errors, len(reported)
+        start = time.perf_counter()
+        analyze_source(text)
+        one_at_a_time = (time.perf_counter() - start) * len(expected)
+        slope = ""
+        if previous is not None:
+            slope = f"{math.log(elapsed / previous[1]) / math.log(size / previous[0]):.2f}"
+        print(f"{size:10} {len(expected):7} {len(reported):8} {size / elapsed:12,.0f} {slope:>5} {one_at_a_time:13.1f}s",
+              flush=True)
+        previous = size, elapsed
+        size *= 10
+
+    text, expected = back_to_back_program(ADJACENT_LINES)
+    start = time.perf_counter()
+    reported = [str(error) for error in find_all_errors(text, len(expected) * 10)]
+    elapsed = time.perf_counter() - start
+    assert reported == expected, [(a, b) for a, b in zip(reported, expected) if a != b][:5] or reported[len(expected):][:5]
+    print(f"{len(expected)} errors on back to back lines, all reported in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
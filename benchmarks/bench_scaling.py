@@ -0,0 +1,86 @@
+"""Tokens/sec and peak memory of lexing, Parser.parse() and find_first_error()
+on generated programs from 1K tokens up to max_tokens, ten times more each step.
+
+Usage: python benchmarks/bench_scaling.py [max_tokens] [error_kind]
+
+The slope column is how the time of a phase grows against the token count
+since the previous size: about 1 for linear work, 2 for quadratic. Timings and
+peak memory come from separate runs, since tracemalloc slows everything down.
+"""
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from lexical_analyzer import Lexer
+from parser import Parser
+from program_generator import generate
+
+PHASES = ("lex", "parse", "first_error")
+
+
+def run_phases(text):
+    """Run each phase in turn, yielding its name before and its result after it runs."""
+    yield "lex"
+    tokens = Lexer("regex").tokenize_buffer(text)
+    yield tokens
+    parser = Parser.from_buffer(tokens)
+    yield "parse"
+    parser.parse()
+    yield parser
+    yield "first_error"
+    first_error = parser.parse_tree.find_first_error()
+    yield first_error
+
+
+def measure(text, memory):
+    """{phase: seconds or peak bytes}, and the tokens and first error."""
+    results = {}
+    phases = run_phases(text)
+    for phase in phases:
+        if memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = next(phases)
+        elapsed = time.perf_counter() - start
+        if memory:
+            results[phase] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            results[phase] = elapsed
+        if phase == "lex":
+            tokens = result
+    return results, tokens, result
+
+
+def main():
+    max_tokens = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10_000_000
+    error_kind = sys.argv[2] if len(sys.argv) > 2 else None
+    options = {"error_at": 0.9, "error_kind": error_kind} if error_kind else {}
+
+    print(f"{'tokens':>10}  " + "  ".join(f"{phase + ' tokens/sec':>22} {'slope':>5} {'peak MB':>8}" for phase in PHASES))
+    previous = None
+    size = 1000
+    while size <= max_tokens:
+        text = generate(size, seed=size, **options)
+        times, tokens, first_error = measure(text, memory=False)
+        peaks, _, _ = measure(text, memory=True)
+        assert (first_error is None) == (error_kind is None), first_error
+        count = len(tokens)
+        columns = []
+        for phase in PHASES:
+            slope = ""
+            if previous is not None:
+                slope = f"{math.log(times[phase] / previous[1][phase]) / math.log(count / previous[0]):.2f}"
+            columns.append(f"{count / times[phase]:22,.0f} {slope:>5} {peaks[phase] / 2**20:8.1f}")
+        print(f"{count:10}  " + "  ".join(columns), flush=True)
+        previous = count, times
+        size *= 10
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Time to load a saved parse tree against lexing and parsing the source again.
+
+Usage: python benchmarks/bench_serialize.py [copies]
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from lexical_analyzer import Lexer
+from parser import Parser, ParseTree, Node
+
+
+def reparse(text):
+    parser = Parser.from_buffer(Lexer("regex").tokenize_buffer(text))
+    parser.parse()
+    return parser.tree
+
+
+def best_time(function, argument, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(argument)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    text = "".join(open(os.path.join(ROOT, "Assignment2_TestCases", name)).read() + "\n"
+                   for name in ("input17.txt", "input4.txt")) * copies
+    tree, parse_time = best_time(reparse, text)
+    binary = tree.to_bytes()
+    text_json = tree.to_json()
+    print(f"{len(text)} source characters, {len(tree)} tree entries")
+    print(f"lex + parse: {parse_time:.3f}s")
+
+    for name, data, load in (("binary", binary, ParseTree.from_bytes), ("json", text_json, ParseTree.from_json)):
+        loaded, load_time = best_time(load, data)
+        assert Node(loaded, 0).print_tree() == Node(tree, 0).print_tree()
+        assert str(Node(loaded, 0).find_first_error()) == str(Node(tree, 0).find_first_error())
+        print(f"{name:6}: {len(data) / 2**20:6.2f} MB, load {load_time:.3f}s ({parse_time / load_time:5.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""p50/p99 latency and throughput of server.py under load.
+
+Usage: python benchmarks/bench_server.py [clients] [requests] [tokens] [workers]
+
+Starts the server on a Unix socket in a temporary directory, then runs clients
+concurrent connections, each sending requests generated programs of about
+tokens tokens one after another and timing every answer. One in four programs
+has an error. For comparison, the last line is the median time of checking one
+of the programs by starting a Python process for it.
+"""
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from lexical_analyzer import analyze_source
+from program_generator import ERROR_KINDS, generate
+
+PROCESS_RUNS = 5
+CHECK_IN_PROCESS = "import sys; from lexical_analyzer import analyze_source; print(analyze_source(sys.stdin.read()).first_error)"
+
+
+def programs(count, tokens):
+    """count (source, first error) pairs."""
+    sources = []
+    for seed in range(count):
+        options = {"error_at": 0.5, "error_kind": ERROR_KINDS[seed // 4 % len(ERROR_KINDS)]} if seed % 4 == 3 else {}
+        source = generate(tokens, seed=seed, **options)
+        sources.append((source, analyze_source(source).first_error))
+    return sources
+
+
+async def client(path, sources, requests, first, latencies):
+    reader, writer = await asyncio.open_unix_connection(path)
+    try:
+        for number in range(first, first + requests):
+            source, first_error = sources[number % len(sources)]
+            start = time.perf_counter()
+            writer.write(json.dumps({"id": number, "source": source}).encode() + b"\n")
+            await writer.drain()
+            answer = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - start)
+            assert answer["id"] == number and answer["first_error"] == first_error, answer
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def load(path, clients, requests, sources):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(path, sources, requests, number * requests, latencies) for number in range(clients)))
+    return latencies, time.perf_counter() - start
+
+
+def wait_for(path, server, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if server.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("the server did not start")
+        time.sleep(0.05)
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    tokens = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else os.cpu_count() or 1
+    sources = programs(64, tokens)
+
+    with tempfile.TemporaryDirectory(prefix="bench_server-") as directory:
+        path = os.path.join(directory, "server.sock")
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"), "--socket", path, "-j", str(workers)],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for(path, server)
+            asyncio.run(load(path, 1, 10, sources))  # Warm up the workers
+            latencies, elapsed = asyncio.run(load(path, clients, requests, sources))
+        finally:
+            server.terminate()
+            server.wait()
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    print(f"{clients} clients x {requests} requests of ~{tokens} tokens, {workers} workers")
+    print(f"p50 {percentiles[49] * 1000:8.2f} ms")
+    print(f"p99 {percentiles[98] * 1000:8.2f} ms")
+    print(f"max {max(latencies) * 1000:8.2f} ms")
+    print(f"{len(latencies) / elapsed:,.0f} requests/sec")
+
+    samples = []
+    for source, _ in sources[:PROCESS_RUNS]:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", CHECK_IN_PROCESS], input=source, cwd=ROOT, text=True,
+                       capture_output=True, check=True)
+        samples.append(time.perf_counter() - start)
+    print(f"process per request: {statistics.median(samples) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
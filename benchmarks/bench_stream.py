@@ -0,0 +1,56 @@
+"""Peak memory and time of list-based parsing against streaming parsing.
+
+Usage: python benchmarks/bench_stream.py [copies]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from lexical_analyzer import Lexer
+from parser import Parser
+
+
+def parse_lists(text):
+    token_list, lexemes = Lexer().tokenize(text)
+    parser = Parser(token_list, lexemes)
+    parser.parse()
+    return parser
+
+
+def parse_stream(text):
+    parser = Parser.from_stream(Lexer().iter_tokens(text))
+    parser.parse()
+    return parser
+
+
+def measure(function, text):
+    tracemalloc.start()
+    start = time.perf_counter()
+    parser = function(text)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return parser, elapsed, peak
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    text = open(os.path.join(ROOT, "Assignment2_TestCases", "input4.txt")).read() + "\n"
+    text = text * copies
+
+    list_parser, list_time, list_peak = measure(parse_lists, text)
+    stream_parser, stream_time, stream_peak = measure(parse_stream, text)
+    assert str(list_parser.parse_tree.find_first_error()) == str(stream_parser.parse_tree.find_first_error())
+
+    print(f"{copies} copies of input4.txt, {len(text)} characters")
+    print(f"lists:  {list_time:.3f}s, peak {list_peak / 1024 / 1024:.1f} MB")
+    print(f"stream: {stream_time:.3f}s, peak {stream_peak / 1024 / 1024:.1f} MB"
+          f" (window of {len(stream_parser.stream.window)} tokens)")
+
+
+if __name__ == "__main__":
+    main()
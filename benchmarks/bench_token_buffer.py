@@ -0,0 +1,47 @@
+"""Memory held by parallel token/lexeme lists against a TokenBuffer.
+
+Usage: python benchmarks/bench_token_buffer.py [tokens]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from lexical_analyzer import Lexer
+from parser import NEWLINE, COMMENT
+
+
+def measure(build, text):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(text)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current, peak
+
+
+def main():
+    target = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    sample = open(os.path.join(ROOT, "Assignment2_TestCases", "input4.txt")).read() + "\n"
+    sample_tokens = len(Lexer().tokenize(sample)[0]) - 1
+    text = sample * (target // sample_tokens + 1)
+
+    lists, list_time, list_current, list_peak = measure(Lexer("regex").tokenize, text)
+    buffer, buffer_time, buffer_current, buffer_peak = measure(Lexer("regex").tokenize_buffer, text)
+    count = len(lists[0])
+    # The buffer keeps line numbers instead of NEWLINE tokens, so it holds fewer entries
+    assert list(buffer.tokens) == [token for token in lists[0] if token != NEWLINE]
+    assert buffer.line == lists[0].count(NEWLINE) + lists[0].count(COMMENT) + 1
+
+    print(f"{count} tokens ({len(buffer)} without NEWLINE)")
+    print(f"lists:       {list_current / count:5.1f} bytes/token held, peak {list_peak / 2**20:6.1f} MB, {list_time:.2f}s")
+    print(f"TokenBuffer: {buffer_current / count:5.1f} bytes/token held, peak {buffer_peak / 2**20:6.1f} MB, {buffer_time:.2f}s"
+          f" ({len(buffer.lexeme_table)} distinct lexemes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Parse time per statement as files grow, for the statements that used to
+rescan the token list: assignments missing their semicolon and conditions.
+
+Usage: python benchmarks/bench_token_index.py [max_statements]
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from lexical_analyzer import Lexer
+from parser import Parser
+
+STATEMENTS = "x = 1\nwhile ((a + b) * (c - d) < (e)) {\n    y = 2\n}\n"
+
+
+def time_parse(text):
+    token_list, lexemes = Lexer("regex").tokenize(text)
+    parser = Parser(token_list, lexemes)
+    start = time.perf_counter()
+    parser.parse()
+    return time.perf_counter() - start, parser
+
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    count = 250
+    while count <= limit:
+        elapsed, parser = time_parse(STATEMENTS * count)
+        assert len(parser.parse_tree.children) == count * 2
+        print(f"{count * 2:7d} statements: {elapsed:6.3f}s, {elapsed / (count * 2) * 1e6:6.1f} us/statement")
+        count *= 4
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Time and peak memory of Recognizer.recognize() against Parser.parse() plus
+find_first_error() on generated programs, from 1K tokens up to max_tokens,
+ten times more each step.
+
+Usage: python benchmarks/bench_validate.py [max_tokens] [error_kind]
+
+Both start from the same lexed tokens, so lexing is left out of the numbers.
+With error_kind, each program has an error of that kind 90% of the way in.
+Every run checks that both give the same first error.
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from lexical_analyzer import Lexer
+from parser import Parser
+from program_generator import generate
+from recognizer import Recognizer
+
+
+def parse_first_error(tokens):
+    parser = Parser.from_buffer(tokens)
+    parser.parse()
+    first_error = parser.parse_tree.find_first_error()
+    return None if first_error is None else str(first_error)
+
+
+def recognize(tokens):
+    return Recognizer.from_buffer(tokens).recognize()
+
+
+def measure(function, tokens):
+    """Seconds and peak bytes of function(tokens), from separate runs, and its result."""
+    start = time.perf_counter()
+    result = function(tokens)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    function(tokens)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main():
+    max_tokens = int(float(sys.argv[1])) if len(sys.argv) > 1 else 1_000_000
+    error_kind = sys.argv[2] if len(sys.argv) > 2 else None
+    options = {"error_at": 0.9, "error_kind": error_kind} if error_kind else {}
+
+    print(f"{'tokens':>10}  {'parse ms':>10} {'peak MB':>8}  {'recognize ms':>12} {'peak MB':>8}  {'speedup':>7}")
+    size = 1000
+    while size <= max_tokens:
+        tokens = Lexer("regex").tokenize_buffer(generate(size, seed=size, **options))
+        parse_time, parse_peak, first_error = measure(parse_first_error, tokens)
+        recognize_time, recognize_peak, recognized = measure(recognize, tokens)
+        assert recognized == first_error, (recognized, first_error)
+        assert (first_error is None) == (error_kind is None), first_error
+        print(f"{len(tokens):10}  {parse_time * 1000:10.1f} {parse_peak / 2**20:8.1f}  "
+              f"{recognize_time * 1000:12.1f} {recognize_peak / 2**20:8.1f}  {parse_time / recognize_time:6.1f}x",
+              flush=True)
+        size *= 10
+
+
+if __name__ == "__main__":
+    main()
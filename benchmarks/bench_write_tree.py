@@ -0,0 +1,51 @@
+"""Memory used to dump the pretty-printed tree of a large file with print_tree()
+against streaming it with write_tree().
+
+Usage: python benchmarks/bench_write_tree.py [statements]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from lexical_analyzer import Lexer
+from parser import Parser
+
+
+def dump_string(tree, sink):
+    sink.write(tree.print_tree())
+
+
+def dump_stream(tree, sink):
+    tree.write_tree(sink)
+
+
+def measure(dump, tree):
+    with open(os.devnull, "w") as sink:
+        start = time.perf_counter()
+        dump(tree, sink)
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        dump(tree, sink)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    text = "x = y + 1;\nif (x < 2) {\n    y = 3;\n}\n" * (statements // 3)
+    parser = Parser.from_buffer(Lexer("regex").tokenize_buffer(text))
+    parser.parse()
+
+    print(f"{statements} statements, {len(parser.tree)} tree entries")
+    for name, dump in (("print_tree", dump_string), ("write_tree", dump_stream)):
+        elapsed, peak = measure(dump, parser.parse_tree)
+        print(f"{name}: peak {peak / 2**20:7.2f} MB, {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
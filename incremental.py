@@ -0,0 +1,417 @@
+import sys
+import warnings
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+from lexical_analyzer import Lexer
+from parser import NEWLINE, RIGHT_BRACE, RIGHT_PAREN, Node, Parser, ParseTree, TokenBuffer, TokenIndex
+
+# Incremental re-lexing and re-parsing of a text that is edited a little at a time.
+#
+# The lexer keeps no state between tokens, so lexing from any token boundary
+# before an edit gives the old tokens again up to the edit, and once lexing the
+# new text reaches a position that was a token boundary in the old text at or
+# after the edited span, everything after it is the old tokens again, moved by
+# the edit. Only the tokens in between are lexed, which takes in the whole of a
+# string or block comment the edit opens or closes.
+#
+# The parser is handled the same way one top level statement of program at a
+# time. A statement only reads the token before it, its own tokens and the
+# three after them, plus the total line count when a closing brace is missing,
+# so statements that read no changed token are kept. Parsing restarts from the
+# state recorded before the first statement that did, and stops as soon as it
+# is back in a recorded state at a statement after the edit, because from there
+# on it would only repeat the old parse with every line moved by the same amount.
+
+LOOKAHEAD = 3  # Tokens past its end a statement's parse may read (parse_semicolon's token_ahead(2))
+NOT_LOOKED = 1 << 30  # StatementTable.low of a statement that never looked at the bracket stack
+
+
+_ones = {}  # Item size -> (count, int with a 1 in each of count items), the longest one made so far
+
+
+def add_to_array(items, start, stop, delta, signed=False):
+    """Add delta to every item of items[start:stop], a typed array of signed ints.
+
+    The slice is turned into one big integer and delta is added to all of its
+    items at once instead of looping over them in Python. Unless signed is
+    true the items must stay non-negative, so no carry or borrow crosses
+    from one item into the next; with it, carries are masked off, which takes
+    a few more passes over the integer.
+    """
+    count = stop - start
+    if not delta or count <= 0:
+        return
+    size = items.itemsize
+    order = sys.byteorder
+    bits = size * 8 - 1
+    longest, ones = _ones.get(size, (0, 0))
+    if longest < count:
+        longest, ones = _ones[size] = count, int.from_bytes((1).to_bytes(size, order) * count, order)
+    ones >>= (longest - count) * (bits + 1)  # 1 in every item of the slice
+    with memoryview(items) as view:
+        data = view.cast('B')[start * size:stop * size]
+        value = int.from_bytes(data, order)
+        if not signed:
+            value = value + ones * delta if delta > 0 else value - ones * -delta
+        else:
+            high_mask = ones << bits
+            low_mask = high_mask - ones
+            added = ones * (delta % (2 << bits))
+            value = ((value & low_mask) + (added & low_mask)) ^ ((value ^ added) & high_mask)
+        data[:] = value.to_bytes(count * size, order)
+
+
+def relex(buffer, text, offset, removed, inserted, engine="regex"):
+    """Bring buffer, the tokens of a text, up to date after removed characters
+    at offset were replaced by inserted ones; text is the edited text.
+
+    Returns (first, stop, old_stop, line_delta): buffer[first:stop] are the
+    tokens lexed again, which replaced [first:old_stop] of the old buffer, and
+    the lines of the tokens after them moved by line_delta. old_stop is None
+    when lexing never got back in step with the old tokens, so every token
+    from first on is new.
+    """
+    starts, ends, line_starts = buffer.starts, buffer.ends, buffer.line_starts
+    # The last token that ends before the edit did not look at the edited text,
+    # not even at the character after it, so lexing restarts at its end.
+    first = bisect_left(ends, offset)
+    if first == len(ends):
+        return first, first, first, 0  # The edit is after the EOF token the lexer stopped at
+    restart = ends[first - 1] if first else 0
+    first_line_start = bisect_right(line_starts, restart)
+    delta = inserted - removed
+    edited_end = offset + inserted
+
+    region = TokenBuffer()
+    region.lexeme_table = buffer.lexeme_table
+    region.lexeme_index = buffer.lexeme_index
+    region.line_starts = array('i')
+    region.line = first_line_start
+    boundary = restart  # Where the lexer resumes after the last token
+    old_boundary = None
+    last = len(ends) - 1
+    for token, lexeme, start, end in Lexer(engine).iter_tokens(text[restart:]):
+        filler = token == NEWLINE and start == end
+        if not filler and boundary >= edited_end:
+            old = boundary - delta
+            found = bisect_left(ends, old)
+            # The old lexer resumed at old too, unless that was after its final EOF
+            if (found < last and ends[found] == old
+                    or (found := bisect_left(line_starts, old)) < len(line_starts) and line_starts[found] == old):
+                old_boundary = old
+                break
+        region.append(token, lexeme, start + restart, end + restart)
+        if not filler:
+            boundary = end + restart
+
+    if old_boundary is None:
+        old_stop = len(buffer)
+        old_line_stop = len(line_starts)
+        line_delta = 0
+        buffer.line = region.line
+    else:
+        old_stop = bisect_left(starts, old_boundary)
+        old_line_stop = bisect_right(line_starts, old_boundary)
+        line_delta = region.line - old_line_stop
+        buffer.line += line_delta
+    for name, items in region.arrays().items():
+        if name == "line_starts":
+            line_starts[first_line_start:old_line_stop] = items
+            add_to_array(line_starts, first_line_start + len(items), len(line_starts), delta)
+        else:
+            getattr(buffer, name)[first:old_stop] = items
+    stop = first + len(region)
+    add_to_array(buffer.starts, stop, len(buffer), delta)
+    add_to_array(buffer.ends, stop, len(buffer), delta)
+    add_to_array(buffer.lines, stop, len(buffer), line_delta)
+    return first, stop, None if old_boundary is None else old_stop, line_delta
+
+
+class StatementParser(Parser):
+    """Parser that notes what a statement's parse reads from outside its own
+    tokens: the total line count when a closing brace is missing, and how
+    far down the bracket stack a closing bracket looked."""
+    used_line_count = False
+    lowest_stack = NOT_LOOKED
+
+    def line_count(self, limit):
+        self.used_line_count = True
+        return super().line_count(limit)
+
+    def update_bracket_stack(self):
+        if not self.at_end() and not self.at_newline() and self.tokens[self.pos] in (RIGHT_BRACE, RIGHT_PAREN):
+            self.lowest_stack = min(self.lowest_stack, len(self.bracket_stack))
+        return super().update_bracket_stack()
+
+
+class StatementTable:
+    """Parser state before each parse_statement() call of program's loop: one
+    row per top level statement and a last one for the call that ended the
+    loop. errors is how many entries of the tree's error index come before
+    the statement, entry the statement (-1 in the last row), first and end
+    the range of tree entries its parse added, line_count whether it read
+    the total line count and low the lowest length of the bracket stack a
+    closing bracket looked at (NOT_LOOKED if none did)."""
+
+    FIELDS = ("pos", "line", "at_line", "adjust", "errors", "entry", "first", "end", "line_count", "low")
+
+    def __init__(self):
+        for name in self.FIELDS:
+            setattr(self, name, array('i'))
+        self.stacks = []  # The parser's bracket_stack as a tuple, shared with the row before when unchanged
+
+    def __len__(self):
+        return len(self.pos)
+
+    def append(self, parser):
+        self.pos.append(parser.pos)
+        self.line.append(parser.current_line)
+        self.at_line.append(parser.line_pos == parser.pos)
+        self.adjust.append(parser.line_adjust)
+        self.errors.append(len(parser.tree.errors))
+        self.entry.append(-1)
+        self.first.append(len(parser.tree))
+        self.end.append(len(parser.tree))
+        self.line_count.append(0)
+        self.low.append(NOT_LOOKED)
+        stack = tuple(parser.bracket_stack)
+        self.stacks.append(self.stacks[-1] if self.stacks and self.stacks[-1] == stack else stack)
+
+    def restore(self, row, parser):
+        parser.pos = self.pos[row]
+        parser.current_line = self.line[row]
+        parser.line_pos = parser.pos if self.at_line[row] else -1
+        parser.line_adjust = self.adjust[row]
+        parser.bracket_stack[:] = self.stacks[row]
+
+    def matches(self, row, parser, line_delta):
+        """Whether parser is in the state of row, with its lines moved by line_delta.
+        The bracket stack is left out: statements only ever push to and pop
+        from it, nothing they parse depends on it."""
+        return (self.line[row] + line_delta == parser.current_line and self.adjust[row] == parser.line_adjust
+                and bool(self.at_line[row]) == (parser.line_pos == parser.pos))
+
+    def splice(self, start, stop, rows):
+        for name in self.FIELDS:
+            getattr(self, name)[start:stop] = getattr(rows, name)
+        self.stacks[start:stop] = rows.stacks
+
+    def replace_bottom(self, start, size, bottom):
+        """Put bottom in place of the lowest size items of the stacks of rows from start on."""
+        replaced = {}
+        for row in range(start, len(self)):
+            stack = self.stacks[row]
+            if id(stack) not in replaced:
+                replaced[id(stack)] = bottom + stack[size:]
+            self.stacks[row] = replaced[id(stack)]
+
+
+def shared_top(old, new, lowest):
+    """How many items at the bottom of the bracket stack old a run of
+    statements that looked no lower than lowest never touched, if the run
+    does the same starting from new; None if it would not."""
+    if lowest == 0:
+        return len(old) if new == old else None  # It saw the stack empty
+    top = max(len(old) - lowest + 1, 0)
+    if top > len(new) or new[len(new) - top:] != old[len(old) - top:]:
+        return None
+    return len(old) - top
+
+
+def parse_statements(parser, resync=None):
+    """Run program's statement loop from parser's current state, recording a
+    StatementTable. Before each statement resync(parser) may return a row of
+    an older table to stop at. Returns the table, the statement entries and
+    that row, or None when the loop ran to its end."""
+    rows = StatementTable()
+    statements = []
+    parsed = parser.iter_statements()
+    while True:
+        if resync is not None and (row := resync(parser)) is not None:
+            return rows, statements, row
+        rows.append(parser)
+        parser.used_line_count = False
+        parser.lowest_stack = NOT_LOOKED
+        parsed_statement = next(parsed, None)
+        rows.line_count[-1] = parser.used_line_count
+        rows.low[-1] = parser.lowest_stack
+        rows.end[-1] = len(parser.tree)
+        if parsed_statement is None:
+            return rows, statements, None
+        rows.entry[-1] = parsed_statement
+        statements.append(parsed_statement)
+
+
+class Document:
+    """A source text with its TokenBuffer and ParseTree, kept up to date by
+    edit() without lexing or parsing the whole text again.
+
+    After every edit, buffer and tree (through parse_tree) give the same
+    tokens, tree and errors that analyzing the new text from scratch does.
+    The tree keeps the entries of statements that were replaced; they are no
+    longer linked into it. When the parser raises on the new text, so does
+    edit(), and the next edit analyzes the text from scratch. An update that
+    raises on text that parses is a bug: edit() warns with a RuntimeWarning
+    and analyzes the text from scratch.
+    """
+
+    def __init__(self, text, engine="regex"):
+        self.text = text
+        self.engine = engine
+        self.analyze()
+
+    @property
+    def parse_tree(self):
+        return Node(self.tree, 0)
+
+    def first_error(self):
+        """Message of the error find_first_error() reports, or None."""
+        first_error = self.parse_tree.find_first_error()
+        return None if first_error is None else str(first_error)
+
+    def analyze(self):
+        """Lex and parse the whole text."""
+        self.tree = None  # Until parsing succeeds, so the next edit starts from scratch if it does not
+        self.buffer = Lexer(self.engine).tokenize_buffer(self.text)
+        parser = StatementParser.from_buffer(self.buffer)
+        parser.index = TokenIndex(self.buffer.tokens, self.buffer.lines)
+        tree = parser.tree = ParseTree()
+        root = tree.add('program', parser.current_line)
+        self.rows, statements, _ = parse_statements(parser)
+        self.end(parser)
+        for entry in statements + self.final_errors:
+            tree.append(root, entry)
+        self.tree = tree
+
+    def end(self, parser):
+        """Add the errors program ends with, from where the statement loop stopped."""
+        self.end_rows = StatementTable()  # The state parse_end() starts from, kept to run it again
+        self.end_rows.append(parser)
+        self.final_errors = parser.parse_end()
+
+    def edit(self, offset, removed, inserted):
+        """Replace the removed characters at offset with the string inserted."""
+        if not 0 <= offset <= offset + removed <= len(self.text):
+            raise ValueError("edit outside the text")
+        self.text = self.text[:offset] + inserted + self.text[offset + removed:]
+        update_error = None
+        if self.tree is not None:
+            try:
+                self.update(offset, removed, len(inserted))
+                return
+            except (IndexError, ValueError) as error:
+                # The parser raises these on text it cannot parse, and then so does a full analysis
+                update_error = error
+        self.analyze()
+        if update_error is not None:
+            warnings.warn("incremental update raised " + repr(update_error) + " on text that parses, "
+                          "analyzed it from scratch instead", RuntimeWarning)
+
+    def update(self, offset, removed, inserted):
+        """Re-lex and re-parse what the edit changed, given the lengths of the removed and inserted text."""
+        buffer, tree, rows = self.buffer, self.tree, self.rows
+        old_line = buffer.line
+        first, stop, old_stop, line_delta = relex(buffer, self.text, offset, removed, inserted, self.engine)
+        if old_stop == first == stop and not line_delta:
+            return  # Only offsets moved
+        token_delta = 0 if old_stop is None else stop - old_stop
+
+        # The first statement that may have read a changed token, or the line
+        # count if that changed
+        row = bisect_left(rows.pos, first - LOOKAHEAD, 1) - 1
+        if buffer.line != old_line:
+            try:
+                row = rows.line_count.index(1, 0, row)
+            except ValueError:
+                pass
+
+        lowest = []  # lowest[-1 - i] is the lowest stack rows i and after looked at, filled in when needed
+        bottom = None
+
+        def resync(parser):
+            nonlocal bottom
+            if old_stop is None or parser.pos <= stop:
+                return None
+            old_pos = parser.pos - token_delta
+            found = bisect_left(rows.pos, old_pos, row)
+            if found == len(rows) or rows.pos[found] != old_pos or not rows.matches(found, parser, line_delta):
+                return None
+            old_stack, new_stack = rows.stacks[found], tuple(parser.bracket_stack)
+            if new_stack != old_stack:
+                if not lowest:
+                    lowest.extend(accumulate(reversed(rows.low), min))
+                size = shared_top(old_stack, new_stack, lowest[-1 - found])
+                if size is None:
+                    return None
+                bottom = size, new_stack[:len(new_stack) - len(old_stack) + size]
+            return found
+
+        parser = StatementParser.from_buffer(buffer)
+        parser.tree = tree
+        rows.restore(row, parser)
+        mark = len(tree.errors)
+        error_start = rows.errors[row]
+        new_rows, statements, synced = parse_statements(parser, resync)
+        add_to_array(new_rows.errors, 0, len(new_rows), error_start - mark)
+        new_errors = tree.errors[mark:]
+        del tree.errors[mark:]
+        previous = rows.entry[row - 1] if row else -1
+
+        if synced is None:
+            tree.errors[error_start:] = new_errors
+            tree.splice(0, previous, -1, rows.entry[row:-1].tolist() + self.final_errors, statements)
+            rows.splice(row, len(rows), new_rows)
+            self.end(parser)
+            tree.splice(0, statements[-1] if statements else previous, -1, [], self.final_errors)
+            return
+
+        last = len(rows) - 1
+        if synced < last:
+            following = rows.entry[synced]
+        else:
+            following = self.final_errors[0] if self.final_errors else -1
+        error_stop = rows.errors[synced]
+        tree.errors[error_start:error_stop] = new_errors
+        error_delta = len(new_errors) - (error_stop - error_start)
+        tree.splice(0, previous, following, rows.entry[row:synced].tolist(), statements)
+        if line_delta:
+            self.move_lines(synced, last, line_delta)
+        rows.splice(row, synced, new_rows)
+        kept = row + len(new_rows)
+        add_to_array(rows.pos, kept, len(rows), token_delta)
+        add_to_array(rows.line, kept, len(rows), line_delta)
+        add_to_array(rows.errors, kept, len(rows), error_delta)
+        end_rows = self.end_rows
+        add_to_array(end_rows.pos, 0, 1, token_delta)
+        add_to_array(end_rows.line, 0, 1, line_delta)
+        if bottom is None:
+            return
+
+        # The statements after the edit left what was below them on the
+        # bracket stack alone, but that is different now, so the stack they
+        # end with and the errors program ends with change too
+        size, new_bottom = bottom
+        rows.replace_bottom(kept, size, new_bottom)
+        end_rows.replace_bottom(0, size, new_bottom)
+        del tree.errors[len(tree.errors) - len(self.final_errors):]
+        old_final_errors = self.final_errors
+        end_rows.restore(0, parser)
+        self.end(parser)
+        last_statement = rows.entry[len(rows) - 2] if len(rows) > 1 else -1
+        tree.splice(0, last_statement, -1, old_final_errors, self.final_errors)
+
+    def move_lines(self, start, stop, line_delta):
+        """Move the lines of the tree entries of statements start to stop and of
+        the final errors by line_delta."""
+        lines = self.tree.lines
+        run_first = run_end = -1
+        for first, end in zip(self.rows.first[start:stop], self.rows.end[start:stop]):
+            if first != run_end:
+                add_to_array(lines, run_first, run_end, line_delta, signed=True)
+                run_first = first
+            run_end = end
+        add_to_array(lines, run_first, run_end, line_delta, signed=True)
+        for error in self.final_errors:
+            lines[error] += line_delta
@@ -1,6 +1,8 @@
 import os
+import re
+import sys
 
-from parser import Parser, Node
+from parser import Parser, Node, SourceTokenBuffer, TokenBuffer
 
 # Global declarations
 # Variables
@@ -8,235 +10,495 @@ charClass = 0
 lexeme = ''
 error = ''
 nextChar = ''
-token = 0
+nextToken = 0
+in_fp = None
+
+CHUNK_SIZE = 1 << 16
+
+# ASCII character runs the lexer consumes in one step. Anything outside ASCII
+# still goes through getChar() one character at a time.
+IDENT_RUN = re.compile(r'[A-Za-z0-9_]*')
+DIGIT_RUN = re.compile(r'[0-9]*')
+BLANK_RUN = re.compile(r'[ \t\r\x0b\x0c\x1c-\x1f]*')
+STRING_RUN = re.compile(r'[^"]*')
+LINE_COMMENT_RUN = re.compile(r'[^\n]*')
+BLOCK_COMMENT_RUN = re.compile(r'[^*\n]*')
+
+# Bytes that keep a file from being lexed through a memory map: its text is
+# only plain ASCII with '\n' line ends, where byte and character offsets agree.
+# Compiled by re when a file is first mapped, not on import.
+NOT_MAPPABLE = rb'[\x80-\xff\r]'
+
+
+class SourceBuffer:
+    """Character source for the lexer.
+
+    Takes either a whole ``str`` or a text file object. Files are read
+    CHUNK_SIZE characters at a time and the lexer steps through the buffer
+    with an index, instead of calling ``in_fp.read(1)`` for every character.
+    """
+
+    def __init__(self, source, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.pos = 0
+        self.base = 0  # Offset of buffer[0] in the whole input
+        if isinstance(source, str):
+            self.fp = None
+            self.buffer = source
+        else:
+            self.fp = source
+            self.buffer = source.read(chunk_size)
+
+    @classmethod
+    def from_file(cls, path, chunk_size=CHUNK_SIZE):
+        return cls(open(path, "r"), chunk_size)
+
+    def fill(self):
+        if self.fp is None:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.fp = None
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.base += self.pos
+        self.pos = 0
+        return True
+
+    def peek(self):
+        if self.pos >= len(self.buffer) and not self.fill():
+            return ''
+        return self.buffer[self.pos]
+
+    def advance(self):
+        try:
+            ch = self.buffer[self.pos]
+        except IndexError:
+            if not self.fill():
+                return ''
+            ch = self.buffer[self.pos]
+        self.pos += 1
+        return ch
+
+    def take(self, run):
+        """Consume and return the characters matched by the compiled pattern run."""
+        start = self.pos
+        end = run.match(self.buffer, start).end()
+        self.pos = end
+        if end < len(self.buffer) or self.fp is None:
+            return self.buffer[start:end]
+        # The run reaches the end of the chunk, so it may continue in the next one
+        parts = [self.buffer[start:end]]
+        while self.pos == len(self.buffer) and self.fill():
+            end = run.match(self.buffer, 0).end()
+            parts.append(self.buffer[:end])
+            self.pos = end
+        return ''.join(parts)
+
+    def skip(self, run):
+        self.pos = run.match(self.buffer, self.pos).end()
+        while self.pos == len(self.buffer) and self.fill():
+            self.pos = run.match(self.buffer, self.pos).end()
 
 
 # Function declarations
-def addChar():
-    global lexeme
-    if len(lexeme) <= 98:
-        lexeme += nextChar
+def char_class(ch):
+    if ch:
+        if ch.isalpha():
+            return LETTER
+        elif ch == '_':
+            return UNDERSCORE
+        elif ch.isdigit():
+            return DIGIT
+        elif ch == '\n':
+            return NEWLINE
+        else:
+            return UNKNOWN
     else:
-        print("Error - lexeme is too long")
+        return EOF
+
+
+class Lexer:
+    """Lexer that owns all of its scanning state, so separate instances can run
+    at the same time (one per thread, for example).
+
+    engine selects the scanner used by tokenize(): "classic" is the state
+    machine below, "regex" is the compiled master regex in regex_lexer and
+    "vector" the NumPy pre-pass in vector_lexer, which falls back to "regex"
+    when NumPy is not installed.
+    """
+
+    def __init__(self, engine="classic"):
+        if engine not in ENGINES:
+            raise ValueError("Unknown lexer engine " + repr(engine))
+        self.engine = engine
+        self.char_class = 0
+        self.lexeme = ''
+        self.error = ''
+        self.next_char = ''
+        self.next_token = 0
+        self.source = None
+        self.token_start = 0
+        self.token_end = 0
+
+    def open(self, source):
+        """Start lexing source, a str, a text file object or a SourceBuffer."""
+        if not isinstance(source, SourceBuffer):
+            source = SourceBuffer(source)
+        self.source = source
+        self.lexeme = ''
+        self.error = ''
+        self.next_token = 0
+        self.get_char()
+
+    def add_char(self):
+        if len(self.lexeme) <= 98:
+            self.lexeme += self.next_char
+        else:
+            print("Error - lexeme is too long")
+
+    def add_run(self, run):
+        if len(self.lexeme) + len(run) <= 99:
+            self.lexeme += run
+            return
+        room = max(99 - len(self.lexeme), 0)
+        self.lexeme += run[:room]
+        for _ in range(len(run) - room):
+            print("Error - lexeme is too long")
+
+    def get_char(self):
+        try:
+            self.next_char = self.source.advance()
+        except Exception as e:
+            self.next_char = ''
+        try:
+            self.char_class = CHAR_CLASSES[self.next_char]
+        except KeyError:
+            self.char_class = char_class(self.next_char)
+
+    def offset(self):
+        """Offset of next_char in the whole input."""
+        if self.next_char:
+            return self.source.base + self.source.pos - 1
+        return self.source.base + self.source.pos
+
+    def get_non_blank(self):
+        while self.next_char.isspace() and self.next_char != '\n':
+            self.source.skip(BLANK_RUN)
+            self.get_char()
+
+    def lex(self):
+        self.lexeme = ''
+        self.get_non_blank()
+        self.token_start = self.offset()
+        source = self.source
+        if self.char_class == LETTER or self.char_class == UNDERSCORE:
+            self.add_char()
+            self.add_run(source.take(IDENT_RUN))
+            self.get_char()
+            while self.char_class == LETTER or self.char_class == DIGIT or self.char_class == UNDERSCORE:
+                self.add_char()
+                self.add_run(source.take(IDENT_RUN))
+                self.get_char()
+
+            if self.lexeme in KEYWORDS:
+                self.next_token = KEYWORDS[self.lexeme]
+            elif self.char_class == UNKNOWN and not self.next_char.isspace() and self.next_char not in "(+-*/<>)":
+                self.add_char()
+                self.get_char()  # The offending character is part of the lexeme
+                self.error = "Error - illegal identifier"
+                self.next_token = EOF
+            else:
+                self.next_token = IDENT
+
+        elif self.char_class == DIGIT:
+            self.add_char()
+            self.add_run(source.take(DIGIT_RUN))
+            self.get_char()
+            while self.char_class == DIGIT:
+                self.add_char()
+                self.add_run(source.take(DIGIT_RUN))
+                self.get_char()
+            if self.next_char == ".":
+                self.add_char()  # Include the decimal point
+                self.add_run(source.take(DIGIT_RUN))
+                self.get_char()
+                while self.char_class == DIGIT:
+                    self.add_char()
+                    self.add_run(source.take(DIGIT_RUN))
+                    self.get_char()
+                self.next_token = FLOAT_LIT
+            elif self.char_class == LETTER or self.next_char == "_":
+                while self.char_class == LETTER or self.char_class == DIGIT or self.next_char == "_":
+                    self.add_char()
+                    self.add_run(source.take(IDENT_RUN))
+                    self.get_char()
+                self.error = "Error - illegal identifier"
+                self.next_token = EOF
+            else:
+                self.next_token = INT_LIT
+        elif self.next_char == "\"":
+            self.add_char()
+            self.get_char()
+            while self.next_char != "\"" and self.next_char != "":
+                self.add_char()
+                self.add_run(source.take(STRING_RUN))
+                self.get_char()
+            if self.next_char == "\"":
+                self.add_char()  # Include the closing double quote
+                self.get_char()
+
+                self.next_token = STR_LIT
+            else:
+                self.error = "Error - unclosed string literal"
+                self.next_token = EOF
+
+        elif self.char_class == UNKNOWN:
+            self.lookup(self.next_char)
+            self.get_char()
+
+        elif self.char_class == NEWLINE:
+            self.get_char()
+
+            self.next_token = NEWLINE
+            self.lexeme = 'NEWLINE'
+
+        elif self.char_class == EOF:
+            self.next_token = EOF
+            self.lexeme = 'EOF'
+
+        self.token_end = self.offset()
+        return self.next_token, self.lexeme
+
+    def lookup(self, ch):
+        if ch in SINGLE_CHAR_TOKENS:
+            self.add_char()
+            self.next_token = SINGLE_CHAR_TOKENS[ch]
+        elif ch == '/':
+            self.add_char()
+            self.get_char()
+            if self.next_char == '/':
+                while self.next_char != '\n' and self.next_char != '':
+                    self.source.skip(LINE_COMMENT_RUN)
+                    self.get_char()
+                self.next_token = COMMENT, 1
+                self.lexeme = "a single line comment"
+            elif self.next_char == '*':
+                self.add_char()
+                self.get_char()
+                comment_line_length = 1
+                while not (self.next_char == '*' and self.source.advance() == '/'):
+                    if self.next_char == '\n':
+                        comment_line_length += 1
+                    if self.next_char == '':
+                        self.error = "Error - unclosed block comment"
+                        self.next_token = EOF
+                        break
+                    self.source.skip(BLOCK_COMMENT_RUN)
+                    self.get_char()
+                self.get_char()  # Consume the '/'
+                self.next_token = COMMENT, comment_line_length
+                self.lexeme = "a block comment"
+            else:
+                self.next_token = DIV_OP
+        elif ch in TWO_CHAR_TOKENS:
+            second, pair_token, single_token = TWO_CHAR_TOKENS[ch]
+            self.add_char()
+            self.get_char()
+            if self.next_char == second:
+                self.add_char()
+                self.next_token = pair_token
+            else:
+                self.next_token = single_token
+        else:
+            self.add_char()
+            self.next_token = EOF
+
+    def scanner(self):
+        """Module that scans ASCII strings for the regex and vector engines,
+        imported here so the classic engine never loads them."""
+        if self.engine == "vector":
+            import vector_lexer
+            if vector_lexer.available():
+                return vector_lexer
+        import regex_lexer
+        return regex_lexer
+
+    def iter_tokens(self, source):
+        """Lazily yield (token, lexeme, start, end) tuples until EOF, expanding
+        each comment into its NEWLINE filler. start and end are the offsets of
+        the characters the token was scanned from.
+
+        source is a str, a text file object or a SourceBuffer. Only a pure ASCII
+        str goes through the regex or vector engine; everything else is lexed
+        by the classic engine.
+        """
+        if self.engine != "classic" and isinstance(source, str) and source.isascii():
+            errors = []
+            yield from self.scanner().iter_tokens(source, errors)
+            self.error = errors[-1] if errors else ''
+            return
+        self.open(source)
+        next_token = 0
+        while next_token != EOF:
+            next_token, lexeme = self.lex()
+
+            if isinstance(next_token, tuple):
+                yield next_token[0], lexeme, self.token_start, self.token_end
+                for j in range(next_token[1] - 1):
+                    yield NEWLINE, 'NEWLINE', self.token_end, self.token_end
+            else:
+                yield next_token, lexeme, self.token_start, self.token_end
+
+    def tokenize(self, source):
+        """Lex a whole source string into parallel token and lexeme lists."""
+        if self.engine != "classic" and isinstance(source, str) and source.isascii():
+            token_list, lexemes, self.error = self.scanner().tokenize(source)
+            return token_list, lexemes
+        token_list = []
+        lexemes = []
+        for token, lexeme, start, end in self.iter_tokens(source):
+            token_list.append(token)
+            lexemes.append(lexeme)
+        return token_list, lexemes
+
+    def tokenize_buffer(self, source):
+        """Lex source into a TokenBuffer instead of parallel lists, with line numbers and
+        offsets in place of NEWLINE tokens."""
+        if isinstance(source, str):
+            return TokenBuffer.from_tokens(self.iter_tokens(source))
+        with open(source, "r") as fp:
+            return TokenBuffer.from_tokens(self.iter_tokens(fp.read() if self.engine != "classic" else fp))
+
+    def tokenize_parallel(self, source, workers=None, pool=None, min_chunk=None):
+        """tokenize_buffer(source) on workers processes, or on pool, a
+        ProcessPoolExecutor, for a large ASCII source string: it is cut into
+        chunks at the start of lines by parallel_lexer.tokenize(), whatever the
+        engine, which gives the same tokens, in chunks of at least min_chunk
+        characters (parallel_lexer.MIN_CHUNK by default). Anything else is
+        lexed by tokenize_buffer()."""
+        if not isinstance(source, str) or not source.isascii():
+            return self.tokenize_buffer(source)
+        import parallel_lexer
+        if min_chunk is None:
+            min_chunk = parallel_lexer.MIN_CHUNK
+        buffer, self.error = parallel_lexer.tokenize(source, workers, self.engine, pool, min_chunk)
+        return buffer
+
+    def tokenize_mapped(self, path):
+        """Lex the file at path into a SourceTokenBuffer over a read-only memory
+        map of it, so tokens only keep their offsets and no lexeme is made
+        until one is looked at. The file is scanned as bytes by the regex
+        engine's master regex, whatever the engine, which gives the same
+        tokens. A file that is empty, not ASCII or has '\r' characters, whose
+        text does not match its bytes, is lexed by tokenize_buffer() instead."""
+        import mmap
+        import regex_lexer
+        with open(path, "rb") as fp:
+            if os.fstat(fp.fileno()).st_size == 0:
+                return self.tokenize_buffer("")
+            source = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if re.search(NOT_MAPPABLE, source):
+            source.close()
+            with open(path, "r") as fp:
+                return self.tokenize_buffer(fp.read())
+        errors = []
+        buffer = SourceTokenBuffer.from_spans(source, regex_lexer.span_lexeme, regex_lexer.iter_spans(source, errors))
+        self.error = errors[-1] if errors else ''
+        return buffer
+
+    def tokenize_file(self, path):
+        with open(path, "r") as fp:
+            if self.engine != "classic":
+                return self.tokenize(fp.read())
+            return self.tokenize(fp)
+
+
+# Module level functions, kept as thin wrappers over a shared Lexer that reads from in_fp
+_lexer = None
+_lexer_fp = None  # The in_fp _lexer reads from, a file wrapped in a SourceBuffer as Lexer.open() does
 
 
 def getChar():
-    global nextChar, charClass
-    try:
-        nextChar = in_fp.read(1)
-    except Exception as e:
-        nextChar = ''
-    if nextChar:
-        if nextChar.isalpha():
-            charClass = LETTER
-        elif nextChar == '_':
-            charClass = UNDERSCORE
-        elif nextChar.isdigit():
-            charClass = DIGIT
-        elif nextChar == '\n':
-            charClass = NEWLINE
+    global nextChar, charClass, _lexer, _lexer_fp
+    if _lexer is None or _lexer_fp is not in_fp:
+        _lexer = Lexer()
+        if hasattr(in_fp, "advance"):
+            _lexer.source = in_fp  # Already a character source with the interface of SourceBuffer
         else:
-            charClass = UNKNOWN
-    else:
-        charClass = EOF
+            # Nothing to read from reads as EOF, as in_fp.read(1) failing always did
+            _lexer.source = SourceBuffer(in_fp if in_fp is not None else '')
+        _lexer_fp = in_fp
+    _lexer.get_char()
+    nextChar, charClass = _lexer.next_char, _lexer.char_class
 
 
-def getNonBlank():
-    while nextChar.isspace() and nextChar != '\n':
-        getChar()
+def lex():
+    global lexeme, nextToken, error
+    nextToken, lexeme = _lexer.lex()
+    error = _lexer.error
+    return nextToken, lexeme
 
 
-def lex():
-    global lexeme, nextToken, charClass, error
-    lexeme = ''
-    getNonBlank()
-    if charClass == LETTER or charClass == UNDERSCORE:
-        addChar()
-        getChar()
-        while charClass == LETTER or charClass == DIGIT or charClass == UNDERSCORE:
-            addChar()
-            getChar()
+def tokenize(text, engine="classic"):
+    global error
+    lexer = Lexer(engine)
+    result = lexer.tokenize(text)
+    error = lexer.error
+    return result
 
-        if lexeme == "if":
-            nextToken = IF
-        elif lexeme == "else":
-            nextToken = ELSE
-        elif lexeme == "for":
-            nextToken = FOR
-        elif lexeme == "while":
-            nextToken = WHILE
-        elif charClass == UNKNOWN and not nextChar.isspace() and nextChar not in "(+-*/<>)":
-            addChar()
-            error = "Error - illegal identifier"
-            nextToken = EOF
-        else:
-            nextToken = IDENT
 
-    elif charClass == DIGIT:
-        addChar()
-        getChar()
-        while charClass == DIGIT:
-            addChar()
-            getChar()
-        if nextChar == ".":
-            addChar()  # Include the decimal point
-            getChar()
-            while charClass == DIGIT:
-                addChar()
-                getChar()
-            nextToken = FLOAT_LIT
-        elif charClass == LETTER or nextChar == "_":
-            while charClass == LETTER or charClass == DIGIT or nextChar == "_":
-                addChar()
-                getChar()
-            error = "Error - illegal identifier"
-            nextToken = EOF
-        else:
-            nextToken = INT_LIT
-    elif nextChar == "\"":
-        addChar()
-        getChar()
-        while nextChar != "\"" and nextChar != "":
-            addChar()
-            getChar()
-        if nextChar == "\"":
-            addChar()  # Include the closing double quote
-            getChar()
+def tokenize_file(path, engine="classic"):
+    global error
+    lexer = Lexer(engine)
+    result = lexer.tokenize_file(path)
+    error = lexer.error
+    return result
 
-            nextToken = STR_LIT
-        else:
-            error = "Error - unclosed string literal"
-            nextToken = EOF
 
-    elif charClass == UNKNOWN:
-        lookup(nextChar)
-        getChar()
+ENGINES = ("classic", "regex", "vector")
 
-    elif charClass == NEWLINE:
-        getChar()
 
-        nextToken = NEWLINE
-        lexeme = 'NEWLINE'
+class Analysis:
+    """Tokens (a TokenBuffer), parse tree (a ParseTree) and first error message
+    (None without errors) of one source."""
+    __slots__ = ('tokens', 'tree', 'first_error')
 
+    def __init__(self, tokens, tree, first_error):
+        self.tokens = tokens
+        self.tree = tree
+        self.first_error = first_error
 
-    elif charClass == EOF:
-        nextToken = EOF
-        lexeme = 'EOF'
+    @property
+    def parse_tree(self):
+        """Root Node of the tree."""
+        return Node(self.tree, 0)
 
-    # print(f"Next token is: {nextToken}, Next lexeme is {lexeme}")
-    # print(f"\t{error}")
 
-    return nextToken, lexeme
+def analyze_source(text, engine="regex", stats=None):
+    """Lex and parse a source string. With stats, a stats.Stats, the analysis is
+    timed and counted into it."""
+    if stats is not None:
+        return stats.analyze(text, engine)
+    tokens = Lexer(engine).tokenize_buffer(text)
+    parser = Parser.from_buffer(tokens)
+    parser.parse()
+    first_error = parser.parse_tree.find_first_error()
+    return Analysis(tokens, parser.tree, None if first_error is None else str(first_error))
 
 
-def lookup(ch):
-    global nextToken, lexeme, error
-    if ch == '(':
-        addChar()
-        nextToken = LEFT_PAREN
-    elif ch == ')':
-        addChar()
-        nextToken = RIGHT_PAREN
-    elif ch == '{':
-        addChar()
-        nextToken = LEFT_BRACE
-    elif ch == '}':
-        addChar()
-        nextToken = RIGHT_BRACE
-    elif ch == '+':
-        addChar()
-        nextToken = ADD_OP
-    elif ch == '-':
-        addChar()
-        nextToken = SUB_OP
-    elif ch == '*':
-        addChar()
-        nextToken = MULT_OP
-    elif ch == '/':
-        addChar()
-        getChar()
-        if nextChar == '/':
-            while nextChar != '\n' and nextChar != '':
-                getChar()
-            nextToken = COMMENT, 1
-            lexeme = "a single line comment"
-        elif nextChar == '*':
-            addChar()
-            getChar()
-            comment_line_length = 1
-            while not (nextChar == '*' and in_fp.read(1) == '/'):
-                if nextChar == '\n':
-                    comment_line_length += 1
-                if nextChar == '':
-                    error = "Error - unclosed block comment"
-                    nextToken = EOF
-                    break
-                getChar()
-            getChar()  # Consume the '/'
-            nextToken = COMMENT, comment_line_length
-            lexeme = "a block comment"
-        else:
-            nextToken = DIV_OP
-    elif ch == '=':
-        addChar()
-        getChar()
-        if nextChar == '=':
-            addChar()
-            nextToken = EQUALS
-        else:
-            nextToken = ASSIGN_OP
-    elif ch == ';':
-        addChar()
-        nextToken = SEMICOLON
-    elif ch == '<':
-        addChar()
-        getChar()
-        if nextChar == '=':
-            addChar()
-            nextToken = LESS_THAN
-        else:
-            nextToken = LESS_THAN
-    elif ch == '>':
-        addChar()
-        getChar()
-        if nextChar == '=':
-            addChar()
-            nextToken = GREATER_THAN
-        else:
-            nextToken = GREATER_THAN
-    elif ch == '!':
-        addChar()
-        getChar()
-        if nextChar == '=':
-            addChar()
-            nextToken = NOT_EQUALS
-        else:
-            nextToken = UNKNOWN
-    elif ch == '&':
-        addChar()
-        getChar()
-        if nextChar == '&':
-            addChar()
-            nextToken = AND_OP
-        else:
-            nextToken = UNKNOWN
-    elif ch == '|':
-        addChar()
-        getChar()
-        if nextChar == '|':
-            addChar()
-            nextToken = OR_OP
-        else:
-            nextToken = UNKNOWN
-    elif ch == '?':
-        addChar()
-        nextToken = QUESTION_MARK
-    elif ch == ':':
-        addChar()
-        nextToken = COLON
-    else:
-        addChar()
-        nextToken = EOF
+def analyze_file(path, engine="regex", stats=None, mapped=False):
+    """Lex and parse the file at path. With mapped and no stats, the file is
+    lexed through a memory map by Lexer.tokenize_mapped(), and the tree reads
+    its lexemes from there."""
+    if mapped and stats is None:
+        tokens = Lexer(engine).tokenize_mapped(path)
+        parser = Parser.from_buffer(tokens)
+        parser.parse()
+        first_error = parser.parse_tree.find_first_error()
+        return Analysis(tokens, parser.tree, None if first_error is None else str(first_error))
+    with open(path, "r") as fp:
+        return analyze_source(fp.read(), engine, stats)
 
 
 # Character classes
@@ -276,6 +538,28 @@ QUESTION_MARK = 41
 COLON = 42
 NEWLINE = 43
 
+# Character class of every ASCII character and of '' (end of input)
+CHAR_CLASSES = {chr(i): char_class(chr(i)) for i in range(128)}
+CHAR_CLASSES[''] = EOF
+
+KEYWORDS = {"if": IF, "else": ELSE, "for": FOR, "while": WHILE}
+
+SINGLE_CHAR_TOKENS = {
+    '(': LEFT_PAREN, ')': RIGHT_PAREN, '{': LEFT_BRACE, '}': RIGHT_BRACE, '+': ADD_OP, '-': SUB_OP,
+    '*': MULT_OP, ';': SEMICOLON, '?': QUESTION_MARK, ':': COLON,
+}
+
+# Operators that look at the next character for a two character form:
+# first character -> (second character, token for the pair, token for the first character alone)
+TWO_CHAR_TOKENS = {
+    '=': ('=', EQUALS, ASSIGN_OP),
+    '<': ('=', LESS_THAN, LESS_THAN),
+    '>': ('=', GREATER_THAN, GREATER_THAN),
+    '!': ('=', NOT_EQUALS, UNKNOWN),
+    '&': ('&', AND_OP, UNKNOWN),
+    '|': ('|', OR_OP, UNKNOWN),
+}
+
 
 def check_error(error: str, test_case):
     if test_case == 1:
@@ -323,75 +607,206 @@ def check_error(error: str, test_case):
 
     return True
 
-list_tests_passed = []
-for i in range(1, 21):
-    file = "Assignment2_TestCases/input" + str(i if i != 1 else '') + ".txt"
-
-    print("~ " * 50)
-    print("Test case " + str(i))
-    print()
-    print(" - Expected output -")
-    print(open("Assignment2_TestCases/expected_output" + str(i if i != 1 else '') + ".txt", "r").read())
-    print()
-    print(" - Program output - ")
-
-    if os.path.exists(file):
-        in_fp = open(file, "r")
-        getChar()
-        token_list = []
-        lexemes = []
-        nextToken = 0
-        while nextToken != EOF:
-            nextToken, lexeme = lex()
-
-            if isinstance(nextToken, tuple):
-                token_list.append(nextToken[0])
-                lexemes.append(lexeme)
-                for j in range(nextToken[1] - 1):
-                    token_list.append(NEWLINE)
-                    lexemes.append('NEWLINE')
-            else:
-                token_list.append(nextToken)
-                lexemes.append(lexeme)
-
 
-        parser = Parser(token_list, lexemes)
-        parser.parse()
-        parse_tree: Node = parser.parse_tree
-
-        debug_small = False
-        debug_big = False
-        if debug_small:
-            if debug_big:
-                print("token, lexeme list")
-                print([(x, y) for x, y in zip(token_list, lexemes)])
-                print()
-                print("final parse tree: ")
-                print(parse_tree)
+def check_concurrent_lexing(files, repeat=10, workers=8):
+    """Lex every file many times on a thread pool and compare with sequential runs."""
+    from concurrent.futures import ThreadPoolExecutor
+    files = files * repeat
+    sequential = [Lexer().tokenize_file(file) for file in files]
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads as often as possible to shake out shared state
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            concurrent = list(pool.map(lambda file: Lexer().tokenize_file(file), files))
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert concurrent == sequential
+    print("Concurrent lexing of", len(files), "files matches sequential lexing")
+
+
+def check_module_lexing(files):
+    """Lex every file with getChar() and lex() reading an open in_fp, as the
+    module level functions were always used, and compare with tokenize_file()."""
+    global in_fp
+    for file in files:
+        token_list, lexemes = [], []
+        with open(file, "r") as in_fp:
+            getChar()
+            while not token_list or token_list[-1] != EOF:
+                token, lexeme = lex()
+                if isinstance(token, tuple):
+                    token_list += [token[0]] + [NEWLINE] * (token[1] - 1)
+                    lexemes += [lexeme] + ['NEWLINE'] * (token[1] - 1)
+                else:
+                    token_list.append(token)
+                    lexemes.append(lexeme)
+        in_fp = None
+        assert (token_list, lexemes) == tokenize_file(file)
+    print("Lexing with getChar() and lex() matches tokenize_file() for", len(files), "files")
+
+
+def check_mapped_lexing(files):
+    """Lex and parse every file through a memory map and compare with lexing its text."""
+    for file in files:
+        mapped = analyze_file(file, mapped=True)
+        analysis = analyze_file(file)
+        assert [token[:2] for token in mapped.tokens] == [token[:2] for token in analysis.tokens]
+        assert mapped.tokens.lines == analysis.tokens.lines
+        assert mapped.parse_tree.print_tree() == analysis.parse_tree.print_tree()
+        assert mapped.first_error == analysis.first_error
+    print("Lexing through a memory map matches lexing text for", len(files), "files")
+
+
+def check_parallel_lexing(files, workers=4):
+    """Lex every file in chunks of a few characters on a process pool and compare with lexing it at once."""
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for file in files:
+            with open(file, "r") as fp:
+                text = fp.read()
+            for min_chunk in (1, 16, 64):
+                lexer, expected_lexer = Lexer(), Lexer()
+                buffer = lexer.tokenize_parallel(text, workers, pool, min_chunk)
+                expected = expected_lexer.tokenize_buffer(text)
+                assert list(buffer) == list(expected) and lexer.error == expected_lexer.error
+                assert buffer.lines == expected.lines and buffer.line_starts == expected.line_starts
+                assert buffer.lexeme_table == expected.lexeme_table
+    print("Parallel lexing of", len(files), "files matches lexing them at once")
+
+
+def check_parallel_parsing(files, workers=2):
+    """Parse every file a few top level statements per chain on a process pool
+    and compare with parsing it in one process."""
+    from parallel_parser import ParallelParser
+    for file in files:
+        with open(file, "r") as fp:
+            buffer = Lexer().tokenize_buffer(fp.read())
+        def result(parser):
+            parser.parse()
+            first_error = parser.parse_tree.find_first_error()
+            return (parser.parse_tree.print_tree(), str(parser.parse_tree.print_leaf_nodes()),
+                    None if first_error is None else str(first_error))
+
+        parallel_parser = ParallelParser.from_buffer(buffer, workers, min_tokens=1)
+        try:
+            expected = result(Parser.from_buffer(buffer))
+        except (IndexError, ValueError) as error:
+            # The parser raises on some files, and then the parallel one must raise the same
+            try:
+                parallel_parser.parse()
+            except type(error) as parallel_error:
+                assert repr(parallel_error) == repr(error), file
+            else:
+                raise AssertionError(file + ": parallel parsing did not raise " + repr(error))
+            continue
+        assert result(parallel_parser) == expected, file
+    print("Parallel parsing of", len(files), "files matches parsing them in one process")
+
+
+def check_incremental_parsing(files):
+    """Type every file into an incremental Document a line at a time and delete
+    it again from the front, comparing with analyzing from scratch after every
+    edit. The parser raises on some partial files, and then edit() must raise
+    the same error. An update that falls back to analyzing from scratch on
+    a file that parses fails the check."""
+    import warnings
+    from incremental import Document
+
+    edits = 0
+    for file in files:
+        lines = open(file).read().splitlines(keepends=True)
+        document = Document("")
+        typing = [(len("".join(lines[:i])), 0, line) for i, line in enumerate(lines)]
+        deleting = [(0, len(line), "") for line in lines]
+        for edit in typing + deleting:
+            text = document.text[:edit[0]] + edit[2] + document.text[edit[0] + edit[1]:]
+            try:
+                expected = Document(text)
+            except (IndexError, ValueError) as error:
+                try:
+                    document.edit(*edit)
+                except type(error) as edit_error:
+                    assert repr(edit_error) == repr(error), file
+                else:
+                    raise AssertionError(file + ": edit() did not raise " + repr(error))
+            else:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("error", RuntimeWarning)
+                    document.edit(*edit)
+                assert document.parse_tree.print_tree() == expected.parse_tree.print_tree(), file
+                assert document.first_error() == expected.first_error(), file
+            edits += 1
+    print("Incremental parsing matches parsing from scratch after", edits, "edits")
+
+
+def main():
+    """Run the test cases in Assignment2_TestCases and the consistency checks."""
+    list_tests_passed = []
+    test_files = []
+    for i in range(1, 21):
+        file = "Assignment2_TestCases/input" + str(i if i != 1 else '') + ".txt"
+
+        print("~ " * 50)
+        print("Test case " + str(i))
+        print()
+        print(" - Expected output -")
+        print(open("Assignment2_TestCases/expected_output" + str(i if i != 1 else '') + ".txt", "r").read())
+        print()
+        print(" - Program output - ")
+
+        if os.path.exists(file):
+            test_files.append(file)
+            token_list, lexemes = tokenize_file(file)
+            assert tokenize_file(file, engine="regex") == (token_list, lexemes)
+            assert tokenize_file(file, engine="vector") == (token_list, lexemes)
+
+            parser = Parser(token_list, lexemes)
+            parser.parse()
+            parse_tree: Node = parser.parse_tree
+
+            debug_small = False
+            debug_big = False
+            if debug_small:
+                if debug_big:
+                    print("token, lexeme list")
+                    print([(x, y) for x, y in zip(token_list, lexemes)])
+                    print()
+                    print("final parse tree: ")
+                    print(parse_tree)
+                    print()
+                    print("nice view: ")
+                    print(parse_tree.print_tree())
+                print("flattened tree: ", parse_tree.print_leaf_nodes())
                 print()
-                print("nice view: ")
-                print(parse_tree.print_tree())
-            print("flattened tree: ", parse_tree.print_leaf_nodes())
+
+            first_error = parse_tree.find_first_error()
+            if first_error:
+                print("Error:")
+                print(first_error)
+            else:
+                print("Syntax analysis succeed")
             print()
 
-        first_error = parse_tree.find_first_error()
-        if first_error:
-            print("Error:")
-            print(first_error)
-        else:
-            print("Syntax analysis succeed")
-        print()
+            test_succeeded = check_error(str(first_error), i)
+            if test_succeeded == True:
+                print("Test case passed")
+                list_tests_passed.append(i)
+            else:
+                print("Test case failed")
 
-        test_succeeded = check_error(str(first_error), i)
-        if test_succeeded == True:
-            print("Test case passed")
-            list_tests_passed.append(i)
         else:
-            print("Test case failed")
+            print("ERROR - cannot open input.txt")
+
+    check_concurrent_lexing(test_files)
+    check_module_lexing(test_files)
+    check_mapped_lexing(test_files)
+    check_parallel_lexing(test_files)
+    check_parallel_parsing(test_files)
+    check_incremental_parsing(test_files)
+    print("~ * " * 25)
+    print("Correct test cases:", list_tests_passed)
+    print("Tests passed: " + "20" + "/20")
 
-    else:
-        print("ERROR - cannot open input.txt")
 
-print("~ * " * 25)
-print("Correct test cases:", list_tests_passed)
-print("Tests passed: " + "20" + "/20")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import io
+import os
+import re
+from contextlib import redirect_stdout
+
+import regex_lexer
+import vector_lexer
+from parser import EOF, TokenBuffer
+
+# Parallel lexing of one large source string. A pre-pass picks the places to
+# cut it at: the start of a line, about every len(text) / workers characters,
+# where the text before is outside string literals and comments as far as a
+# plain scan for '"', '//', '/*' and '*/' can tell. Each chunk is then lexed in
+# a worker process as if it were the whole input, and the TokenBuffers are
+# joined in order with their offsets and lines moved along.
+#
+# The pre-pass does not know the lexer's quirks (an operator that swallows a
+# '"', a '*' that swallows the next character inside a block comment), so it
+# is only a guess, and the lexer checks it: a chunk lexed from the right start
+# that ends in a clean EOF, exactly at its end and with no errors, has every
+# token the whole input has there, since no token that ends at a '\n' looks
+# past it. The next chunk then starts where the whole input is at the start
+# of a token too. At the first chunk that does not end that way, the rest of
+# the text is lexed again in this process from the start of that chunk.
+
+# Strings and comments as the pre-pass sees them, '\n' inside them are no place to cut
+SKIPPED = re.compile(r'"[^"]*"?|//[^\n]*|/\*[\s\S]*?(?:\*/|\Z)')
+
+MIN_CHUNK = 1 << 20  # Characters, smaller chunks cost more in processes and copies than they save
+
+
+def scanner_of(engine):
+    return vector_lexer if engine == "vector" and vector_lexer.available() else regex_lexer
+
+
+def boundaries(text, count):
+    """Offsets that cut text into at most count chunks of about equal size, each
+    the start of a line whose '\n' the pre-pass finds outside strings and comments."""
+    step = len(text) // count
+    cuts = []
+    skipped = SKIPPED.finditer(text)
+    skipped_start = skipped_end = -1
+    pos = 0
+    for target in range(step, len(text), step):
+        pos = text.find('\n', max(target, pos))
+        while pos >= 0:
+            while skipped_end <= pos:
+                match = next(skipped, None)
+                if match is None:
+                    skipped_start = skipped_end = len(text) + 1
+                else:
+                    skipped_start, skipped_end = match.span()
+            if pos < skipped_start:
+                break
+            pos = text.find('\n', skipped_end)
+        if pos < 0 or pos + 1 >= len(text):
+            break
+        pos += 1
+        cuts.append(pos)
+    return cuts
+
+
+def lex_chunk(text, offset=0, engine="regex", last=False):
+    """TokenBuffer of text, the chunk of the source at offset, with
+    offsets in the source, the errors lexing it reported and what it printed.
+    Unless last, the buffer is None when text does not end in a clean EOF, and
+    that EOF is left out of it."""
+    errors = []
+    printed = io.StringIO()
+    with redirect_stdout(printed):
+        buffer = TokenBuffer.from_tokens(scanner_of(engine).iter_tokens(text, errors))
+    if not last:
+        if errors or buffer.tokens[-1] != EOF or buffer.starts[-1] != len(text) or buffer.ends[-1] != len(text):
+            return None, errors, printed.getvalue()
+        buffer.pop()
+    if offset:
+        buffer.move(offset)
+    return buffer, errors, printed.getvalue()
+
+
+def tokenize(text, workers=None, engine="regex", pool=None, min_chunk=MIN_CHUNK):
+    """Lex an ASCII source string on workers processes, or on pool, a
+    ProcessPoolExecutor, into the TokenBuffer and error the regex or vector
+    engine gives for it in one process. Text shorter than two chunks of
+    min_chunk characters is lexed here."""
+    workers = workers or os.cpu_count() or 1
+    count = min(workers, len(text) // max(min_chunk, 1))
+    cuts = boundaries(text, count) if count > 1 else []
+    if not cuts:
+        errors = []
+        buffer = TokenBuffer.from_tokens(scanner_of(engine).iter_tokens(text, errors))
+        return buffer, errors[-1] if errors else ''
+    starts = [0] + cuts
+    chunks = [text[start:end] for start, end in zip(starts, cuts + [len(text)])]
+    lasts = [False] * len(cuts) + [True]
+    if pool is None:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            results = list(pool.map(lex_chunk, chunks, starts, [engine] * len(chunks), lasts))
+    else:
+        results = list(pool.map(lex_chunk, chunks, starts, [engine] * len(chunks), lasts))
+
+    buffer = TokenBuffer()
+    errors = []
+    for start, (chunk, errors, printed) in zip(starts, results):
+        if chunk is None:
+            # The cut was not at the start of a token: lex everything from here on at once
+            errors = []
+            rest = TokenBuffer.from_tokens(scanner_of(engine).iter_tokens(text[start:], errors))
+            rest.move(start)
+            buffer.extend(rest)
+            break
+        print(printed, end='')
+        buffer.extend(chunk)
+    return buffer, errors[-1] if errors else ''
@@ -0,0 +1,255 @@
+import os
+from array import array
+
+from parser import (COMMENT, FOR, IDENT, IF, LEFT_BRACE, LEFT_PAREN, RIGHT_BRACE, RIGHT_PAREN, SEMICOLON, WHILE,
+                    BRACKETS, Node, Parser, ParseTree, TokenIndex)
+
+# Parallel parsing of the top level statements of program. A pre-pass over
+# the tokens guesses where a top level statement starts about every
+# len(tokens) / (4 * workers) tokens: after a ';', '}' or comment with no
+# bracket open before it. Worker processes then parse the statements from
+# each guess up to the next one, each into a ParseTree of its own, as a
+# chain that starts in the state program's loop is in at the start of the
+# text: nothing on the bracket stack and no lines skipped.
+#
+# A chain only needs that guess to be right where it starts. Past its first
+# statement it is in the state the sequential parse is in, as long as that
+# one got to the same token the same way (whether the line of the token was
+# counted yet), with these differences, which the parent makes up for:
+# - the lines skip_to_newline() skipped without counting, line_adjust, can
+#   differ. That moves every line of the chain by the same amount, but for
+#   the choice parse_right_brace() makes by comparing a line with the line
+#   count, so each statement notes for which moves that choice stays the same.
+# - statements push to and pop from the bracket stack, but nothing they parse
+#   depends on what is on it (see incremental.py), so each statement notes
+#   the brackets it pushed or popped and the parent replays them.
+# The parent runs program's loop over the chains: wherever its state is one a
+# chain was in at the start of a statement, the statements from there on are
+# copied into its tree with ParseTree.extend(). Anywhere else, including
+# where a chain raised, it parses the next statement itself. So the tree,
+# down to the order of its entries and errors, is the one parse() builds.
+
+MIN_TOKENS = 20_000  # Per chain, smaller ones cost more in copies than they save
+
+STATEMENT_STARTS = (IDENT, IF, FOR, WHILE, COMMENT)
+STATEMENT_ENDS = (SEMICOLON, RIGHT_BRACE, COMMENT)
+
+# How a statement of a chain ended
+PARSED = 0  # Parsed, program's loop goes on after it
+ENDED = 1  # Program's loop ends with it, which parse_statement() found nothing or the tokens ran out in
+RAISED = 2  # Its parse raised, the parent parses it again to raise the same
+OPEN = 3  # Not parsed: the state the chain stopped in
+
+
+def statement_starts(tokens, count):
+    """Positions that cut tokens into at most count runs of top level statements
+    of about equal size, as far as counting brackets can tell."""
+    step = len(tokens) // count
+    cuts = []
+    depth = 0  # Of the brackets open before done
+    done = 0
+    for target in range(step, len(tokens), step):
+        if target > done:
+            before = tokens[done:target]
+            depth += (before.count(LEFT_BRACE) + before.count(LEFT_PAREN)
+                      - before.count(RIGHT_BRACE) - before.count(RIGHT_PAREN))
+            done = target
+        while done < len(tokens):
+            token = tokens[done]
+            if depth <= 0 and token in STATEMENT_STARTS and tokens[done - 1] in STATEMENT_ENDS:
+                break
+            if token == LEFT_BRACE or token == LEFT_PAREN:
+                depth += 1
+            elif token == RIGHT_BRACE or token == RIGHT_PAREN:
+                depth -= 1
+            done += 1
+        if done >= len(tokens):
+            break
+        if not cuts or done > cuts[-1]:
+            cuts.append(done)
+    return cuts
+
+
+class Chain:
+    """Top level statements a worker parsed one after another into tree. Row i
+    holds the state program's loop was in before statement i (pos, at_line for
+    whether the line of pos was counted, adjust for line_adjust and line for
+    current_line) and where the statement's tree entries, errors and bracket
+    events start. status, entry, low and high describe the statement: how it
+    ended, its tree entry (-1 for none) and the line_adjust moves from low up
+    to high that do not change what it parses. The last row is OPEN."""
+
+    FIELDS = ("pos", "at_line", "adjust", "line", "first", "errors", "events", "status", "entry", "low", "high")
+
+    def __init__(self):
+        for name in self.FIELDS:
+            setattr(self, name, array('i'))
+        self.tree = ParseTree()
+        self.tree.add('program', 1)  # Statements are not entry 0, which program's loop would take for none
+        self.bracket_events = array('h')  # The bracket of every update_bracket_stack() call that pushed or popped
+
+    def __len__(self):
+        return len(self.pos)
+
+    def append(self, parser, status=OPEN):
+        self.pos.append(parser.pos)
+        self.at_line.append(parser.line_pos == parser.pos)
+        self.adjust.append(parser.line_adjust)
+        self.line.append(parser.current_line)
+        self.first.append(len(self.tree))
+        self.errors.append(len(self.tree.errors))
+        self.events.append(len(self.bracket_events))
+        self.status.append(status)
+        self.entry.append(-1)
+        self.low.append(-(1 << 31))
+        self.high.append((1 << 31) - 1)
+
+
+class ChainParser(Parser):
+    """Parser that notes, for the chain it parses, the brackets it pushes or pops
+    and the lines it compares with the line count."""
+    chain = None
+
+    def line_count(self, limit):
+        count = super().line_count(limit)
+        # parse_right_brace() asks whether limit >= count, which a move keeps only within these bounds
+        chain = self.chain
+        if limit >= count:
+            chain.low[-1] = max(chain.low[-1], count - limit)
+        else:
+            chain.high[-1] = min(chain.high[-1], count - limit)
+        return count
+
+    def update_bracket_stack(self):
+        if not self.at_end() and not self.at_newline() and self.tokens[self.pos] in BRACKETS:
+            self.chain.bracket_events.append(self.tokens[self.pos])
+        return super().update_bracket_stack()
+
+
+_buffer = None
+_index = None
+
+
+def _start_worker(buffer):
+    global _buffer, _index
+    _buffer = buffer
+    _index = TokenIndex(buffer.tokens, buffer.lines)
+
+
+def parse_chain(start, stop):
+    """Chain of the top level statements from start, taking the state there to
+    be the one program's loop starts in, up to the first one at or after stop."""
+    chain = Chain()
+    parser = ChainParser.from_buffer(_buffer)
+    parser.index = _index
+    parser.tree = chain.tree
+    parser.chain = chain
+    parser.pos = start
+    while True:
+        chain.append(parser, PARSED)
+        try:
+            statement = parser.parse_statement()
+        except Exception:
+            chain.status[-1] = RAISED
+            return chain
+        if statement is not None:
+            chain.entry[-1] = statement
+        if not statement or parser.at_end():
+            chain.status[-1] = ENDED
+            break
+        if parser.pos >= stop:
+            break
+    chain.append(parser)
+    return chain
+
+
+def replay_bracket_events(stack, events):
+    """Push and pop the brackets of events on stack as update_bracket_stack() does."""
+    for bracket in events:
+        if bracket == LEFT_BRACE or bracket == LEFT_PAREN:
+            stack.append(bracket)
+        elif stack and stack[-1] == (LEFT_BRACE if bracket == RIGHT_BRACE else LEFT_PAREN):
+            stack.pop()
+
+
+class ParallelParser(Parser):
+    """Parser whose parse() parses the top level statements of a TokenBuffer on
+    workers processes and builds the tree parse() builds in one process.
+    With one worker, or fewer than two chains of min_tokens tokens, it parses
+    in this process."""
+
+    def __init__(self, tokens, lexemes, lines=None, workers=None, min_tokens=MIN_TOKENS):
+        super().__init__(tokens, lexemes, lines)
+        self.workers = workers or os.cpu_count() or 1
+        self.min_tokens = min_tokens
+        self.buffer = None
+
+    @classmethod
+    def from_buffer(cls, buffer, workers=None, min_tokens=MIN_TOKENS):
+        parser = cls(buffer.tokens, buffer.lexemes, buffer.lines, workers, min_tokens)
+        parser.buffer = buffer
+        return parser
+
+    def parse(self):
+        count = min(4 * self.workers, len(self.tokens) // max(self.min_tokens, 1))
+        cuts = statement_starts(self.tokens, count) if self.buffer is not None and self.workers > 1 and count > 1 else []
+        if not cuts:
+            return super().parse()
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(cuts) + 1), initializer=_start_worker,
+                                 initargs=(self.buffer,)) as pool:
+            chains = list(pool.map(parse_chain, [0] + cuts, cuts + [len(self.tokens)]))
+
+        self.tree = tree = ParseTree()
+        root = tree.add('program', self.current_line)
+        self.parse_tree = Node(tree, root)
+        starts = {}  # Position -> (chain, row) of the rows statements start at
+        for chain in chains:
+            for row in range(len(chain) - 1):
+                starts.setdefault(chain.pos[row], []).append((chain, row))
+        while True:
+            found = self.find_row(starts)
+            if found is not None:
+                if self.copy_statements(*found, root):
+                    break
+                continue
+            if self.index is None:
+                self.index = TokenIndex(self.tokens, self.lines)
+            parsed_statement = self.parse_statement()
+            if not parsed_statement or self.at_end():
+                break
+            tree.append(root, parsed_statement)
+        for error in self.parse_end():
+            tree.append(root, error)
+
+    def find_row(self, starts):
+        """A chain and row in the state of the parser, whose statement can be copied, or None."""
+        at_line = self.line_pos == self.pos
+        for chain, row in starts.get(self.pos, ()):
+            if chain.at_line[row] == at_line and chain.status[row] != RAISED:
+                delta = self.line_adjust - chain.adjust[row]
+                if chain.low[row] <= delta < chain.high[row]:
+                    return chain, row
+        return None
+
+    def copy_statements(self, chain, row, root):
+        """Copy the statements of chain from row on, as long as they parse the
+        same with the parser's line_adjust, into the tree and put the parser in
+        the state after them. Returns whether program's loop ended."""
+        delta = self.line_adjust - chain.adjust[row]
+        end = row
+        while chain.status[end] != OPEN and chain.status[end] != RAISED and chain.low[end] <= delta < chain.high[end]:
+            end += 1
+            if chain.status[end - 1] == ENDED:
+                break
+        offset = self.tree.extend(chain.tree, chain.first[row], chain.first[end], delta)
+        ended = chain.status[end - 1] == ENDED
+        # A statement program's loop ends with is dropped, as iter_statements() drops it
+        for entry in chain.entry[row:end - 1 if ended else end]:
+            self.tree.append(root, entry + offset)
+        replay_bracket_events(self.bracket_stack, chain.bracket_events[chain.events[row]:chain.events[end]])
+        self.pos = chain.pos[end]
+        self.line_pos = self.pos if chain.at_line[end] else -1
+        self.line_adjust = chain.adjust[end] + delta
+        self.current_line = chain.line[end] + delta
+        return ended
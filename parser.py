@@ -1,5 +1,11 @@
 from __future__ import annotations
 
+import json
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
 from collections import deque
 
 # Character classes
@@ -51,13 +57,43 @@ ERROR_SEMICOLON = -9
 ERROR_IDK_YET = -10
 ERROR_COMMENT = -11
 
+BRACKETS = (LEFT_PAREN, RIGHT_PAREN, LEFT_BRACE, RIGHT_BRACE)
+
+# FIRST sets Parser.predict() dispatches on: the tokens a parse function would
+# otherwise try one match() call at a time, mapped to their place in that order
+STATEMENT_FIRST = {COMMENT: 0, IF: 1, FOR: 2, WHILE: 3, IDENT: 4}
+TERMINAL_FIRST = {IDENT: 0, INT_LIT: 1, FLOAT_LIT: 2, STR_LIT: 3}
+
 
 class Node:
-    def __init__(self, value, line, lexeme=None):
-        self.value = value
-        self.lexeme = lexeme
-        self.line = -1
-        self.children = []
+    """View of one node of a ParseTree, created when the node is looked at."""
+    __slots__ = ('tree', 'index')
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def value(self):
+        return self.tree.value(self.index)
+
+    @property
+    def lexeme(self):
+        return self.tree.lexeme(self.index)
+
+    @property
+    def line(self):
+        return self.tree.lines[self.index]
+
+    @property
+    def children(self):
+        return [self.tree.view(child) for child in self.tree.children(self.index)]
+
+    def __eq__(self, other):
+        return isinstance(other, Node) and self.tree is other.tree and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
 
     def __repr__(self):
         if self.children:
@@ -66,129 +102,1064 @@ class Node:
             return f"Node({self.value}:'{self.lexeme}')"
 
     def print_tree(self, level=0):
-        spacer = "•   |"
-        if self:
-            if self.lexeme is not None:
-                thing = spacer * level + f"lexeme: {str(self.lexeme)} token: {str(self.value)}" + "\n"
-            else:
-                thing = spacer * level + f"<{str(self.value)}>" + "\n"
-            for child in self.children:
-                if not isinstance(child, Node):
-                    thing += spacer * (level + 1) + str(child) + "\n"
-                else:
-                    thing += child.print_tree(level + 1)
-            return thing
+        return self.tree.print_tree(self.index, level)
 
     def print_leaf_nodes(self):
-        if not self.children or self.lexeme:
-            return [(self.lexeme, self.value)]
+        return self.tree.print_leaf_nodes(self.index)
+
+    def write_tree(self, sink):
+        self.tree.write_tree(sink, self.index)
+
+    def iter_leaves(self):
+        return self.tree.iter_leaves(self.index)
+
+    def iter_errors(self):
+        return (Error(self.tree, error) for error in self.tree.iter_errors(self.index))
+
+    def find_bracket_error(self):
+        return self.tree.view(self.tree.find_bracket_error(self.index))
+
+    def find_other_error(self):
+        return self.tree.view(self.tree.find_other_error(self.index))
+
+    def find_first_error(self):
+        return self.tree.view(self.tree.find_first_error(self.index))
+
+
+class Error:
+    """View of one error of a ParseTree."""
+    __slots__ = ('tree', 'index')
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def error_message(self):
+        return self.tree.lexeme(self.index)
+
+    @error_message.setter
+    def error_message(self, error_message):
+        self.tree.set_lexeme(self.index, error_message)
+
+    @property
+    def line(self):
+        return self.tree.lines[self.index]
+
+    @line.setter
+    def line(self, line):
+        self.tree.lines[self.index] = line
+
+    @property
+    def show_line(self):
+        return self.tree.kinds[self.index] == ERROR_NODE
+
+    def __eq__(self, other):
+        return isinstance(other, Error) and self.tree is other.tree and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
+
+    def __repr__(self):
+        if self.show_line:
+            return self.error_message + " at line " + str(self.line)
         else:
-            leaf_nodes = []
-            for child in self.children:
-                if not isinstance(child, Node):
-                    leaf_nodes.append(child)
+            return self.error_message
+
+
+# Kinds of ParseTree entries that are not nodes; the kind of a node indexes ParseTree.values
+NO_NODE = 0  # A None child, where a parse function returned nothing
+ERROR_NODE = 1
+ERROR_NODE_NO_LINE = 2  # An error printed without its line
+
+TREE_MAGIC = b"PTRE"
+TREE_FORMAT = 1  # Bump whenever the layout of ParseTree's arrays changes
+TOKENS_MAGIC = b"PTOK"
+TOKENS_FORMAT = 1  # Same for TokenBuffer
+
+
+def pack_arrays(magic, version, count, arrays, tables):
+    """Binary form of a dict of arrays and a JSON-able tables value: a magic,
+    version and entry count header followed by the zlib compressed raw little
+    endian bytes of each array and then the tables as JSON. The arrays are
+    mostly small numbers, so this compresses to about the size of the source."""
+    parts = []
+    for items in arrays.values():
+        if sys.byteorder != "little":
+            items = array(items.typecode, items)
+            items.byteswap()
+        parts.append(struct.pack("<I", len(items)))
+        parts.append(items.tobytes())
+    tables = json.dumps(tables, separators=(",", ":")).encode()
+    parts.append(struct.pack("<I", len(tables)))
+    parts.append(tables)
+    return struct.pack("<4sHI", magic, version, count) + zlib.compress(b"".join(parts))
+
+
+def unpack_arrays(data, magic, version, arrays, counted):
+    """Fill the empty arrays in the dict arrays from pack_arrays() output and
+    return its tables. arrays[counted] must hold as many items as the header's count."""
+    found_magic, found_version, count = struct.unpack_from("<4sHI", data)
+    if found_magic != magic or found_version != version:
+        raise ValueError("not " + magic.decode() + " data in format " + str(version))
+    data = zlib.decompress(memoryview(data)[struct.calcsize("<4sHI"):])
+    offset = 0
+    for items in arrays.values():
+        length, = struct.unpack_from("<I", data, offset)
+        offset += 4
+        end = offset + length * items.itemsize
+        items.frombytes(data[offset:end])
+        if sys.byteorder != "little":
+            items.byteswap()
+        offset = end
+    if len(arrays[counted]) != count:
+        raise ValueError(magic.decode() + " data has " + str(len(arrays[counted])) + " entries instead of " + str(count))
+    length, = struct.unpack_from("<I", data, offset)
+    return json.loads(data[offset + 4:offset + 4 + length])
+
+
+def add_to_links(items, delta):
+    """Copy of items, a typed array of signed ints that are -1 or not negative
+    (entry links, or lines), with delta added to every item but the -1s.
+
+    As incremental.add_to_array() does, the items are added to as one big
+    integer instead of one by one: the sign bits of the items mark the -1s,
+    delta is added to every other item, and carries are masked off so no item
+    carries into the next."""
+    if not delta or not items:
+        return array(items.typecode, items)
+    size = items.itemsize
+    order = sys.byteorder
+    bits = size * 8 - 1
+    count = len(items)
+    value = int.from_bytes(items.tobytes(), order)
+    ones = int.from_bytes((1).to_bytes(size, order) * count, order)  # 1 in every item
+    high_mask = ones << bits
+    low_mask = high_mask - ones
+    added = (ones - ((value >> bits) & ones)) * (delta % (2 << bits))
+    value = ((value & low_mask) + (added & low_mask)) ^ ((value ^ added) & high_mask)
+    moved = array(items.typecode)
+    moved.frombytes(value.to_bytes(count * size, order))
+    return moved
+
+
+class ParseTree:
+    """Parse tree stored in flat arrays, one entry per node, instead of Node objects.
+
+    Entry i has kind kinds[i], its lexeme (or error message) lexeme_ids[i], an
+    index into the interned lexeme_table or -1 for none, and its line. parents,
+    first_child, last_child and next_sibling link the entries into a tree,
+    with -1 where there is no such entry. Parser builds the tree with add(),
+    add_error() and append(); view() wraps an entry in a Node or Error. The
+    first entry added is the root.
+
+    errors lists every error entry in the order they were added, which is
+    the order a depth first walk meets them in, so find_first_error() on the
+    root looks through that index instead of walking the whole tree.
+
+    A lexeme added as a LexemeRef is not interned: its entry holds -2 - i
+    for token i of the SourceTokenBuffer it refers to, lexeme_source, and
+    the lexeme is only read from the source when it is looked at.
+    """
+
+    def __init__(self):
+        self.kinds = array('h')
+        self.lexeme_ids = array('i')
+        self.lines = array('i')
+        self.parents = array('i')
+        self.first_child = array('i')
+        self.last_child = array('i')
+        self.next_sibling = array('i')
+        self.values = [None, None, None]  # Kinds below 3 are not nodes
+        self.value_index = {}
+        self.lexeme_table = []
+        self.lexeme_index = {}
+        self.lexeme_source = None  # SourceTokenBuffer of the LexemeRefs added
+        self.errors = array('i')
+        self.none_parents = set()  # Entries with a None child
+        self.hidden = set()  # Entries appended after a None child, which find_other_error() stops at
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def intern(self, lexeme):
+        if lexeme is None:
+            return -1
+        if type(lexeme) is LexemeRef:
+            self.lexeme_source = lexeme.buffer
+            return -2 - lexeme.index
+        lexeme_id = self.lexeme_index.get(lexeme)
+        if lexeme_id is None:
+            lexeme_id = self.lexeme_index[lexeme] = len(self.lexeme_table)
+            self.lexeme_table.append(lexeme)
+        return lexeme_id
+
+    def add_entry(self, kind, line, lexeme):
+        index = len(self.kinds)
+        self.kinds.append(kind)
+        self.lexeme_ids.append(self.intern(lexeme))
+        self.lines.append(line)
+        self.parents.append(-1)
+        self.first_child.append(-1)
+        self.last_child.append(-1)
+        self.next_sibling.append(-1)
+        return index
+
+    def add(self, value, line, lexeme=None):
+        """Add a node with no parent yet and return its index."""
+        kind = self.value_index.get(value)
+        if kind is None:
+            kind = self.value_index[value] = len(self.values)
+            self.values.append(value)
+        return self.add_entry(kind, line, lexeme)
+
+    def add_error(self, error_message, line, show_line=True):
+        index = self.add_entry(ERROR_NODE if show_line else ERROR_NODE_NO_LINE, line, error_message)
+        self.errors.append(index)
+        return index
+
+    def append(self, parent, child):
+        """Make child, an entry index or None, the last child of parent."""
+        if parent in self.none_parents:
+            self.hidden.add(child)
+        if child is None:
+            child = self.add_entry(NO_NODE, -1, None)
+            self.none_parents.add(parent)
+        self.parents[child] = parent
+        last = self.last_child[parent]
+        if last < 0:
+            self.first_child[parent] = child
+        else:
+            self.next_sibling[last] = child
+        self.last_child[parent] = child
+
+    def splice(self, parent, previous, following, removed, added):
+        """Replace the children of parent between previous and following (-1 for
+        the start or end of its children), which are removed, with added."""
+        for child in removed:
+            self.parents[child] = -1
+        chain = [previous]
+        for child in added:
+            self.parents[child] = parent
+            chain.append(child)
+        chain.append(following)
+        for child, sibling in zip(chain, chain[1:]):
+            if child < 0:
+                self.first_child[parent] = sibling
+            else:
+                self.next_sibling[child] = sibling
+        if following < 0:
+            self.last_child[parent] = chain[-2]
+
+    def extend(self, other, first, end, line_delta=0):
+        """Copy entries first to end of other, a tree whose entries there only
+        link to each other, to the end of this one with their lines moved by
+        line_delta, and return how far their indexes moved. Their errors are
+        added to the error index, after the errors already in it."""
+        offset = len(self) - first
+        other.resolve_lexemes()
+        kinds = list(range(ERROR_NODE_NO_LINE + 1))
+        for value in other.values[ERROR_NODE_NO_LINE + 1:]:
+            kind = self.value_index.get(value)
+            if kind is None:
+                kind = self.value_index[value] = len(self.values)
+                self.values.append(value)
+            kinds.append(kind)
+        lexeme_ids = [self.intern(lexeme) for lexeme in other.lexeme_table]
+        lexeme_ids.append(-1)  # Where an entry without a lexeme, -1, looks
+        self.kinds.extend(array('h', map(kinds.__getitem__, other.kinds[first:end])))
+        self.lexeme_ids.extend(array('i', map(lexeme_ids.__getitem__, other.lexeme_ids[first:end])))
+        self.lines.extend(add_to_links(other.lines[first:end], line_delta))
+        for name in ("parents", "first_child", "last_child", "next_sibling"):
+            getattr(self, name).extend(add_to_links(getattr(other, name)[first:end], offset))
+        errors = other.errors  # In the order they were added, so sorted
+        self.errors.extend(array('i', map(offset.__add__, errors[bisect_left(errors, first):bisect_left(errors, end)])))
+        self.none_parents.update(entry + offset for entry in other.none_parents if first <= entry < end)
+        self.hidden.update(entry + offset for entry in other.hidden if entry is not None and first <= entry < end)
+        return offset
+
+    def children(self, index):
+        child = self.first_child[index]
+        while child >= 0:
+            yield child
+            child = self.next_sibling[child]
+
+    def value(self, index):
+        return self.values[self.kinds[index]]
+
+    def lexeme(self, index):
+        lexeme_id = self.lexeme_ids[index]
+        if lexeme_id >= 0:
+            return self.lexeme_table[lexeme_id]
+        if lexeme_id == -1:
+            return None
+        return self.lexeme_source.lexeme(-2 - lexeme_id)
+
+    def set_lexeme(self, index, lexeme):
+        self.lexeme_ids[index] = self.intern(lexeme)
+
+    def is_node(self, index):
+        return self.kinds[index] > ERROR_NODE_NO_LINE
+
+    def is_error(self, index):
+        return self.kinds[index] == ERROR_NODE or self.kinds[index] == ERROR_NODE_NO_LINE
+
+    def view(self, index):
+        """Node or Error for the entry at index, or None."""
+        if index is None or self.kinds[index] == NO_NODE:
+            return None
+        if self.is_error(index):
+            return Error(self, index)
+        return Node(self, index)
+
+    def next_entry(self, entry, top):
+        """The entry after entry's subtree in depth first order within top's
+        subtree (-1 at the end of it), and how many levels up from entry it is."""
+        up = 0
+        while entry != top and self.next_sibling[entry] < 0:
+            entry = self.parents[entry]
+            up += 1
+        if entry == top:
+            return -1, up
+        return self.next_sibling[entry], up
+
+    # The walks below follow the parent and sibling links instead of recursing
+    # or keeping a stack, so they need no extra memory however deep or wide the tree is.
+
+    def iter_tree(self, index, level=0):
+        """Yield the lines of print_tree() one at a time."""
+        spacer = "•   |"
+        kinds, values, lexeme_ids, lexeme_table = self.kinds, self.values, self.lexeme_ids, self.lexeme_table
+        first_child, next_sibling, parents = self.first_child, self.next_sibling, self.parents
+        entry = index
+        while True:
+            if kinds[entry] > ERROR_NODE_NO_LINE:
+                if lexeme_ids[entry] >= 0:
+                    yield f"{spacer * level}lexeme: {lexeme_table[lexeme_ids[entry]]} token: {values[kinds[entry]]}\n"
+                elif lexeme_ids[entry] < -1:
+                    yield f"{spacer * level}lexeme: {self.lexeme(entry)} token: {values[kinds[entry]]}\n"
                 else:
-                    leaf_nodes.extend(child.print_leaf_nodes())
-            return leaf_nodes
+                    yield f"{spacer * level}<{values[kinds[entry]]}>\n"
+                if first_child[entry] >= 0:
+                    entry = first_child[entry]
+                    level += 1
+                    continue
+            else:
+                yield f"{spacer * level}{self.view(entry)}\n"
+            while entry != index and next_sibling[entry] < 0:
+                entry = parents[entry]
+                level -= 1
+            if entry == index:
+                return
+            entry = next_sibling[entry]
 
-    def find_bracket_error(self):
-        if isinstance(self, Error):
-            return self
+    def print_tree(self, index, level=0):
+        return "".join(self.iter_tree(index, level))
+
+    def write_tree(self, sink, index=0):
+        """Write print_tree() of the subtree at index to a file-like sink line by line."""
+        for line in self.iter_tree(index):
+            sink.write(line)
+
+    def iter_leaves(self, index):
+        """Yield the items of print_leaf_nodes() one at a time."""
+        entry = index
+        while entry >= 0:
+            if self.kinds[entry] <= ERROR_NODE_NO_LINE:
+                yield self.view(entry)
+            elif self.first_child[entry] < 0 or self.lexeme(entry):
+                yield self.lexeme(entry), self.value(entry)
+            else:
+                entry = self.first_child[entry]
+                continue
+            entry = self.next_entry(entry, index)[0]
+
+    def print_leaf_nodes(self, index):
+        return list(self.iter_leaves(index))
+
+    def iter_errors(self, index):
+        """Yield every error entry in the subtree at index, depth first."""
+        kinds = self.kinds
+        entry = index
+        while entry >= 0:
+            if kinds[entry] == ERROR_NODE or kinds[entry] == ERROR_NODE_NO_LINE:
+                yield entry
+            elif self.first_child[entry] >= 0:
+                entry = self.first_child[entry]
+                continue
+            entry = self.next_entry(entry, index)[0]
 
-        queue = deque([self])
+    def find_bracket_error(self, index):
+        """The error with the highest line, the first one breadth first among equals."""
+        if self.is_error(index):
+            return index
+
+        kinds, lines, next_sibling = self.kinds, self.lines, self.next_sibling
+        queue = deque([index])
         highest_error = None
 
         while queue:
-            current_node = queue.popleft()
-
-            if isinstance(current_node, Error):
-                if highest_error is None or current_node.line > highest_error.line:
-                    highest_error = current_node
+            current = queue.popleft()
 
-            elif isinstance(current_node, Node):
-                queue.extend(child for child in current_node.children if child is not None)
+            if kinds[current] > ERROR_NODE_NO_LINE:
+                child = self.first_child[current]
+                while child >= 0:
+                    if kinds[child] != NO_NODE:
+                        queue.append(child)
+                    child = next_sibling[child]
+            elif highest_error is None or lines[current] > lines[highest_error]:
+                highest_error = current
         return highest_error
 
-    def find_other_error(self):
-        if isinstance(self, Error):
-            return self
-        for child in self.children:
-            if child is None:
-                return None
-            if isinstance(child, Error):
-                return child
-            result = child.find_other_error()
-            if result is not None:
-                return result
+    def find_other_error(self, index):
+        """The first error depth first, not looking past a None child."""
+        if self.is_error(index):
+            return index
+        kinds = self.kinds
+        entry = self.first_child[index]
+        while entry >= 0:
+            if kinds[entry] == NO_NODE:
+                # The rest of the parent's children are never looked at
+                parent = self.parents[entry]
+                if parent == index:
+                    return None
+                entry = self.next_entry(parent, index)[0]
+                continue
+            if kinds[entry] <= ERROR_NODE_NO_LINE:
+                return entry
+            if self.first_child[entry] >= 0:
+                entry = self.first_child[entry]
+                continue
+            entry = self.next_entry(entry, index)[0]
         return None
 
-    def find_first_error(self):
-        other_error = self.find_other_error()
-        bracket_error = self.find_bracket_error()
-        if other_error and bracket_error:
-            if "Expected" in other_error.error_message and "Unmatched" in bracket_error.error_message:
+    def error_depth(self, error):
+        """Depth of error below the root and whether find_other_error() gets to
+        it, or None when error did not end up in the tree."""
+        depth = 0
+        reached = True
+        while error != 0:
+            if error in self.hidden:
+                reached = False
+            error = self.parents[error]
+            if error < 0:
+                return None
+            depth += 1
+        return depth, reached
+
+    def indexed_errors(self):
+        """find_other_error() and find_bracket_error() of the root, from the error index."""
+        lines = self.lines
+        other_error = bracket_error = None
+        bracket_depth = 0
+        for error in self.errors:
+            if (found := self.error_depth(error)) is None:
+                continue
+            depth, reached = found
+            if other_error is None and reached:
+                other_error = error
+            # Breadth first, the shallower of two errors on the same line comes first
+            if (bracket_error is None or lines[error] > lines[bracket_error]
+                    or lines[error] == lines[bracket_error] and depth < bracket_depth):
+                bracket_error, bracket_depth = error, depth
+        return other_error, bracket_error
+
+    def find_first_error(self, index):
+        if index == 0:
+            other_error, bracket_error = self.indexed_errors()
+        else:
+            other_error = self.find_other_error(index)
+            bracket_error = self.find_bracket_error(index)
+        if other_error is not None and bracket_error is not None:
+            if "Expected" in self.lexeme(other_error) and "Unmatched" in self.lexeme(bracket_error):
                 return bracket_error
             else:
                 return other_error
         else:
-            if other_error:
+            if other_error is not None:
                 return other_error
-            elif bracket_error:
+            elif bracket_error is not None:
                 return bracket_error
 
+    # Serialization. Both formats hold every array of the tree as is, so loading
+    # one gives back exactly the tree that was saved without re-lexing or
+    # re-parsing. The binary one is written by pack_arrays().
 
-class Error:
-    def __init__(self, error_message, line, show_line=True):
-        self.error_message = error_message
-        self.line = line
-        self.show_line = show_line
+    def arrays(self):
+        return {
+            "kinds": self.kinds, "lexeme_ids": self.lexeme_ids, "lines": self.lines,
+            "parents": self.parents, "first_child": self.first_child, "last_child": self.last_child,
+            "next_sibling": self.next_sibling, "errors": self.errors,
+            "none_parents": array('i', sorted(self.none_parents)), "hidden": array('i', sorted(self.hidden)),
+        }
 
-    def __repr__(self):
-        if self.show_line:
-            return self.error_message + " at line " + str(self.line)
+    @classmethod
+    def from_tables(cls, arrays, values, lexeme_table):
+        tree = cls()
+        for name, items in arrays.items():
+            setattr(tree, name, items)
+        tree.none_parents = set(tree.none_parents)
+        tree.hidden = set(tree.hidden)
+        tree.values = values
+        tree.value_index = {value: kind for kind, value in enumerate(values) if kind > ERROR_NODE_NO_LINE}
+        tree.lexeme_table = lexeme_table
+        tree.lexeme_index = {lexeme: lexeme_id for lexeme_id, lexeme in enumerate(lexeme_table)}
+        return tree
+
+    def resolve_lexemes(self):
+        """Intern every lexeme still read from lexeme_source, so the tree no longer needs it."""
+        if self.lexeme_source is None:
+            return
+        lexeme_ids = self.lexeme_ids
+        for index, lexeme_id in enumerate(lexeme_ids):
+            if lexeme_id < -1:
+                lexeme_ids[index] = self.intern(self.lexeme_source.lexeme(-2 - lexeme_id))
+        self.lexeme_source = None
+
+    def to_bytes(self):
+        self.resolve_lexemes()
+        return pack_arrays(TREE_MAGIC, TREE_FORMAT, len(self), self.arrays(), [self.values, self.lexeme_table])
+
+    @classmethod
+    def from_bytes(cls, data):
+        arrays = cls().arrays()
+        values, lexeme_table = unpack_arrays(data, TREE_MAGIC, TREE_FORMAT, arrays, "kinds")
+        return cls.from_tables(arrays, values, lexeme_table)
+
+    def to_json(self, indent=None):
+        self.resolve_lexemes()
+        return json.dumps({
+            "format": TREE_FORMAT,
+            "values": self.values,
+            "lexemes": self.lexeme_table,
+            **{name: items.tolist() for name, items in self.arrays().items()},
+        }, indent=indent)
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        if data.get("format") != TREE_FORMAT:
+            raise ValueError("not a parse tree in format " + str(TREE_FORMAT))
+        arrays = {name: array(items.typecode, data[name]) for name, items in cls().arrays().items()}
+        return cls.from_tables(arrays, data["values"], data["lexemes"])
+
+
+class TokenBuffer:
+    """Token stream stored in typed arrays instead of parallel Python lists.
+
+    tokens holds the token codes, starts/ends the source offsets each token
+    was scanned from and lines the line each token starts on. NEWLINE tokens
+    from the lexer are not stored; each one (and each comment) ends a line,
+    and line_starts records the offset where every line begins, so
+    line_of(offset) maps any source offset back to its line. Lines are
+    counted the way Parser reports them, which is one per NEWLINE or COMMENT
+    token.
+
+    Lexemes are interned once in lexeme_table and referenced by index from
+    lexeme_ids; lexemes is an index view that reads like a list of strings.
+    """
+
+    def __init__(self):
+        self.tokens = array('h')
+        self.starts = array('i')
+        self.ends = array('i')
+        self.lines = array('i')
+        self.lexeme_ids = array('i')
+        self.lexeme_table = []
+        self.lexeme_index = {}
+        self.lexemes = LexemeView(self)
+        self.line_starts = array('i', [0])
+        self.line = 1
+
+    @classmethod
+    def from_tokens(cls, tokens):
+        """Build a buffer from (token, lexeme, start, end) tuples."""
+        buffer = cls()
+        for token, lexeme, start, end in tokens:
+            buffer.append(token, lexeme, start, end)
+        return buffer
+
+    @classmethod
+    def from_lists(cls, tokens, lexemes):
+        """Build a buffer from the parallel lists of Lexer.tokenize(), which has no offsets."""
+        buffer = cls()
+        for token, lexeme in zip(tokens, lexemes):
+            buffer.append(token, lexeme, 0, 0)
+        return buffer
+
+    def append(self, token, lexeme, start, end):
+        if token == NEWLINE:
+            self.line += 1
+            self.line_starts.append(end)
+            return
+        lexeme_id = self.lexeme_index.get(lexeme)
+        if lexeme_id is None:
+            lexeme_id = self.lexeme_index[lexeme] = len(self.lexeme_table)
+            self.lexeme_table.append(sys.intern(lexeme))
+        self.tokens.append(token)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(self.line)
+        self.lexeme_ids.append(lexeme_id)
+        if token == COMMENT:
+            self.line += 1
+            self.line_starts.append(end)
+
+    def extend(self, other):
+        """Append the tokens of other, a buffer of the source from the start of
+        a line on, with offsets in the source, going on with the lines here."""
+        table, index = self.lexeme_table, self.lexeme_index
+        lexeme_ids = []
+        for lexeme in other.lexeme_table:
+            lexeme_id = index.get(lexeme)
+            if lexeme_id is None:
+                lexeme_id = index[lexeme] = len(table)
+                table.append(sys.intern(lexeme))
+            lexeme_ids.append(lexeme_id)
+        self.tokens.extend(other.tokens)
+        self.starts.extend(other.starts)
+        self.ends.extend(other.ends)
+        lines = self.line - 1
+        self.lines.extend(array('i', map(lines.__add__, other.lines)) if lines else other.lines)
+        if lexeme_ids == list(range(len(lexeme_ids))):
+            self.lexeme_ids.extend(other.lexeme_ids)
         else:
-            return self.error_message
+            self.lexeme_ids.extend(array('i', map(lexeme_ids.__getitem__, other.lexeme_ids)))
+        self.line_starts.extend(other.line_starts[1:])
+        self.line += other.line - 1
 
+    def move(self, offset):
+        """Add offset to every source offset, for a buffer of the source from offset on."""
+        for name in ("starts", "ends", "line_starts"):
+            setattr(self, name, array('i', map(offset.__add__, getattr(self, name))))
 
-class Parser:
-    bracket_stack = []
+    def pop(self):
+        """Remove the last token, which must not be a COMMENT."""
+        self.tokens.pop()
+        self.starts.pop()
+        self.ends.pop()
+        self.lines.pop()
+        lexeme_id = self.lexeme_ids.pop()
+        if lexeme_id == len(self.lexeme_table) - 1 and lexeme_id not in self.lexeme_ids:
+            del self.lexeme_index[self.lexeme_table.pop()]
+
+    def line_of(self, offset):
+        return bisect_right(self.line_starts, offset)
+
+    def arrays(self):
+        return {
+            "tokens": self.tokens, "starts": self.starts, "ends": self.ends, "lines": self.lines,
+            "lexeme_ids": self.lexeme_ids, "line_starts": self.line_starts,
+        }
+
+    def to_bytes(self):
+        return pack_arrays(TOKENS_MAGIC, TOKENS_FORMAT, len(self), self.arrays(), self.lexeme_table)
+
+    @classmethod
+    def from_bytes(cls, data):
+        buffer = cls()
+        buffer.line_starts = array('i')
+        arrays = buffer.arrays()
+        buffer.lexeme_table = unpack_arrays(data, TOKENS_MAGIC, TOKENS_FORMAT, arrays, "tokens")
+        buffer.lexeme_index = {lexeme: lexeme_id for lexeme_id, lexeme in enumerate(buffer.lexeme_table)}
+        buffer.lexemes = LexemeView(buffer)
+        buffer.line = len(buffer.line_starts)
+        return buffer
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __iter__(self):
+        table = self.lexeme_table
+        for token, lexeme_id, start, end in zip(self.tokens, self.lexeme_ids, self.starts, self.ends):
+            yield token, table[lexeme_id], start, end
+
+
+class LexemeView:
+    def __init__(self, buffer):
+        self.lexeme_ids = buffer.lexeme_ids
+        self.lexeme_table = buffer.lexeme_table
+
+    def __len__(self):
+        return len(self.lexeme_ids)
+
+    def __getitem__(self, index):
+        return self.lexeme_table[self.lexeme_ids[index]]
+
+
+class SourceTokenBuffer:
+    """Token stream of a source that stays in memory, such as an mmap, holding
+    no lexemes: tokens, lines and line_starts are those of a TokenBuffer,
+    and starts/ends the offsets of each token in source, as 64 bit ints when
+    the source is 2 GB or more. lexemes reads like a list of LexemeRefs, and
+    lexeme(i) makes the lexeme of token i from source with lexeme_at, a
+    function of (source, token, start, end).
+    """
+
+    def __init__(self, source, lexeme_at):
+        self.source = source
+        self.lexeme_at = lexeme_at
+        offset_type = 'i' if len(source) < 2**31 else 'q'
+        self.tokens = array('h')
+        self.starts = array(offset_type)
+        self.ends = array(offset_type)
+        self.lines = array('i')
+        self.lexemes = SourceLexemeView(self)
+        self.line_starts = array(offset_type, [0])
+        self.line = 1
+
+    @classmethod
+    def from_spans(cls, source, lexeme_at, spans):
+        """Build a buffer from the (token, start, end) tuples of a lexer."""
+        buffer = cls(source, lexeme_at)
+        tokens, starts, ends, lines, line_starts = (buffer.tokens, buffer.starts, buffer.ends, buffer.lines,
+                                                    buffer.line_starts)
+        line = 1
+        for token, start, end in spans:
+            if token == NEWLINE:
+                line += 1
+                line_starts.append(end)
+                continue
+            tokens.append(token)
+            starts.append(start)
+            ends.append(end)
+            lines.append(line)
+            if token == COMMENT:
+                line += 1
+                line_starts.append(end)
+        buffer.line = line
+        return buffer
+
+    def lexeme(self, index):
+        return self.lexeme_at(self.source, self.tokens[index], self.starts[index], self.ends[index])
+
+    def line_of(self, offset):
+        return bisect_right(self.line_starts, offset)
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __iter__(self):
+        for index in range(len(self.tokens)):
+            yield self.tokens[index], self.lexeme(index), self.starts[index], self.ends[index]
+
+
+class SourceLexemeView:
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def __len__(self):
+        return len(self.buffer.tokens)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.buffer.tokens)
+        if not 0 <= index < len(self.buffer.tokens):
+            raise IndexError("lexeme index out of range")
+        return LexemeRef(self.buffer, index)
+
+
+class LexemeRef:
+    """Lexeme of token index of a SourceTokenBuffer, made from its source each
+    time it is used as a string. A ParseTree keeps the reference instead."""
+    __slots__ = ('buffer', 'index')
+
+    def __init__(self, buffer, index):
+        self.buffer = buffer
+        self.index = index
+
+    def __str__(self):
+        return self.buffer.lexeme(self.index)
+
+    def __eq__(self, other):
+        return str(self) == (str(other) if isinstance(other, LexemeRef) else other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __contains__(self, text):
+        return text in str(self)
+
+    def __add__(self, other):
+        return str(self) + other
+
+    def __radd__(self, other):
+        return other + str(self)
+
+    def __repr__(self):
+        return repr(str(self))
+
+
+class TokenStream:
+    """Ring buffer of tokens pulled lazily from an iterator of (token, lexeme, ...) tuples.
+
+    NEWLINE tokens are counted into the line of the tokens after them instead
+    of being buffered, as in TokenBuffer. The parser only ever looks one token
+    behind and three tokens ahead of its position (parse_semicolon's
+    token_ahead(2) needs the lines up to pos + 3), so the buffer only keeps
+    that window; older tokens are dropped as the parser moves forward.
+    tokens, lexemes and lines are index views over the window that Parser
+    reads just like the usual arrays.
+    """
+
+    def __init__(self, tokens, lookahead=3, lookbehind=1):
+        self.source = iter(tokens)
+        self.lookahead = lookahead
+        self.lookbehind = lookbehind
+        self.window = deque()
+        self.start = 0  # Index of window[0] in the whole token stream
+        self.line = 1  # Line of the next token
+        self.tokens = TokenStreamView(self, 0)
+        self.lexemes = TokenStreamView(self, 1)
+        self.lines = TokenStreamView(self, 2)
+
+    def pull(self):
+        for token in self.source:
+            if token[0] == NEWLINE:
+                self.line += 1
+                continue
+            self.window.append((token[0], token[1], self.line))
+            if token[0] == COMMENT:
+                self.line += 1
+            return True
+        return False
+
+    def has(self, index):
+        if self.start + len(self.window) > index:
+            return True
+        while self.start + len(self.window) <= index:
+            if not self.pull():
+                return False
+        # Nothing before index - lookahead - lookbehind can be looked at again
+        while self.start < index - self.lookahead - self.lookbehind:
+            self.window.popleft()
+            self.start += 1
+        return True
+
+    def get(self, index, field):
+        offset = index - self.start
+        if offset >= len(self.window):
+            if not self.has(index):
+                raise IndexError("token stream index out of range")
+            offset = index - self.start
+        elif offset < 0:
+            raise IndexError(f"token {index} has already left the lookahead window")
+        return self.window[offset][field]
+
+    def count_lines(self, limit):
+        """Count the lines ended by NEWLINE and COMMENT tokens in the whole
+        stream, stopping early once there are more than limit of them.
+
+        This may buffer past the lookahead window, up to the next couple of
+        lines; it is only used when a closing brace is missing.
+        """
+        while self.line - 1 <= limit and self.pull():
+            pass
+        return self.line - 1
+
+
+class TokenStreamView:
+    def __init__(self, stream, field):
+        self.stream = stream
+        self.field = field
+
+    def __getitem__(self, index):
+        return self.stream.get(index, self.field)
 
-    def __init__(self, tokens, lexemes):
+
+class TokenIndex:
+    """Answers the questions Parser used to scan the token list for, built in one
+    backward pass over tokens and lines (as stored in a TokenBuffer).
+
+    line_count is the number of lines the lexer ended, line_end[i] is the last
+    token on the line of tokens[i] (the one right before the next NEWLINE), and
+    closing_paren[i] is where a condition that starts at tokens[i] with one '('
+    open ends: the ')' that closes it or an EOF token, whichever comes first.
+    So closing_paren[i + 1] is the ')' matching a '(' at i. Both tables hold -1
+    where there is no answer.
+    """
+
+    def __init__(self, tokens, lines):
+        count = len(tokens)
+        self.line_count = lines[-1] - 1 + (tokens[-1] == COMMENT) if count else 0
+        self.line_end = line_end = array('i', [-1]) * count
+        self.closing_paren = closing_paren = array('i', [-1]) * count
+        unmatched = []  # Indexes of the ')' after i that no '(' after i closes, nearest last
+        next_line_end = -1
+        next_eof = -1
+        for i in range(count - 1, -1, -1):
+            token = tokens[i]
+            if i + 1 < count and lines[i + 1] - lines[i] - (token == COMMENT) > 0:
+                next_line_end = i
+            line_end[i] = next_line_end
+
+            if token == EOF:
+                next_eof = i
+            elif token == RIGHT_PAREN:
+                unmatched.append(i)
+            elif token == LEFT_PAREN and unmatched:
+                unmatched.pop()
+            closing = unmatched[-1] if unmatched else -1
+            if next_eof != -1 and (closing == -1 or next_eof < closing):
+                closing = next_eof
+            closing_paren[i] = closing
+
+
+class Parser:
+    def __init__(self, tokens, lexemes, lines=None):
+        """tokens, lexemes and lines describe a token stream without NEWLINE
+        tokens, where lines[i] is the line tokens[i] is on. Without lines,
+        tokens and lexemes are the lists Lexer.tokenize() returns, NEWLINE
+        tokens included, and are converted."""
+        if lines is None:
+            buffer = TokenBuffer.from_lists(tokens, lexemes)
+            tokens, lexemes, lines = buffer.tokens, buffer.lexemes, buffer.lines
         self.tokens = tokens
         self.lexemes = lexemes
+        self.lines = lines
         self.pos = 0
         self.current_line = 1
+        self.line_pos = -1  # Position increment_line_num() last moved to
+        self.line_adjust = 0  # Lines skip_to_newline() skipped without counting
         self.parse_tree = None
+        self.stream = None
+        self.index = None  # TokenIndex, built by parse() unless tokens come from a stream
+        self.tree = None  # ParseTree that parse() builds, parse_tree is a view of its root
+        self.matched_lexeme = None
+        self.bracket_stack = []  # Brackets opened and not closed yet, of this parse only
+
+    @classmethod
+    def from_buffer(cls, buffer):
+        """Parser that reads a TokenBuffer's arrays directly."""
+        return cls(buffer.tokens, buffer.lexemes, buffer.lines)
 
     @classmethod
-    def add_to_bracket_stack(cls, bracket):
-        cls.bracket_stack.append(bracket)
+    def from_stream(cls, tokens, lookahead=3, lookbehind=1):
+        """Parser that pulls (token, lexeme, ...) tuples from an iterator, such as
+        Lexer.iter_tokens(), through a TokenStream instead of reading lists."""
+        stream = TokenStream(tokens, lookahead, lookbehind)
+        parser = cls(stream.tokens, stream.lexemes, stream.lines)
+        parser.stream = stream
+        return parser
+
+    def has_token(self, index):
+        if self.stream is not None:
+            return self.stream.has(index)
+        return index < len(self.tokens)
+
+    def at_end(self):
+        return not self.has_token(self.pos)
+
+    def line_count(self, limit):
+        """Number of lines the lexer ended (its NEWLINE and COMMENT tokens), exact up to limit."""
+        if self.stream is not None:
+            return self.stream.count_lines(limit)
+        if self.index is not None:
+            return self.index.line_count
+        return self.lines[-1] - 1 + (self.tokens[-1] == COMMENT)
+
+    # Parser used to see a NEWLINE token for every line the lexer ended. These
+    # helpers answer the questions it asked of those tokens from self.lines.
+
+    def newlines_before(self, index):
+        """Number of NEWLINE tokens the lexer emitted right before tokens[index]."""
+        if index == 0:
+            return self.lines[0] - 1
+        return self.lines[index] - self.lines[index - 1] - (self.tokens[index - 1] == COMMENT)
+
+    def at_newline(self):
+        """Whether the parser is still in front of the NEWLINEs before tokens[pos],
+        i.e. it consumed the token before them and has not counted them yet."""
+        return self.pos != self.line_pos and self.newlines_before(self.pos) > 0
+
+    def previous_lexeme(self):
+        """What lexemes[pos - 1] was while NEWLINE tokens were in the stream."""
+        if not self.at_newline() and self.newlines_before(self.pos) > 0:
+            return 'NEWLINE'
+        return self.lexemes[self.pos - 1]
+
+    def token_ahead(self, offset):
+        """What tokens[pos + offset] was while NEWLINE tokens were in the stream."""
+        index = self.pos
+        if self.at_newline():
+            if offset < self.newlines_before(index):
+                return NEWLINE
+            offset -= self.newlines_before(index)
+        while offset:
+            newlines = self.newlines_before(index + 1)
+            if offset <= newlines:
+                return NEWLINE
+            offset -= newlines + 1
+            index += 1
+        return self.tokens[index]
+
+    def skip_to_newline(self):
+        """Move past the rest of the line, leaving the parser in front of the next NEWLINE."""
+        if self.index is not None:
+            index = self.index.line_end[self.pos]
+            if index < 0:
+                raise ValueError("no NEWLINE after position " + str(self.pos))
+        else:
+            index = self.pos
+            while True:
+                if not self.has_token(index + 1):
+                    raise ValueError("no NEWLINE after position " + str(self.pos))
+                if self.newlines_before(index + 1):
+                    break
+                index += 1
+        # Lines ended by comments on the skipped part of the line are never counted
+        lines_before_newline = self.lines[index] - 1 + (self.tokens[index] == COMMENT)
+        self.line_adjust = self.current_line - 1 - lines_before_newline
+        self.pos = index + 1
+
+    def add_to_bracket_stack(self, bracket):
+        self.bracket_stack.append(bracket)
 
     def parse(self):
-        self.parse_tree = Node('program', self.current_line)
-        while (parsed_statement := self.parse_statement()) and self.pos < len(self.tokens):
-            self.parse_tree.children.append(parsed_statement)
+        if self.stream is None and self.index is None:
+            self.index = TokenIndex(self.tokens, self.lines)
+        self.tree = tree = ParseTree()
+        root = tree.add('program', self.current_line)
+        self.parse_tree = Node(tree, root)
+        for parsed_statement in self.iter_statements():
+            tree.append(root, parsed_statement)
+        for error in self.parse_end():
+            tree.append(root, error)
+
+    def iter_statements(self):
+        """Parse the top level statements of program one at a time, yielding the
+        ones that belong in the tree. Each parse_statement() call starts from
+        the state the previous one left."""
+        while (parsed_statement := self.parse_statement()) and not self.at_end():
+            yield parsed_statement
+
+    def parse_end(self):
+        """Errors program gets after its statements."""
+        errors = []
         if bracket_error := self.update_bracket_stack():
-            self.parse_tree.children.append(bracket_error)
+            errors.append(self.tree.add_error(bracket_error, self.current_line))
 
         bracket_error = self.update_bracket_stack()
         if bracket_error:
-            self.parse_tree.children.append(bracket_error)
+            errors.append(self.tree.add_error(bracket_error, self.current_line))
 
 
         if self.bracket_stack:
             if self.bracket_stack[-1] == LEFT_BRACE:
-                self.parse_tree.children.append(Error("Unmatched opening {", self.current_line))
+                errors.append(self.tree.add_error("Unmatched opening {", self.current_line))
             elif self.bracket_stack[-1] == LEFT_PAREN:
-                self.parse_tree.children.append(Error("Unmatched opening (", self.current_line))
+                errors.append(self.tree.add_error("Unmatched opening (", self.current_line))
+        return errors
 
     def increment_line_num(self):
-        while self.tokens[self.pos] == NEWLINE or self.tokens[self.pos] == COMMENT:
+        while self.tokens[self.pos] == COMMENT:
             self.pos += 1
-            self.current_line += 1
+        self.current_line = self.lines[self.pos] + self.line_adjust
+        self.line_pos = self.pos
 
     def update_bracket_stack(self):
-        if self.pos >= len(self.tokens):
+        """Push or pop the bracket at pos, returning the message of the error it causes, if any."""
+        if self.at_end() or self.at_newline():
             return None
         if self.tokens[self.pos] == LEFT_BRACE:
             self.add_to_bracket_stack(LEFT_BRACE)
@@ -196,233 +1167,279 @@ class Parser:
             if self.bracket_stack and self.bracket_stack[-1] == LEFT_BRACE:
                 self.bracket_stack.pop()
             else:
-                return Error("Unmatched closing }", self.current_line)
+                return "Unmatched closing }"
         if self.tokens[self.pos] == LEFT_PAREN:
             self.add_to_bracket_stack(LEFT_PAREN)
         elif self.tokens[self.pos] == RIGHT_PAREN:
             if self.bracket_stack and self.bracket_stack[-1] == LEFT_PAREN:
                 self.bracket_stack.pop()
             else:
-                return Error("Unmatched closing )", self.current_line)
+                return "Unmatched closing )"
 
     def match(self, matchings: list, dont_incrememnt=False, ignore_brackets=False):
-        if self.pos >= len(self.tokens):
+        """Return the token in matchings found at pos, or None. The lexeme it
+        matched is left in matched_lexeme, nothing is added to the tree."""
+        if self.at_end():
             return None
         if not ignore_brackets:
             self.update_bracket_stack()
-        lexeme = self.lexemes[self.pos]
+        at_block_comment = self.at_block_comment()
         for matching in matchings:
             self.increment_line_num()
-            if lexeme == 'a block comment':
-                return Node(matching, self.current_line, lexeme)
+            if at_block_comment:
+                self.matched_lexeme = 'a block comment'
+                return matching
             if self.tokens[self.pos] == matching:
+                self.matched_lexeme = self.lexemes[self.pos]
                 if not dont_incrememnt:
                     self.pos += 1
-                return Node(matching, self.current_line, self.lexemes[self.pos - 1])
+                return matching
         return None
 
+    def at_block_comment(self):
+        """Whether match() takes the token at pos for a block comment, whatever it is matching."""
+        return self.tokens[self.pos] == COMMENT and not self.at_newline() and self.lexemes[self.pos] == 'a block comment'
+
+    def predict(self, first_set):
+        """The token of first_set that match([token]) for each of its tokens in
+        turn would match first, or None, found with one look at the token at
+        pos. The side effects are those of the match() calls it stands for,
+        down to the bracket stack update each of them makes, but pos is left
+        on the matched token. As with match(), a block comment matches the
+        first token of the set."""
+        if self.at_end():
+            return None
+        self.update_bracket_stack()
+        at_block_comment = self.at_block_comment()
+        self.increment_line_num()
+        if at_block_comment:
+            self.matched_lexeme = 'a block comment'
+            return next(iter(first_set))
+        token = self.tokens[self.pos]
+        place = first_set.get(token)
+        if token in BRACKETS:
+            # Only a bracket is changed by the updates of the match() calls after the first
+            for _ in range(len(first_set) - 1 if place is None else place):
+                self.update_bracket_stack()
+        if place is None:
+            return None
+        self.matched_lexeme = self.lexemes[self.pos]
+        return token
+
     def match_with_function(self, function):
-        if self.pos >= len(self.tokens):
+        if self.at_end():
             return None
         self.increment_line_num()
         self.update_bracket_stack()
         if function(self.tokens[self.pos]):
             self.pos += 1
-            return Node(self.tokens[self.pos - 1], self.current_line, self.lexemes[self.pos - 1])
+            return self.tree.add(self.tokens[self.pos - 1], self.current_line, self.lexemes[self.pos - 1])
         return None
 
     def parse_statement(self):
-        if parsed_comment := self.match([COMMENT]):
-            return parsed_comment
-        elif self.match([IF]):
+        token = self.predict(STATEMENT_FIRST)
+        if token == IDENT:
+            return self.parse_assign(error=False)
+        elif token == COMMENT:
+            return self.tree.add(COMMENT, self.current_line, self.matched_lexeme)
+        elif token == IF:
+            self.pos += 1
             return self.parse_if()
-        elif self.match([FOR]):
+        elif token == FOR:
+            self.pos += 1
             return self.parse_for()
-        elif self.match([WHILE]):
+        elif token == WHILE:
+            self.pos += 1
             return self.parse_while()
-        elif self.match([IDENT], dont_incrememnt=True):
-            return self.parse_assign(error=False)
-        if self.pos >= len(self.tokens):
-            return None
+        return None
 
     def parse_if(self):
-        node = Node('if', self.current_line)
-        node.children.append(self.parse_condition())
-        node.children.append(self.parse_block())
+        node = self.tree.add('if', self.current_line)
+        self.tree.append(node, self.parse_condition())
+        self.tree.append(node, self.parse_block())
         return node
 
     def parse_for(self):
-        node = Node('for', self.current_line)
-        node.children.append(self.parse_condition())
-        node.children.append(self.parse_block())
+        node = self.tree.add('for', self.current_line)
+        self.tree.append(node, self.parse_condition())
+        self.tree.append(node, self.parse_block())
         return node
 
     def parse_while(self):
-        node = Node('while', self.current_line)
-        node.children.append(self.parse_condition())
-        node.children.append(self.parse_block())
+        node = self.tree.add('while', self.current_line)
+        self.tree.append(node, self.parse_condition())
+        self.tree.append(node, self.parse_block())
         return node
 
     def parse_condition(self):
-        node = Node('condition', self.current_line)
-        node.children.append(self.parse_left_paren())
+        tree = self.tree
+        node = tree.add('condition', self.current_line)
+        tree.append(node, self.parse_left_paren())
+        if self.index is not None and not self.at_end() and (end := self.index.closing_paren[self.pos]) >= 0:
+            # Take every token up to the closing ')' with the side effects match_with_function() has
+            while self.pos <= end:
+                self.increment_line_num()
+                self.update_bracket_stack()
+                self.pos += 1
+                tree.append(node, tree.add(self.tokens[self.pos - 1], self.current_line, self.lexemes[self.pos - 1]))
+            return node
         open_parent_count = 1
         while open_parent_count != 0:
             parsed_anything = self.match_with_function(lambda x: True)
 
-            if parsed_anything.value == LEFT_PAREN:
+            if tree.value(parsed_anything) == LEFT_PAREN:
                 open_parent_count += 1
-            if parsed_anything.value == RIGHT_PAREN:
+            if tree.value(parsed_anything) == RIGHT_PAREN:
                 open_parent_count -= 1
-            node.children.append(parsed_anything)
+            tree.append(node, parsed_anything)
 
-            if parsed_anything.value == -1:
+            if tree.value(parsed_anything) == -1:
                 break
         return node
 
     def parse_block(self):
-        node = Node('block', self.current_line)
+        node = self.tree.add('block', self.current_line)
         if parsed_left_brace := self.parse_left_brace(error=False):
-            node.children.append(parsed_left_brace)
+            self.tree.append(node, parsed_left_brace)
             while parsed_statement := self.parse_statement():
-                node.children.append(parsed_statement)
-            node.children.append(self.parse_right_brace())
+                self.tree.append(node, parsed_statement)
+            self.tree.append(node, self.parse_right_brace())
         else:
             while parsed_statement := self.parse_statement():
-                node.children.append(parsed_statement)
+                self.tree.append(node, parsed_statement)
         return node
 
     def parse_left_paren(self):
         if self.match([LEFT_PAREN]):
-            return Node(LEFT_PAREN, self.current_line, self.lexemes[self.pos - 1])
+            return self.tree.add(LEFT_PAREN, self.current_line, self.previous_lexeme())
         else:
-            return Error("Expected '('", self.current_line)
+            return self.tree.add_error("Expected '('", self.current_line)
 
     def parse_right_paren(self):
         if self.match([RIGHT_PAREN]):
-            return Node(RIGHT_PAREN, self.current_line, self.lexemes[self.pos - 1])
+            return self.tree.add(RIGHT_PAREN, self.current_line, self.previous_lexeme())
         else:
-            return Error("Expected right parenthesis", self.current_line)
+            return self.tree.add_error("Expected right parenthesis", self.current_line)
 
     def parse_left_brace(self, error=True):
         if self.match([LEFT_BRACE]):
-            return Node(LEFT_BRACE, self.current_line, self.lexemes[self.pos - 1])
+            return self.tree.add(LEFT_BRACE, self.current_line, self.previous_lexeme())
         elif error:
-            return Error("Expected left brace", self.current_line)
+            return self.tree.add_error("Expected left brace", self.current_line)
 
     def parse_right_brace(self):
         if self.match([RIGHT_BRACE]):
-            return Node(RIGHT_BRACE, self.current_line, self.lexemes[self.pos - 1])
+            return self.tree.add(RIGHT_BRACE, self.current_line, self.previous_lexeme())
         else:
-            if self.current_line >= self.tokens.count(NEWLINE) + self.tokens.count(COMMENT):
-                return Error("Syntax analysis failed.", self.current_line, show_line=False)
-            return Error("Expected right brace", self.current_line)
+            if self.current_line >= self.line_count(self.current_line):
+                return self.tree.add_error("Syntax analysis failed.", self.current_line, show_line=False)
+            return self.tree.add_error("Expected right brace", self.current_line)
 
     def parse_semicolon(self):
         if self.match([SEMICOLON]):
-            return Node(SEMICOLON, self.current_line, self.lexemes[self.pos - 1])
+            return self.tree.add(SEMICOLON, self.current_line, self.previous_lexeme())
         else:
-            error = Error("Missing semi colon", self.current_line)
-            if self.tokens[self.pos + 2] == FOR:
-                error.line += 1
-            self.pos += list(self.tokens[self.pos:]).index(NEWLINE)
-            return error
+            line = self.current_line
+            if self.token_ahead(2) == FOR:
+                line += 1
+            self.skip_to_newline()
+            return self.tree.add_error("Missing semi colon", line)
 
     def parse_assign(self, error=True):
-        node = Node('assign', self.current_line)
+        tree = self.tree
+        line = self.current_line
         if parsed_id := self.parse_id(error=error):
-            node.children.append(parsed_id)
+            node = tree.add('assign', line)
+            tree.append(node, parsed_id)
             if parsed_equals := self.parse_equals(error=False, ignore_brackets=True):
-                node.children.append(parsed_equals)
-                node.children.append(self.parse_expr())
+                tree.append(node, parsed_equals)
+                tree.append(node, self.parse_expr())
 
-                if str(self.lexemes[self.pos]).startswith('"') and '\n' in self.lexemes[self.pos]:
-                    error = Error("Unclosed string literal", self.current_line)
-                    node.children.append(error)
+                if not self.at_newline() and str(self.lexemes[self.pos]).startswith('"') and '\n' in self.lexemes[self.pos]:
+                    tree.append(node, tree.add_error("Unclosed string literal", self.current_line))
                 else:
-                    node.children.append(self.parse_semicolon())
+                    tree.append(node, self.parse_semicolon())
                 return node
             elif parsed_function_call := self.parse_function_call_brackets():
-                node.children.append(parsed_function_call)
-                node.children.append(self.parse_semicolon())
+                tree.append(node, parsed_function_call)
+                tree.append(node, self.parse_semicolon())
                 return node
             return node
 
     def parse_expr(self):
-        node = Node('expr', self.current_line)
+        tree = self.tree
+        node = tree.add('expr', self.current_line)
         term = self.parse_term()
-        node.children.append(term)
+        tree.append(node, term)
         if parsed_plus_minus := self.parse_plus_minus():
-            node.children.append(parsed_plus_minus)
+            tree.append(node, parsed_plus_minus)
             parsed_terminal = self.parse_terminal(error=True)
 
             # for input 19, float plus string
-            if isinstance(term.children[0], Node) and isinstance(parsed_terminal, Node):
-                left_type = term.children[0].value
-                right_type = parsed_terminal.value
+            left = tree.first_child[term]
+            if tree.is_node(left) and parsed_terminal is not None and tree.is_node(parsed_terminal):
+                left_type = tree.value(left)
+                right_type = tree.value(parsed_terminal)
                 if 13 in [left_type,
                           right_type] and left_type != right_type:  # string somewhere in addition and not being added to another string
-                    error = Error("String assignment error", self.current_line)
-                    node.children.append(error)
+                    tree.append(node, tree.add_error("String assignment error", self.current_line))
 
             # this was for some specific test case
-            if isinstance(parsed_terminal, Error):
-                parsed_terminal.error_message = "Missing operand before operator"
-                node.children.append(parsed_terminal)
+            if parsed_terminal is not None and tree.is_error(parsed_terminal):
+                tree.set_lexeme(parsed_terminal, "Missing operand before operator")
+                tree.append(node, parsed_terminal)
             else:
-                node.children.append(parsed_terminal)
+                tree.append(node, parsed_terminal)
         return node
 
     def parse_term(self):
-        node = Node('term', self.current_line)
-        node.children.append(self.parse_terminal())
+        node = self.tree.add('term', self.current_line)
+        self.tree.append(node, self.parse_terminal())
         if parsed_mult_div := self.parse_mult_div():
-            node.children.append(parsed_mult_div)
-            node.children.append(self.parse_terminal(True))
+            self.tree.append(node, parsed_mult_div)
+            self.tree.append(node, self.parse_terminal(True))
         return node
 
     def parse_terminal(self, error=False):
-        if self.pos >= len(self.tokens):
-            return Error("Expected terminal", self.current_line)
+        if self.at_end():
+            return self.tree.add_error("Expected terminal", self.current_line)
 
-        if self.match([IDENT], dont_incrememnt=True):
+        token = self.predict(TERMINAL_FIRST)
+        if token == IDENT:
             return self.parse_id(error=error)
-        elif self.match([INT_LIT]):
-            return Node(INT_LIT, self.current_line, self.lexemes[self.pos - 1])
-        elif self.match([FLOAT_LIT]):
-            return Node(FLOAT_LIT, self.current_line, self.lexemes[self.pos - 1])
-        elif self.match([STR_LIT]):
-            return Node(STR_LIT, self.current_line, self.lexemes[self.pos - 1])
+        elif token is not None:
+            self.pos += 1
+            return self.tree.add(token, self.current_line, self.previous_lexeme())
         elif error:
-            return Error("Expected terminal", self.current_line)
+            return self.tree.add_error("Expected terminal", self.current_line)
 
     def parse_id(self, error=False):
-        if self.pos >= len(self.tokens):
-            return Error("Expected identifier", self.current_line)
+        if self.at_end():
+            return self.tree.add_error("Expected identifier", self.current_line)
 
         if self.match([IDENT]):
-            node = Node('id', self.current_line)
-            node.children.append(Node(IDENT, self.current_line, self.lexemes[self.pos - 1]))
+            node = self.tree.add('id', self.current_line)
+            self.tree.append(node, self.tree.add(IDENT, self.current_line, self.previous_lexeme()))
             return node
         elif error:
-            return Error("Expected identifier", self.current_line)
+            return self.tree.add_error("Expected identifier", self.current_line)
 
     def parse_equals(self, error=True, ignore_brackets=False):
         if self.match([ASSIGN_OP], ignore_brackets=ignore_brackets):
-            return Node(ASSIGN_OP, self.current_line, self.lexemes[self.pos - 1])
+            return self.tree.add(ASSIGN_OP, self.current_line, self.previous_lexeme())
         elif error:
-            return Error("Expected assignment", self.current_line)
+            return self.tree.add_error("Expected assignment", self.current_line)
 
     def parse_function_call_brackets(self):
-        node = Node('function call brackets', self.current_line)
-        node.children.append(self.parse_left_paren())
-        node.children.append(self.parse_right_paren())
+        node = self.tree.add('function call brackets', self.current_line)
+        self.tree.append(node, self.parse_left_paren())
+        self.tree.append(node, self.parse_right_paren())
         return node
 
     def parse_plus_minus(self):
         if matched := self.match([ADD_OP, SUB_OP]):
-            return matched
+            return self.tree.add(matched, self.current_line, self.matched_lexeme)
 
     def parse_mult_div(self):
         if matched := self.match([MULT_OP, DIV_OP]):
-            return matched
+            return self.tree.add(matched, self.current_line, self.matched_lexeme)
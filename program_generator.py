@@ -0,0 +1,158 @@
+"""Synthetic programs in the README grammar, valid or with one deliberate error.
+
+Usage: python program_generator.py [tokens] [seed] [error_kind] > program.txt
+"""
+import random
+import sys
+
+ERROR_KINDS = ("semicolon", "operand", "string", "paren")
+
+NAMES = ("choice", "number", "end", "language", "statement", "file", "total", "count", "item", "value")
+FUNCTIONS = ("function_exists", "apply_encapsulation_rules", "refresh", "load_file", "next_item")
+WORDS = ("Test", "Case", "Block", "comment", "Java", "value", "loop", "check", "file", "rules")
+
+
+class ProgramGenerator:
+    """Writes statements until a program reaches about tokens tokens (not counting
+    NEWLINE, as in len(TokenBuffer)), nesting if/for/while blocks up to depth deep.
+
+    comment_density is the chance of a comment before a statement, string_density
+    the chance that a literal is a string. With error_at, a fraction from 0 to 1,
+    one statement of kind error_kind goes that far into the program. Spacing
+    follows what the lexer needs: a blank after every operator and after every
+    identifier not followed by a parenthesis, and no '*' inside block comments."""
+
+    def __init__(self, tokens=1000, depth=3, comment_density=0.1, string_density=0.2,
+                 error_at=None, error_kind="semicolon", seed=0):
+        if error_kind not in ERROR_KINDS:
+            raise ValueError("unknown error kind " + repr(error_kind))
+        self.tokens = tokens
+        self.depth = depth
+        self.comment_density = comment_density
+        self.string_density = string_density
+        self.error_at = error_at
+        self.error_kind = error_kind
+        self.random = random.Random(seed)
+
+    def name(self):
+        return self.random.choice(NAMES) + str(self.random.randrange(100))
+
+    def number(self):
+        return str(self.random.randrange(1000)) + " ", 1
+
+    def expression(self):
+        """Text and token count of an expression the parser accepts: a term of
+        one or two operands, then optionally + or - and one more operand."""
+        if self.random.random() < self.string_density:
+            text, count = self.literal_string() + " ", 1
+            if self.random.random() < 0.3:
+                text, count = text + "+ " + self.literal_string() + " ", 3
+            return text, count
+        text, count = self.number() if self.random.random() < 0.5 else (self.name() + " ", 1)
+        if self.random.random() < 0.3:
+            right, _ = self.number() if self.random.random() < 0.5 else (self.name() + " ", 1)
+            text, count = text + self.random.choice("*/") + " " + right, count + 2
+        if self.random.random() < 0.4:
+            right, _ = self.number() if self.random.random() < 0.5 else (self.name() + " ", 1)
+            text, count = text + self.random.choice("+-") + " " + right, count + 2
+        return text, count
+
+    def literal_string(self):
+        return '"' + " ".join(self.random.choices(WORDS, k=self.random.randint(1, 3))) + '"'
+
+    def condition(self, keyword):
+        if keyword == "for":
+            return f"(String {self.name()} in {self.name()} )", 6
+        if self.random.random() < 0.25:
+            return "(" + self.random.choice(FUNCTIONS) + "())", 5
+        right = self.literal_string() if self.random.random() < self.string_density else str(self.random.randrange(100))
+        operator = self.random.choice(("<", ">", "<=", ">=", "==", "!="))
+        return f"({self.name()} {operator} {right})", 5
+
+    def statement(self):
+        if self.random.random() < 0.2:
+            return self.random.choice(FUNCTIONS) + "();", 4
+        text, count = self.expression()
+        return f"{self.name()} = {text};", count + 3
+
+    def broken_statement(self):
+        """A statement with the error of error_kind."""
+        if self.error_kind == "semicolon":
+            return f"{self.name()} = {self.random.randrange(1000)}", 3
+        if self.error_kind == "operand":
+            return f"{self.name()} = {self.random.randrange(1000)} + ;", 5
+        if self.error_kind == "string":
+            return f"{self.name()} = {self.random.randrange(100)}.5 + {self.literal_string()};", 6
+        return f"while ({self.random.choice(FUNCTIONS)}())){{", 8
+
+    def comment(self, indent):
+        words = " ".join(self.random.choices(WORDS, k=self.random.randint(2, 8)))
+        if self.random.random() < 0.5:
+            return indent + "// " + words + "\n"
+        # The lexer swallows the character after */, so the line break goes there
+        return f"{indent}/*\n{indent}    {words}\n{indent}*/\n"
+
+    def lines(self):
+        """Yield the program a line at a time."""
+        count = 0
+        error_token = None if self.error_at is None else int(self.error_at * self.tokens)
+        depth = 0
+        while count < self.tokens:
+            indent = "    " * depth
+            if self.random.random() < self.comment_density:
+                count += 1
+                yield self.comment(indent)
+                continue
+            if error_token is not None and count >= error_token:
+                error_token = None
+                text, tokens = self.broken_statement()
+                count += tokens
+                if self.error_kind == "paren":
+                    depth += 1  # It opens a block like any while
+                yield indent + text + "\n"
+                continue
+            roll = self.random.random()
+            if depth and roll < 0.15:
+                depth -= 1
+                count += 1
+                yield "    " * depth + "}\n"
+            elif depth < self.depth and roll < 0.35:
+                keyword = self.random.choice(("if", "for", "while"))
+                text, tokens = self.condition(keyword)
+                count += tokens + 2
+                depth += 1
+                yield f"{indent}{keyword} {text} {{\n"
+            else:
+                text, tokens = self.statement()
+                count += tokens
+                yield indent + text + "\n"
+        while depth:
+            depth -= 1
+            yield "    " * depth + "}\n"
+        if error_token is not None:
+            yield self.broken_statement()[0] + "\n"
+        # The parser raises on an error in the very last statement, so something always follows
+        yield "end = 1;\n"
+
+    def generate(self):
+        return "".join(self.lines())
+
+
+def generate(tokens=1000, **options):
+    """Program text of about tokens tokens, see ProgramGenerator for the options."""
+    return ProgramGenerator(tokens, **options).generate()
+
+
+def main():
+    tokens = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    error_kind = sys.argv[3] if len(sys.argv) > 3 else None
+    options = {"seed": seed}
+    if error_kind:
+        options.update(error_at=0.5, error_kind=error_kind)
+    for line in ProgramGenerator(tokens, **options).lines():
+        sys.stdout.write(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+from lexical_analyzer import Lexer
+from parser import (ADD_OP, ASSIGN_OP, COMMENT, DIV_OP, ERROR_NODE, FOR, IDENT, IF, LEFT_BRACE, LEFT_PAREN, MULT_OP,
+                    RIGHT_BRACE, RIGHT_PAREN, SEMICOLON, STATEMENT_FIRST, STR_LIT, SUB_OP, TERMINAL_FIRST, WHILE,
+                    Parser, TokenIndex)
+
+# Validation only: the grammar of Parser, with its match() and predict() calls,
+# bracket stack updates and line counting left as they are, but nothing is
+# added to a ParseTree. Each parse function returns what its caller looks at
+# instead of a node: the value a node would have (a token or the name of a
+# construct), ERROR_NODE for an error, or None.
+#
+# find_first_error() only needs a few facts about each error: its message and
+# line, its depth in the tree, whether find_other_error() gets to it (not when
+# it is in the second operand of a term whose first operand was None) and
+# whether it is in the tree at all (not when the parse ends at the end of the
+# tokens inside a top level statement, which iter_statements() then drops).
+# Those are kept for the first error find_other_error() would return and for
+# the error with the highest line, and once a top level statement ends with a
+# first error that find_first_error() cannot trade for a bracket error, that
+# is the answer and the parse stops there.
+
+
+class Recognizer(Parser):
+    """Parser that only finds what find_first_error() would return for the tree
+    parse() builds, without building it."""
+
+    def __init__(self, tokens, lexemes, lines=None):
+        super().__init__(tokens, lexemes, lines)
+        self.depth = 0  # Depth in the tree of the node being parsed, 0 for program
+        self.hiding = 0  # Above 0 while parsing what find_other_error() does not look at
+        self.last_error = None
+        # Errors as [message, line, depth, show_line] lists, for the statement
+        # being parsed and for the statements iter_statements() kept
+        self.statement_other = self.statement_highest = None
+        self.other = self.highest = None
+
+    def recognize(self):
+        """str() of find_first_error() for the tree parse() would build, or None."""
+        if self.stream is None and self.index is None:
+            self.index = TokenIndex(self.tokens, self.lines)
+        while self.parse_statement() and not self.at_end():
+            self.keep_statement()
+            if self.other is not None and "Expected" not in self.other[0]:
+                return self.message(self.other)
+        self.statement_other = self.statement_highest = None  # The statement was dropped
+        self.parse_end()
+        self.keep_statement()
+        other, highest = self.other, self.highest
+        if other is not None and highest is not None:
+            if "Expected" in other[0] and "Unmatched" in highest[0]:
+                return self.message(highest)
+            return self.message(other)
+        if other is not None:
+            return self.message(other)
+        if highest is not None:
+            return self.message(highest)
+        return None
+
+    @staticmethod
+    def message(error):
+        message, line, _, show_line = error
+        return message + " at line " + str(line) if show_line else message
+
+    def error(self, message, line, show_line=True):
+        """Take note of an error find_first_error() could return, where parse() adds one."""
+        self.last_error = error = [message, line, self.depth + 1, show_line]
+        if self.statement_other is None and not self.hiding:
+            self.statement_other = error
+        highest = self.statement_highest
+        # As in ParseTree.indexed_errors(), an error only takes the place of an earlier one on its line when shallower
+        if highest is None or line > highest[1] or line == highest[1] and error[2] < highest[2]:
+            self.statement_highest = error
+        return ERROR_NODE
+
+    def keep_statement(self):
+        if self.other is None:
+            self.other = self.statement_other
+        highest, error = self.highest, self.statement_highest
+        if error is not None and (highest is None or error[1] > highest[1]
+                                  or error[1] == highest[1] and error[2] < highest[2]):
+            self.highest = error
+        self.statement_other = self.statement_highest = None
+
+    def parse_end(self):
+        if bracket_error := self.update_bracket_stack():
+            self.error(bracket_error, self.current_line)
+
+        bracket_error = self.update_bracket_stack()
+        if bracket_error:
+            self.error(bracket_error, self.current_line)
+
+        if self.bracket_stack:
+            if self.bracket_stack[-1] == LEFT_BRACE:
+                self.error("Unmatched opening {", self.current_line)
+            elif self.bracket_stack[-1] == LEFT_PAREN:
+                self.error("Unmatched opening (", self.current_line)
+
+    def match_with_function(self, function):
+        if self.at_end():
+            return None
+        self.increment_line_num()
+        self.update_bracket_stack()
+        if function(self.tokens[self.pos]):
+            self.pos += 1
+            return self.tokens[self.pos - 1]
+        return None
+
+    def parse_statement(self):
+        token = self.predict(STATEMENT_FIRST)
+        if token == IDENT:
+            return self.parse_assign(error=False)
+        elif token == COMMENT:
+            return COMMENT
+        elif token == IF:
+            self.pos += 1
+            return self.parse_if()
+        elif token == FOR:
+            self.pos += 1
+            return self.parse_for()
+        elif token == WHILE:
+            self.pos += 1
+            return self.parse_while()
+        return None
+
+    def parse_compound(self, name):
+        self.depth += 1
+        self.parse_condition()
+        self.parse_block()
+        self.depth -= 1
+        return name
+
+    def parse_if(self):
+        return self.parse_compound('if')
+
+    def parse_for(self):
+        return self.parse_compound('for')
+
+    def parse_while(self):
+        return self.parse_compound('while')
+
+    def parse_condition(self):
+        self.depth += 1
+        self.parse_left_paren()
+        if self.index is not None and not self.at_end() and (end := self.index.closing_paren[self.pos]) >= 0:
+            while self.pos <= end:
+                self.increment_line_num()
+                self.update_bracket_stack()
+                self.pos += 1
+        else:
+            open_parent_count = 1
+            while open_parent_count != 0:
+                parsed_anything = self.match_with_function(lambda x: True)
+                if parsed_anything is None:
+                    # Where Parser fails looking up the value of the missing node
+                    raise IndexError("condition runs past the end of the tokens")
+                if parsed_anything == LEFT_PAREN:
+                    open_parent_count += 1
+                if parsed_anything == RIGHT_PAREN:
+                    open_parent_count -= 1
+                if parsed_anything == -1:
+                    break
+        self.depth -= 1
+        return 'condition'
+
+    def parse_block(self):
+        self.depth += 1
+        if self.parse_left_brace(error=False):
+            while self.parse_statement():
+                pass
+            self.parse_right_brace()
+        else:
+            while self.parse_statement():
+                pass
+        self.depth -= 1
+        return 'block'
+
+    def parse_left_paren(self):
+        if self.match([LEFT_PAREN]):
+            return LEFT_PAREN
+        else:
+            return self.error("Expected '('", self.current_line)
+
+    def parse_right_paren(self):
+        if self.match([RIGHT_PAREN]):
+            return RIGHT_PAREN
+        else:
+            return self.error("Expected right parenthesis", self.current_line)
+
+    def parse_left_brace(self, error=True):
+        if self.match([LEFT_BRACE]):
+            return LEFT_BRACE
+        elif error:
+            return self.error("Expected left brace", self.current_line)
+
+    def parse_right_brace(self):
+        if self.match([RIGHT_BRACE]):
+            return RIGHT_BRACE
+        else:
+            if self.current_line >= self.line_count(self.current_line):
+                return self.error("Syntax analysis failed.", self.current_line, show_line=False)
+            return self.error("Expected right brace", self.current_line)
+
+    def parse_semicolon(self):
+        if self.match([SEMICOLON]):
+            return SEMICOLON
+        else:
+            line = self.current_line
+            if self.token_ahead(2) == FOR:
+                line += 1
+            self.skip_to_newline()
+            return self.error("Missing semi colon", line)
+
+    def parse_assign(self, error=True):
+        self.depth += 1  # An error parse_id() returns is a child of the assign node
+        if self.parse_id(error=error):
+            if self.parse_equals(error=False, ignore_brackets=True):
+                self.parse_expr()
+
+                if not self.at_newline() and str(self.lexemes[self.pos]).startswith('"') and '\n' in self.lexemes[self.pos]:
+                    self.error("Unclosed string literal", self.current_line)
+                else:
+                    self.parse_semicolon()
+            elif self.parse_function_call_brackets():
+                self.parse_semicolon()
+            self.depth -= 1
+            return 'assign'
+        self.depth -= 1
+        return None
+
+    def parse_expr(self):
+        self.depth += 1
+        left = self.parse_term()
+        if self.parse_plus_minus():
+            parsed_terminal = self.parse_terminal(error=True)
+
+            if left is not None and left != ERROR_NODE and parsed_terminal is not None and parsed_terminal != ERROR_NODE:
+                if STR_LIT in [left, parsed_terminal] and left != parsed_terminal:
+                    self.error("String assignment error", self.current_line)
+
+            if parsed_terminal == ERROR_NODE:
+                self.last_error[0] = "Missing operand before operator"
+        self.depth -= 1
+        return 'expr'
+
+    def parse_term(self):
+        """Parse a term and return its first operand, which parse_expr() looks at."""
+        self.depth += 1
+        left = self.parse_terminal()
+        if self.parse_mult_div():
+            if left is None:
+                # The operand goes after a None child, where find_other_error() stops looking
+                self.hiding += 1
+                self.parse_terminal(True)
+                self.hiding -= 1
+            else:
+                self.parse_terminal(True)
+        self.depth -= 1
+        return left
+
+    def parse_terminal(self, error=False):
+        if self.at_end():
+            return self.error("Expected terminal", self.current_line)
+
+        token = self.predict(TERMINAL_FIRST)
+        if token == IDENT:
+            return self.parse_id(error=error)
+        elif token is not None:
+            self.pos += 1
+            return token
+        elif error:
+            return self.error("Expected terminal", self.current_line)
+
+    def parse_id(self, error=False):
+        if self.at_end():
+            return self.error("Expected identifier", self.current_line)
+
+        if self.match([IDENT]):
+            return 'id'
+        elif error:
+            return self.error("Expected identifier", self.current_line)
+
+    def parse_equals(self, error=True, ignore_brackets=False):
+        if self.match([ASSIGN_OP], ignore_brackets=ignore_brackets):
+            return ASSIGN_OP
+        elif error:
+            return self.error("Expected assignment", self.current_line)
+
+    def parse_function_call_brackets(self):
+        self.depth += 1
+        self.parse_left_paren()
+        self.parse_right_paren()
+        self.depth -= 1
+        return 'function call brackets'
+
+    def parse_plus_minus(self):
+        return self.match([ADD_OP, SUB_OP])
+
+    def parse_mult_div(self):
+        return self.match([MULT_OP, DIV_OP])
+
+
+def validate(text, engine="regex"):
+    """What analyze_source(text, engine).first_error would be, without building a parse tree."""
+    return Recognizer.from_buffer(Lexer(engine).tokenize_buffer(text)).recognize()
+
+
+def validate_file(path, engine="regex"):
+    with open(path, "r") as fp:
+        return validate(fp.read(), engine)
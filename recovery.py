@@ -0,0 +1,172 @@
+from lexical_analyzer import Lexer
+from parser import (BRACKETS, EOF, FOR, IF, LEFT_BRACE, LEFT_PAREN, RIGHT_BRACE, RIGHT_PAREN, SEMICOLON, WHILE,
+                    Parser)
+
+# Error recovery: one parse that reports every syntax error instead of the one
+# find_first_error() picks.
+#
+# Each statement, at any depth, owns the errors added while it was the
+# innermost statement being parsed. When a statement ends owning errors, the
+# first of them is reported and the rest are taken as its cascade: the parser
+# then skips ahead in panic mode to the next synchronization point, which is
+# after a ';', before a '}', an if/for/while keyword or the first token of a
+# line, and goes on from there. A missing ';' skips nothing by itself, where
+# the plain parser skips the rest of the line, so the next line is parsed and
+# its errors reported. Where the plain parser gives up (on a token no
+# statement starts with, or when it runs off the end of the tokens) the
+# recovering one reports it and skips the token or stops. A skipped bracket
+# is pushed or popped once, so one stray bracket is one error. Every step either
+# consumes tokens or ends the parse, so the work stays linear in the number of
+# tokens, and parsing stops once max_errors errors are reported.
+
+DEFAULT_MAX_ERRORS = 100
+
+SYNC_TOKENS = (RIGHT_BRACE, IF, FOR, WHILE)
+
+
+class RecoveringParser(Parser):
+    """Parser that goes on after syntax errors; reported lists the error entries
+    of tree it found, at most max_errors of them."""
+
+    def __init__(self, tokens, lexemes, lines=None, max_errors=DEFAULT_MAX_ERRORS):
+        super().__init__(tokens, lexemes, lines)
+        self.max_errors = max_errors
+        self.reported = []
+        self.failed = False  # Ran off the end of the tokens, nothing after that is reported
+        self.frames = []  # [errors checked, errors owned] of each statement being parsed
+
+    @classmethod
+    def from_buffer(cls, buffer, max_errors=DEFAULT_MAX_ERRORS):
+        return cls(buffer.tokens, buffer.lexemes, buffer.lines, max_errors)
+
+    def stopped(self):
+        return self.failed or len(self.reported) >= self.max_errors
+
+    def report(self, error):
+        if len(self.reported) < self.max_errors:
+            self.reported.append(error)
+
+    def claim(self, frame):
+        """Give the errors added since frame was last checked to its statement."""
+        errors = self.tree.errors
+        if len(errors) > frame[0]:
+            frame[1].extend(errors[frame[0]:])
+        frame[0] = len(errors)
+
+    def first_owned(self, owned):
+        """The error of a statement to report, picked as find_first_error() picks
+        between an "Expected" error and the "Unmatched" bracket error it causes."""
+        lexeme = self.tree.lexeme
+        if "Expected" in lexeme(owned[0]):
+            for error in owned:
+                if "Unmatched" in lexeme(error):
+                    return error
+        return owned[0]
+
+    def parse_semicolon(self):
+        """As Parser.parse_semicolon(), without skipping the rest of the line:
+        synchronize() skips what the statement does not parse."""
+        if self.match([SEMICOLON]):
+            return self.tree.add(SEMICOLON, self.current_line, self.previous_lexeme())
+        line = self.current_line
+        # Looking two tokens ahead runs off the end of the tokens near the end
+        if self.has_token(self.pos + 2) and self.token_ahead(2) == FOR:
+            line += 1
+        return self.tree.add_error("Missing semi colon", line)
+
+    def parse_statement(self):
+        if self.stopped():
+            return None
+        frames = self.frames
+        if frames:
+            self.claim(frames[-1])  # What the enclosing statement added before this one started
+        frame = [len(self.tree.errors), []]
+        frames.append(frame)
+        try:
+            statement = super().parse_statement()
+        except (IndexError, ValueError):
+            # The plain parser raises when a statement runs off the end of the tokens
+            self.report(self.tree.add_error("Unexpected end of input", self.current_line))
+            self.failed = True
+            self.pos = len(self.tokens)
+            statement = None
+        finally:
+            frames.pop()
+        self.claim(frame)
+        if frame[1] and not self.failed:
+            self.synchronize()
+            self.claim(frame)
+            self.report(self.first_owned(frame[1]))
+        if frames:
+            frames[-1][0] = frame[0]
+        return statement
+
+    def synchronize(self):
+        """Skip tokens up to the next synchronization point, keeping the bracket
+        stack up to date and adding the errors of unmatched ')' on the way."""
+        tokens = self.tokens
+        while not self.at_end():
+            # The first token of a line, whether or not the statement already counted its line
+            if self.pos and (tokens[self.pos - 1] == SEMICOLON or self.newlines_before(self.pos)):
+                return
+            token = tokens[self.pos]
+            if token in SYNC_TOKENS or token == EOF:
+                return
+            if token == LEFT_BRACE or token == LEFT_PAREN:
+                self.add_to_bracket_stack(token)
+            elif token == RIGHT_PAREN:
+                if self.bracket_stack and self.bracket_stack[-1] == LEFT_PAREN:
+                    self.bracket_stack.pop()
+                else:
+                    self.tree.add_error("Unmatched closing )", self.lines[self.pos] + self.line_adjust)
+            self.pos += 1
+
+    def iter_statements(self):
+        while not self.stopped():
+            depth = len(self.bracket_stack)
+            parsed_statement = self.parse_statement()
+            if self.at_end():
+                return
+            if parsed_statement is not None:
+                yield parsed_statement
+                continue
+            # No statement starts at pos: report the token and go on after it
+            token = self.tokens[self.pos]
+            if token == EOF or self.stopped():
+                return
+            message = "Unexpected '" + str(self.lexemes[self.pos]) + "'"
+            if token in BRACKETS:
+                self.undo_bracket_updates(depth, token)
+                closing_error = self.update_bracket_stack()
+                if token == RIGHT_BRACE or token == RIGHT_PAREN:
+                    message = closing_error  # None for a bracket that closes one still open
+            self.pos += 1
+            if message is not None:
+                self.report(self.tree.add_error(message, self.current_line))
+                yield self.tree.errors[-1]
+
+    def undo_bracket_updates(self, depth, bracket):
+        """Put the bracket stack back to its depth before predict() pushed or
+        popped bracket once for each token of the statement FIRST set."""
+        stack = self.bracket_stack
+        if bracket == LEFT_BRACE or bracket == LEFT_PAREN:
+            del stack[depth:]
+        else:
+            stack.extend([LEFT_BRACE if bracket == RIGHT_BRACE else LEFT_PAREN] * (depth - len(stack)))
+
+    def parse_end(self):
+        errors = super().parse_end()
+        for error in errors:
+            self.report(error)
+        return errors
+
+    def errors(self):
+        """Reported errors as Error views, in the order they were added to the tree."""
+        return [self.tree.view(error) for error in sorted(self.reported)]
+
+
+def find_all_errors(text, max_errors=DEFAULT_MAX_ERRORS, engine="regex"):
+    """Every syntax error in text, up to max_errors of them, as Error views in source order."""
+    parser = RecoveringParser.from_buffer(Lexer(engine).tokenize_buffer(text), max_errors)
+    parser.parse()
+    return parser.errors()
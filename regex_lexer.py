@@ -0,0 +1,265 @@
+import re
+
+from parser import (INT_LIT, FLOAT_LIT, IDENT, STR_LIT, ASSIGN_OP, ADD_OP, SUB_OP, MULT_OP, DIV_OP, LEFT_PAREN,
+                    RIGHT_PAREN, LEFT_BRACE, RIGHT_BRACE, SEMICOLON, LESS_THAN, GREATER_THAN, EQUALS, NOT_EQUALS,
+                    AND_OP, OR_OP, IF, ELSE, FOR, WHILE, COMMENT, QUESTION_MARK, COLON, NEWLINE, EOF, UNKNOWN)
+
+# Second lexer engine: one compiled alternation regex instead of the getChar()/lookup() if/elif chains.
+# It reproduces the classic lexer token for token, including its quirks: a single character operator
+# (=, <, >, !, &, |, /) swallows the character after it, and a block comment swallows the character after
+# its closing */ as well as any character that follows a '*' inside it.
+
+MAX_LEXEME = 99
+
+# The scanner regexes are compiled by compiled() on first use, so importing
+# this module compiles nothing; MASTER and the others are module attributes too.
+MASTER_PATTERN = r'''
+    [ \t\r\x0b\x0c\x1c-\x1f]*
+    (?:
+        (?P<ident>[A-Za-z_][A-Za-z0-9_]*)(?P<illegal>[^ \t\r\x0b\x0c\x1c-\x1f\n(+\-*/<>)])?
+      | (?P<float>[0-9]+\.[0-9]*)
+      | (?P<bad_number>[0-9]+[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<int>[0-9]+)
+      | (?P<string>"[^"]*)(?P<close>")?
+      | (?P<newline>\n)
+      | (?P<line_comment>//[^\n]*\n?)
+      | (?P<block_comment>/\*(?P<body>(?:[^*]|\*[^/]|\*\Z)*)(?P<end>\*/[\s\S]?)?)
+      | (?P<pair>==|<=|>=|!=|&&|\|\|)
+      | (?P<single>[=<>!&|/])[\s\S]?
+      | (?P<op>[-+*(){};?:])
+      | (?P<other>[\s\S])
+      | (?P<eof>\Z)
+    )
+'''
+
+# Inside a block comment a '*' swallows the next character, so that character never counts as a new line
+BLOCK_COMMENT_NEWLINES_PATTERN = r'\*[\s\S]|\n'
+
+# Name -> pattern and flags of each regex compiled(name) compiles, the BYTES ones
+# the same scanner over bytes, for sources read through a memory map (see iter_spans())
+PATTERNS = {
+    "MASTER": (MASTER_PATTERN, re.VERBOSE),
+    "MASTER_BYTES": (MASTER_PATTERN.encode('ascii'), re.VERBOSE),
+    "BLOCK_COMMENT_NEWLINES": (BLOCK_COMMENT_NEWLINES_PATTERN, 0),
+    "BLOCK_COMMENT_NEWLINES_BYTES": (BLOCK_COMMENT_NEWLINES_PATTERN.encode('ascii'), 0),
+}
+
+KEYWORDS = {"if": IF, "else": ELSE, "for": FOR, "while": WHILE}
+
+OPERATORS = {
+    '(': LEFT_PAREN, ')': RIGHT_PAREN, '{': LEFT_BRACE, '}': RIGHT_BRACE, '+': ADD_OP, '-': SUB_OP,
+    '*': MULT_OP, ';': SEMICOLON, '?': QUESTION_MARK, ':': COLON,
+    '==': EQUALS, '<=': LESS_THAN, '>=': GREATER_THAN, '!=': NOT_EQUALS, '&&': AND_OP, '||': OR_OP,
+    '=': ASSIGN_OP, '<': LESS_THAN, '>': GREATER_THAN, '/': DIV_OP, '!': UNKNOWN, '&': UNKNOWN, '|': UNKNOWN,
+}
+
+KEYWORD_BYTES = {keyword.encode('ascii'): token for keyword, token in KEYWORDS.items()}
+OPERATOR_BYTES = {operator.encode('ascii'): token for operator, token in OPERATORS.items()}
+OPERATOR_TOKENS = frozenset(OPERATORS.values())
+PAIRS = frozenset(operator for operator in OPERATORS if len(operator) == 2)
+LONGEST_KEYWORD = max(map(len, KEYWORDS))
+
+
+def compiled(name):
+    """The regex of PATTERNS called name, compiled the first time it is asked for."""
+    regex = globals().get(name)
+    if regex is None:
+        pattern, flags = PATTERNS[name]
+        regex = globals()[name] = re.compile(pattern, flags)
+    return regex
+
+
+def __getattr__(name):
+    if name in PATTERNS:
+        return compiled(name)
+    raise AttributeError("module " + repr(__name__) + " has no attribute " + repr(name))
+
+
+def capped(text):
+    """Truncate a lexeme the way addChar() does, reporting every character that did not fit."""
+    for _ in range(len(text) - MAX_LEXEME):
+        print("Error - lexeme is too long")
+    return text[:MAX_LEXEME]
+
+
+def iter_tokens(text, errors=None):
+    """Lazily yield the (token, lexeme, start, end) tuples of an ASCII source string.
+
+    The tokens are the ones the classic lexer produces, with every comment
+    followed by one NEWLINE for each extra line it spans; start and end are the
+    offsets of the characters each token was scanned from. Lexer error messages
+    are appended to errors when a list is given.
+    """
+    match = compiled("MASTER").match
+    block_comment_newlines = compiled("BLOCK_COMMENT_NEWLINES").findall
+    pos = 0
+    while True:
+        m = match(text, pos)
+        start = m.start(m.lastindex)
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == 'newline':
+            yield NEWLINE, 'NEWLINE', start, pos
+        elif kind == 'ident' or kind == 'illegal':
+            start = m.start('ident')
+            lexeme = capped(m.group('ident'))
+            if lexeme in KEYWORDS:
+                if m.group('illegal'):
+                    pos = m.end('ident')
+                yield KEYWORDS[lexeme], lexeme, start, pos
+            elif m.group('illegal'):
+                if len(lexeme) < MAX_LEXEME:
+                    lexeme += m.group('illegal')
+                else:
+                    print("Error - lexeme is too long")
+                report(errors, "Error - illegal identifier")
+                yield EOF, lexeme, start, pos
+                return
+            else:
+                yield IDENT, lexeme, start, pos
+        elif kind == 'op' or kind == 'pair' or kind == 'single':
+            lexeme = m.group(kind)
+            yield OPERATORS[lexeme], lexeme, start, pos
+        elif kind == 'int':
+            yield INT_LIT, capped(m.group(kind)), start, pos
+        elif kind == 'float':
+            yield FLOAT_LIT, capped(m.group(kind)), start, pos
+        elif kind == 'string' or kind == 'close':
+            start = m.start('string')
+            if m.group('close'):
+                yield STR_LIT, capped(m.group('string') + '"'), start, pos
+            else:
+                report(errors, "Error - unclosed string literal")
+                yield EOF, capped(m.group('string')), start, pos
+                return
+        elif kind == 'line_comment':
+            yield COMMENT, "a single line comment", start, pos
+        elif kind == 'block_comment' or kind == 'body' or kind == 'end':
+            start = m.start('block_comment')
+            if m.group('end') is None:
+                report(errors, "Error - unclosed block comment")
+            yield COMMENT, "a block comment", start, pos
+            for found in block_comment_newlines(m.group('body')):
+                if found == '\n':
+                    yield NEWLINE, 'NEWLINE', pos, pos
+        elif kind == 'bad_number':
+            report(errors, "Error - illegal identifier")
+            yield EOF, capped(m.group(kind)), start, pos
+            return
+        elif kind == 'other':
+            yield EOF, m.group(kind), start, pos
+            return
+        else:
+            yield EOF, 'EOF', start, pos
+            return
+
+
+def too_long(length):
+    """Report the characters of a lexeme of length characters that capped() cuts off."""
+    for _ in range(length - MAX_LEXEME):
+        print("Error - lexeme is too long")
+
+
+def iter_spans(data, errors=None):
+    """Lazily yield (token, start, end) for every token iter_tokens() yields
+    for data, an ASCII source as bytes or any bytes-like object such as an
+    mmap, without making its lexeme. span_lexeme() makes it from data when
+    it is needed. The "lexeme is too long" reports are printed as they are
+    while lexing."""
+    match = compiled("MASTER_BYTES").match
+    block_comment_newlines = compiled("BLOCK_COMMENT_NEWLINES_BYTES").findall
+    pos = 0
+    while True:
+        m = match(data, pos)
+        start = m.start(m.lastindex)
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == 'newline':
+            yield NEWLINE, start, pos
+        elif kind == 'ident' or kind == 'illegal':
+            start, ident_end = m.span('ident')
+            length = ident_end - start
+            too_long(length)
+            keyword = KEYWORD_BYTES.get(data[start:ident_end]) if length <= LONGEST_KEYWORD else None
+            if keyword is not None:
+                if m.start('illegal') >= 0:
+                    pos = ident_end
+                yield keyword, start, pos
+            elif m.start('illegal') >= 0:
+                if length >= MAX_LEXEME:
+                    print("Error - lexeme is too long")
+                report(errors, "Error - illegal identifier")
+                yield EOF, start, pos
+                return
+            else:
+                yield IDENT, start, pos
+        elif kind == 'op' or kind == 'pair' or kind == 'single':
+            yield OPERATOR_BYTES[m.group(kind)], start, pos
+        elif kind == 'int':
+            too_long(pos - start)
+            yield INT_LIT, start, pos
+        elif kind == 'float':
+            too_long(pos - start)
+            yield FLOAT_LIT, start, pos
+        elif kind == 'string' or kind == 'close':
+            start = m.start('string')
+            too_long(pos - start)
+            if m.start('close') >= 0:
+                yield STR_LIT, start, pos
+            else:
+                report(errors, "Error - unclosed string literal")
+                yield EOF, start, pos
+                return
+        elif kind == 'line_comment':
+            yield COMMENT, start, pos
+        elif kind == 'block_comment' or kind == 'body' or kind == 'end':
+            start = m.start('block_comment')
+            if m.start('end') < 0:
+                report(errors, "Error - unclosed block comment")
+            yield COMMENT, start, pos
+            for found in block_comment_newlines(data, *m.span('body')):
+                if found == b'\n':
+                    yield NEWLINE, pos, pos
+        elif kind == 'bad_number':
+            too_long(pos - start)
+            report(errors, "Error - illegal identifier")
+            yield EOF, start, pos
+            return
+        elif kind == 'other':
+            yield EOF, start, pos
+            return
+        else:
+            yield EOF, start, pos
+            return
+
+
+def span_lexeme(data, token, start, end):
+    """The lexeme iter_tokens() gives the token that iter_spans() found at
+    data[start:end], without reporting again what capped() cuts off."""
+    if token == COMMENT:
+        return "a single line comment" if data[start + 1:start + 2] == b'/' else "a block comment"
+    if start == end:
+        return 'EOF'
+    text = data[start:min(end, start + MAX_LEXEME)].decode('ascii')
+    if token in OPERATOR_TOKENS:
+        # A single character operator may have swallowed the character after it
+        return text[:2] if text[:2] in PAIRS else text[0]
+    return text
+
+
+def report(errors, message):
+    if errors is not None:
+        errors.append(message)
+
+
+def tokenize(text):
+    """Lex a whole ASCII source string into (token_list, lexemes, error)."""
+    token_list = []
+    lexemes = []
+    errors = []
+    add_token = token_list.append
+    add_lexeme = lexemes.append
+    for token, lexeme, start, end in iter_tokens(text, errors):
+        add_token(token)
+        add_lexeme(lexeme)
+    return token_list, lexemes, errors[-1] if errors else ''
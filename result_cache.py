@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import time
+import zlib
+
+import lexical_analyzer
+import parser
+import regex_lexer
+from lexical_analyzer import analyze_source
+from parser import ParseTree, TokenBuffer
+
+# On-disk cache of analysis results, one file per distinct source. A file is
+# named after the SHA-256 of the analyzer version stamp and the source bytes,
+# so an unchanged file is looked up without lexing it, and anything produced by
+# an older lexer or parser is simply never found again. Files are written to a
+# temporary name and renamed into place, so processes sharing a cache directory
+# only ever see complete entries. Each process counts its own writes on top of
+# the directory size it last scanned and scans again once it wrote a
+# 1 / RESCAN_PARTS of the size limit since, so N processes go past the limit by
+# at most N / RESCAN_PARTS of it (and an entry each) before one of them sees it
+# and evicts.
+
+ENTRY_MAGIC = b"PCAC"
+ENTRY_FORMAT = 1
+ENTRY_SUFFIX = ".result"
+TEMP_PREFIX = ".tmp-"
+DEFAULT_MAX_BYTES = 256 << 20
+RESCAN_PARTS = 16  # The directory is scanned again, for the writes of others, every max_bytes / RESCAN_PARTS written
+STALE_TEMP_SECONDS = 3600  # Age of a temporary file that no writer is still writing, left by a killed one
+
+
+def analyzer_version():
+    """Stamp that changes whenever the lexer or parser code or a storage format changes."""
+    digest = hashlib.sha256(struct.pack("<HHH", ENTRY_FORMAT, parser.TREE_FORMAT, parser.TOKENS_FORMAT))
+    for module in (regex_lexer, lexical_analyzer, parser):
+        with open(module.__file__, "rb") as fp:
+            digest.update(fp.read())
+    return digest.hexdigest()[:16]
+
+
+class CachedResult:
+    """Tokens, parse tree and first error message (None without errors) of one source."""
+    __slots__ = ('tokens', 'tree', 'first_error')
+
+    def __init__(self, tokens, tree, first_error):
+        self.tokens = tokens
+        self.tree = tree
+        self.first_error = first_error
+
+    def to_bytes(self):
+        tokens = self.tokens.to_bytes()
+        tree = self.tree.to_bytes()
+        first_error = json.dumps(self.first_error).encode()
+        return (struct.pack("<4sHIII", ENTRY_MAGIC, ENTRY_FORMAT, len(tokens), len(tree), len(first_error))
+                + tokens + tree + first_error)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, tokens_size, tree_size, error_size = struct.unpack_from("<4sHIII", data)
+        if magic != ENTRY_MAGIC or version != ENTRY_FORMAT:
+            raise ValueError("not a cached result in format " + str(ENTRY_FORMAT))
+        offset = struct.calcsize("<4sHIII")
+        tokens = TokenBuffer.from_bytes(data[offset:offset + tokens_size])
+        offset += tokens_size
+        tree = ParseTree.from_bytes(data[offset:offset + tree_size])
+        offset += tree_size
+        first_error = json.loads(data[offset:offset + error_size])
+        return cls(tokens, tree, first_error)
+
+
+def analyze_text(text):
+    """Lex and parse text, without the cache."""
+    analysis = analyze_source(text)
+    return CachedResult(analysis.tokens, analysis.tree, analysis.first_error)
+
+
+class ResultCache:
+    """Cache of CachedResults in directory, keeping it under about max_bytes by
+    deleting the least recently used entries. hits, misses, writes and
+    evictions count what this instance did."""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, version=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = version if version is not None else analyzer_version()
+        self.size = None  # Bytes in the directory as of the last scan plus what was written since
+        self.unscanned_bytes = 0  # Written since that scan
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, source):
+        return hashlib.sha256(self.version.encode() + b"\0" + source).hexdigest()
+
+    def path(self, source):
+        return os.path.join(self.directory, self.key(source) + ENTRY_SUFFIX)
+
+    def get(self, source):
+        """Cached result for the source bytes, or None."""
+        path = self.path(source)
+        try:
+            with open(path, "rb") as fp:
+                result = CachedResult.from_bytes(fp.read())
+        except (OSError, ValueError, struct.error, zlib.error):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # Most recently used now
+        except OSError:
+            pass
+        self.hits += 1
+        return result
+
+    def put(self, source, result):
+        data = result.to_bytes()
+        fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(data)
+            os.replace(temp_path, self.path(source))
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        self.writes += 1
+        self.unscanned_bytes += len(data)
+        if self.size is None or self.unscanned_bytes * RESCAN_PARTS >= self.max_bytes:
+            # Other processes sharing the directory write to it too
+            self.size = self.scan()[0]
+            self.unscanned_bytes = 0
+        else:
+            self.size += len(data)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def analyze(self, source):
+        """CachedResult for source, given as str or bytes, from the cache when it is there."""
+        if isinstance(source, str):
+            text, source = source, source.encode()
+        else:
+            text = source.decode()
+        result = self.get(source)
+        if result is None:
+            result = analyze_text(text)
+            self.put(source, result)
+        return result
+
+    def scan(self):
+        """Total size of the entries in the directory and (mtime, size, path) for each."""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as scanned:
+            for entry in scanned:
+                if not entry.name.endswith(ENTRY_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        return total, entries
+
+    def evict(self):
+        """Delete the least recently used entries until the directory fits in
+        max_bytes, and the temporary files of writers that were killed."""
+        self.remove_stale_temps()
+        total, entries = self.scan()
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass  # Another process evicted it first
+            total -= size
+        self.size = total
+        self.unscanned_bytes = 0
+
+    def remove_stale_temps(self):
+        """Delete temporary files older than STALE_TEMP_SECONDS, which no put() renames any more."""
+        stale = time.time() - STALE_TEMP_SECONDS
+        with os.scandir(self.directory) as scanned:
+            for entry in scanned:
+                if not entry.name.startswith(TEMP_PREFIX):
+                    continue
+                try:
+                    if entry.stat().st_mtime < stale:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass  # Renamed into place or removed by another process meanwhile
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses, "writes": self.writes, "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
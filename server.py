@@ -0,0 +1,200 @@
+"""Long running analysis server: source text in, JSON diagnostics out.
+
+Usage: python server.py [--socket PATH | --host HOST --port PORT] [-j WORKERS]
+                        [--max-concurrency N] [--max-request-bytes N] [--engine ENGINE]
+
+Clients connect to the Unix socket at PATH, or to HOST:PORT (127.0.0.1:8765 by
+default), and send one JSON object per line:
+
+    {"id": 1, "source": "x = 1;\\n", "engine": "regex", "all_errors": false}
+
+Only "source" is required. Each request gets one JSON line back with its id,
+the first error (null without errors), the token count and the milliseconds
+the analysis took; with "all_errors" also every error recovery.py finds, up to
+"max_errors". A request that is not valid or could not be analyzed gets an
+"exception" instead. A client may send more requests before the answers come,
+which can then come out of order.
+
+Requests are analyzed in a pool of worker processes, each one with a Lexer and
+Parser of its own. At most --max-concurrency requests are handed to the pool
+at a time, and a connection is not read from while that many of its own
+requests are unanswered, so a client that sends faster than the workers keep
+up waits on its socket.
+"""
+import argparse
+import asyncio
+import json
+import os
+import stat
+import sys
+import time
+
+from lexical_analyzer import ENGINES, analyze_source
+from recovery import DEFAULT_MAX_ERRORS, RecoveringParser
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_REQUEST_BYTES = 64 << 20
+
+
+def analyze_request(source, engine="regex", all_errors=False, max_errors=DEFAULT_MAX_ERRORS):
+    """JSON-ready diagnostics of source. Runs in a worker process."""
+    start = time.perf_counter()
+    try:
+        analysis = analyze_source(source, engine)
+        result = {"first_error": analysis.first_error, "tokens": len(analysis.tokens)}
+        if all_errors:
+            parser = RecoveringParser.from_buffer(analysis.tokens, max_errors)
+            parser.parse()
+            result["errors"] = [str(error) for error in parser.errors()]
+    except Exception as error:
+        return {"exception": f"{type(error).__name__}: {error}"}
+    result["ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return result
+
+
+def request_arguments(request, engine="regex"):
+    """analyze_request() arguments for a decoded request, or ValueError."""
+    if not isinstance(request, dict) or not isinstance(request.get("source"), str):
+        raise ValueError('a request is an object with a "source" string')
+    engine = request.get("engine", engine)
+    if engine not in ENGINES:
+        raise ValueError("unknown lexer engine " + repr(engine))
+    max_errors = request.get("max_errors", DEFAULT_MAX_ERRORS)
+    if not isinstance(max_errors, int) or max_errors < 1:
+        raise ValueError('"max_errors" must be a positive integer')
+    return request["source"], engine, bool(request.get("all_errors", False)), max_errors
+
+
+class AnalysisServer:
+    """asyncio server that answers requests from a pool of worker processes."""
+
+    def __init__(self, workers=None, max_concurrency=None, max_request_bytes=DEFAULT_MAX_REQUEST_BYTES,
+                 engine="regex"):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency or 2 * self.workers
+        self.max_request_bytes = max_request_bytes
+        self.engine = engine
+        self.pool = None
+        self.slots = None  # Semaphore of the requests handed to the pool, made on the running loop
+        self.server = None
+
+    async def start(self, path=None, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Start the workers and listen on the Unix socket at path, or on host and port."""
+        from concurrent.futures import ProcessPoolExecutor
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.slots = asyncio.Semaphore(self.max_concurrency)
+        if path is not None:
+            if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+                os.unlink(path)  # Left by a server that is gone, binding fails otherwise
+            self.server = await asyncio.start_unix_server(self.serve_client, path, limit=self.max_request_bytes)
+        else:
+            self.server = await asyncio.start_server(self.serve_client, host, port, limit=self.max_request_bytes)
+        return self.server
+
+    def addresses(self):
+        return [sock.getsockname() for sock in self.server.sockets]
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.pool.shutdown()
+
+    async def serve_client(self, reader, writer):
+        unanswered = asyncio.Semaphore(self.max_concurrency)
+        answering = set()
+        try:
+            while True:
+                await unanswered.acquire()
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    await self.send(writer, {"id": None, "exception":
+                                             f"ValueError: request longer than {self.max_request_bytes} bytes"})
+                    break
+                except ConnectionError:
+                    break
+                if not line:
+                    break
+                task = asyncio.create_task(self.answer(line, writer, unanswered))
+                answering.add(task)
+                task.add_done_callback(answering.discard)
+            if answering:
+                await asyncio.gather(*answering)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def answer(self, line, writer, unanswered):
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+                if isinstance(request, dict):
+                    request_id = request.get("id")
+                arguments = request_arguments(request, self.engine)
+            except ValueError as error:
+                result = {"exception": f"{type(error).__name__}: {error}"}
+            else:
+                async with self.slots:
+                    try:
+                        result = await asyncio.get_running_loop().run_in_executor(self.pool, analyze_request,
+                                                                                  *arguments)
+                    except Exception as error:  # The worker died or the pool is shutting down
+                        result = {"exception": f"{type(error).__name__}: {error}"}
+            await self.send(writer, {"id": request_id, **result})
+        except ConnectionError:
+            pass  # The client went away, nobody to answer
+        finally:
+            unanswered.release()
+
+    @staticmethod
+    async def send(writer, result):
+        writer.write(json.dumps(result).encode() + b"\n")
+        await writer.drain()
+
+
+async def serve(server, path=None, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Run server until it is cancelled."""
+    listening = await server.start(path, host, port)
+    sys.stderr.write(f"listening on {', '.join(map(str, server.addresses()))} with {server.workers} workers\n")
+    sys.stderr.flush()
+    try:
+        await listening.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description="Serve analyses of source text as JSON lines.")
+    arguments.add_argument("--socket", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    arguments.add_argument("--host", default=DEFAULT_HOST, help=f"TCP host (default: {DEFAULT_HOST})")
+    arguments.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"TCP port (default: {DEFAULT_PORT})")
+    arguments.add_argument("-j", "--workers", type=int, default=None,
+                           help="worker processes (default: number of CPUs)")
+    arguments.add_argument("--max-concurrency", type=int, default=None,
+                           help="requests handed to the workers at a time, and unanswered requests a "
+                                "connection may have (default: twice the workers)")
+    arguments.add_argument("--max-request-bytes", type=int, default=DEFAULT_MAX_REQUEST_BYTES,
+                           help=f"longest request line accepted (default: {DEFAULT_MAX_REQUEST_BYTES})")
+    arguments.add_argument("--engine", choices=ENGINES, default="regex",
+                           help="lexer engine of requests that do not name one (default: regex)")
+    options = arguments.parse_args(argv)
+    if options.workers is not None and options.workers < 1:
+        arguments.error("--workers must be at least 1")
+    if options.max_concurrency is not None and options.max_concurrency < 1:
+        arguments.error("--max-concurrency must be at least 1")
+
+    server = AnalysisServer(options.workers, options.max_concurrency, options.max_request_bytes, options.engine)
+    try:
+        asyncio.run(serve(server, options.socket, options.host, options.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import parser
+from lexical_analyzer import Analysis, Lexer
+from parser import EOF, ERROR_NODE, ERROR_NODE_NO_LINE, INT_LIT, NEWLINE, NO_NODE, Parser
+
+# Optional instrumentation of an analysis. Nothing here is on the normal path:
+# analyze_source() only switches to the counting Lexer and Parser subclasses
+# below when it is given a Stats, so leaving stats off costs nothing.
+
+PHASES = ("lex", "parse", "first_error")
+COUNTERS = ("get_char", "lex", "match_attempts", "match_hits", "increment_line_num",
+            "increment_line_num_iterations", "update_bracket_stack")
+
+TOKEN_NAMES = {value: name for name, value in vars(parser).items()
+               if name.isupper() and isinstance(value, int) and INT_LIT <= value <= NEWLINE}
+
+
+def kind_name(value):
+    """Name a ParseTree node value is counted under: the token name for tokens, the value itself otherwise."""
+    return TOKEN_NAMES.get(value, str(value))
+
+
+class Stats:
+    """Wall time per phase and hot path counters, summed over every analysis it
+    was passed to. get_char and lex count the classic lexer's calls; for the
+    regex and vector engines, which scan a whole token at a time, lex counts
+    the tokens scanned and get_char the characters they were scanned from. nodes
+    counts the tree entries parse() allocated by kind, including errors and
+    None children."""
+
+    def __init__(self):
+        self.files = 0
+        self.tokens = 0
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        for counter in COUNTERS:
+            setattr(self, counter, 0)
+        self.nodes = Counter()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+    def analyze(self, text, engine="regex"):
+        """analyze_source(text, engine) with every phase counted."""
+        with self.phase("lex"):
+            tokens = CountingLexer(self, engine).tokenize_buffer(text)
+        with self.phase("parse"):
+            parser = CountingParser.from_buffer(tokens)
+            parser.stats = self
+            parser.parse()
+        with self.phase("first_error"):
+            first_error = parser.parse_tree.find_first_error()
+        self.files += 1
+        self.tokens += len(tokens)
+        self.count_nodes(parser.tree)
+        return Analysis(tokens, parser.tree, None if first_error is None else str(first_error))
+
+    def count_nodes(self, tree):
+        values = tree.values
+        for kind, count in Counter(tree.kinds).items():
+            if kind == NO_NODE:
+                self.nodes["None"] += count
+            elif kind == ERROR_NODE or kind == ERROR_NODE_NO_LINE:
+                self.nodes["error"] += count
+            else:
+                self.nodes[kind_name(values[kind])] += count
+
+    def merge(self, other):
+        """Add the numbers of other, a Stats, to these."""
+        self.files += other.files
+        self.tokens += other.tokens
+        for name in PHASES:
+            self.seconds[name] += other.seconds[name]
+        for counter in COUNTERS:
+            setattr(self, counter, getattr(self, counter) + getattr(other, counter))
+        self.nodes.update(other.nodes)
+
+    def to_dict(self):
+        return {
+            "files": self.files,
+            "tokens": self.tokens,
+            "seconds": dict(self.seconds),
+            "counters": {counter: getattr(self, counter) for counter in COUNTERS},
+            "nodes": dict(self.nodes.most_common()),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.files = data["files"]
+        stats.tokens = data["tokens"]
+        stats.seconds.update(data["seconds"])
+        for counter in COUNTERS:
+            setattr(stats, counter, data["counters"][counter])
+        stats.nodes.update(data["nodes"])
+        return stats
+
+    def to_json(self, indent=None):
+        return json.dumps(self.to_dict(), indent=indent)
+
+
+class CountingLexer(Lexer):
+    def __init__(self, stats, engine="classic"):
+        super().__init__(engine)
+        self.stats = stats
+
+    def iter_tokens(self, source):
+        if self.engine == "classic" or not isinstance(source, str) or not source.isascii():
+            yield from super().iter_tokens(source)
+            return
+        stats = self.stats
+        scanned = 0
+        for token in super().iter_tokens(source):
+            # One lex() call per token, but none for the NEWLINE fillers of a comment
+            if token[3] > token[2] or token[0] == EOF:
+                stats.lex += 1
+            stats.get_char += token[3] - scanned
+            scanned = token[3]
+            yield token
+
+    def get_char(self):
+        self.stats.get_char += 1
+        super().get_char()
+
+    def lex(self):
+        self.stats.lex += 1
+        return super().lex()
+
+
+class CountingParser(Parser):
+    stats = None
+
+    def match(self, matchings: list, dont_incrememnt=False, ignore_brackets=False):
+        self.stats.match_attempts += 1
+        matched = super().match(matchings, dont_incrememnt, ignore_brackets)
+        if matched is not None:
+            self.stats.match_hits += 1
+        return matched
+
+    def predict(self, first_set):
+        # One look at the token in place of a match() call per token of the set
+        self.stats.match_attempts += 1
+        token = super().predict(first_set)
+        if token is not None:
+            self.stats.match_hits += 1
+        return token
+
+    def increment_line_num(self):
+        pos = self.pos
+        super().increment_line_num()
+        self.stats.increment_line_num += 1
+        self.stats.increment_line_num_iterations += self.pos - pos
+
+    def update_bracket_stack(self):
+        self.stats.update_bracket_stack += 1
+        return super().update_bracket_stack()
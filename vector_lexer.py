@@ -0,0 +1,209 @@
+import re
+
+from parser import (INT_LIT, FLOAT_LIT, IDENT, STR_LIT, COMMENT, NEWLINE, EOF)
+from regex_lexer import KEYWORDS, MAX_LEXEME, OPERATORS, capped, compiled, report
+
+# Third lexer engine: a NumPy pre-pass classifies every character of the input
+# through a 256 entry table and cuts it into runs (identifier and number
+# characters, blanks, and every other character on its own), so the Python
+# loop below handles one run per step instead of one character. It produces
+# exactly the tokens of the regex engine, quirks included. NumPy is imported
+# the first time it is needed, and available() is False when it is missing.
+
+# Character classes of the pre-pass
+OTHER = 0  # A character that is not an operator, ends the input as an EOF token
+WORD = 1  # [A-Za-z0-9_], runs of them are merged
+BLANK = 2  # The blanks the lexer skips, runs of them are merged
+LINE_END = 3
+OPERATOR = 4  # [-+*(){};?:]
+PAIRING = 5  # [=<>!&|], which pair up or swallow the next character
+SLASH = 6
+QUOTE = 7
+
+RUN_CLASSES = (WORD, BLANK)
+
+CLASS_TABLE = [OTHER] * 256
+for code in range(256):
+    ch = chr(code)
+    if code < 128 and (ch.isalnum() or ch == '_'):
+        CLASS_TABLE[code] = WORD
+    elif ch in ' \t\r\x0b\x0c\x1c\x1d\x1e\x1f':
+        CLASS_TABLE[code] = BLANK
+    elif ch == '\n':
+        CLASS_TABLE[code] = LINE_END
+    elif ch in '-+*(){};?:':
+        CLASS_TABLE[code] = OPERATOR
+    elif ch in '=<>!&|':
+        CLASS_TABLE[code] = PAIRING
+    elif ch == '/':
+        CLASS_TABLE[code] = SLASH
+    elif ch == '"':
+        CLASS_TABLE[code] = QUOTE
+
+PAIRS = ('==', '<=', '>=', '!=', '&&', '||')
+# Characters that may follow an identifier without making it illegal
+AFTER_IDENT = frozenset(' \t\r\x0b\x0c\x1c\x1d\x1e\x1f\n(+-*/<>)')
+DIGITS = re.compile(r'[0-9]*')
+
+_numpy = None
+_tables = None
+
+
+def available():
+    """Whether NumPy can be imported, importing it the first time."""
+    global _numpy, _tables
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            _numpy = False
+        else:
+            _numpy = numpy
+            classes = numpy.array(CLASS_TABLE, dtype=numpy.uint8)
+            merges = numpy.zeros(256, dtype=bool)
+            merges[list(RUN_CLASSES)] = True
+            _tables = classes, merges
+    return _numpy is not False
+
+
+def runs(text):
+    """Start offset of every run of text, followed by len(text) and len(text) + 1, and the class of each run."""
+    numpy = _numpy
+    classes, merges = _tables
+    data = classes[numpy.frombuffer(text.encode('ascii'), dtype=numpy.uint8)]
+    # A run goes on where a character has the class of the one before and that class forms runs
+    continues = data[1:] == data[:-1]
+    continues &= merges[data[1:]]
+    starts = numpy.flatnonzero(~continues)
+    starts += 1
+    kinds = data[starts].tolist()
+    starts = starts.tolist()
+    if text:
+        starts.insert(0, 0)
+        kinds.insert(0, int(data[0]))
+    starts.append(len(text))
+    starts.append(len(text) + 1)
+    return starts, kinds
+
+
+def iter_tokens(text, errors=None):
+    """Lazily yield the (token, lexeme, start, end) tuples of an ASCII source
+    string, as regex_lexer.iter_tokens() does. available() must be True."""
+    starts, kinds = runs(text)
+    length = len(text)
+    keywords = KEYWORDS
+    operators = OPERATORS
+    run = 0
+    pos = 0
+    while True:
+        while starts[run + 1] <= pos:
+            run += 1
+        if pos >= length:
+            yield EOF, 'EOF', pos, pos
+            return
+        kind = kinds[run]
+        start = pos
+        if kind == WORD:
+            end = starts[run + 1]
+            if text[pos] > '9':  # A letter or '_'
+                lexeme = capped(text[pos:end])
+                illegal = end < length and text[end] not in AFTER_IDENT
+                if lexeme in keywords:
+                    pos = end
+                    yield keywords[lexeme], lexeme, start, pos
+                elif illegal:
+                    if len(lexeme) < MAX_LEXEME:
+                        lexeme += text[end]
+                    else:
+                        print("Error - lexeme is too long")
+                    report(errors, "Error - illegal identifier")
+                    yield EOF, lexeme, start, end + 1
+                    return
+                else:
+                    pos = end
+                    yield IDENT, lexeme, start, pos
+            else:
+                digits_end = DIGITS.match(text, pos, end).end()
+                if digits_end < length and text[digits_end] == '.':
+                    pos = DIGITS.match(text, digits_end + 1).end()
+                    yield FLOAT_LIT, capped(text[start:pos]), start, pos
+                elif digits_end < end:
+                    report(errors, "Error - illegal identifier")
+                    yield EOF, capped(text[start:end]), start, end
+                    return
+                else:
+                    pos = end
+                    yield INT_LIT, capped(text[start:pos]), start, pos
+        elif kind == BLANK:
+            pos = starts[run + 1]
+        elif kind == OPERATOR:
+            pos += 1
+            lexeme = text[start]
+            yield operators[lexeme], lexeme, start, pos
+        elif kind == LINE_END:
+            pos += 1
+            yield NEWLINE, 'NEWLINE', start, pos
+        elif kind == PAIRING:
+            if text[pos:pos + 2] in PAIRS:
+                pos += 2
+                lexeme = text[start:pos]
+            else:
+                pos = min(pos + 2, length)  # The character after it is swallowed
+                lexeme = text[start]
+            yield operators[lexeme], lexeme, start, pos
+        elif kind == SLASH:
+            following = text[pos + 1:pos + 2]
+            if following == '/':
+                line_end = text.find('\n', pos + 2)
+                pos = length if line_end < 0 else line_end + 1
+                yield COMMENT, "a single line comment", start, pos
+            elif following == '*':
+                body_end, closed = block_comment_end(text, pos + 2)
+                pos = min(body_end + 3, length) if closed else length
+                if not closed:
+                    report(errors, "Error - unclosed block comment")
+                yield COMMENT, "a block comment", start, pos
+                for found in compiled("BLOCK_COMMENT_NEWLINES").findall(text, start + 2, body_end):
+                    if found == '\n':
+                        yield NEWLINE, 'NEWLINE', pos, pos
+            else:
+                pos = min(pos + 2, length)
+                yield OPERATORS['/'], '/', start, pos
+        elif kind == QUOTE:
+            close = text.find('"', pos + 1)
+            if close < 0:
+                report(errors, "Error - unclosed string literal")
+                yield EOF, capped(text[start:]), start, length
+                return
+            pos = close + 1
+            yield STR_LIT, capped(text[start:pos]), start, pos
+        else:
+            yield EOF, text[start], start, start + 1
+            return
+
+
+def block_comment_end(text, pos):
+    """Where the body of a block comment that starts at pos ends, and whether
+    a */ follows it. Inside the body a '*' swallows the next character."""
+    while True:
+        star = text.find('*', pos)
+        if star < 0:
+            return len(text), False
+        if text[star + 1:star + 2] == '/':
+            return star, True
+        if star + 1 >= len(text):
+            return len(text), False
+        pos = star + 2
+
+
+def tokenize(text):
+    """Lex a whole ASCII source string into (token_list, lexemes, error)."""
+    token_list = []
+    lexemes = []
+    errors = []
+    add_token = token_list.append
+    add_lexeme = lexemes.append
+    for token, lexeme, start, end in iter_tokens(text, errors):
+        add_token(token)
+        add_lexeme(lexeme)
+    return token_list, lexemes, errors[-1] if errors else ''